@@ -1,5 +1,6 @@
 from enum import Enum
 from pathlib import Path
+from typing import Dict, List
 
 
 class GFMAlgorithm(Enum):
@@ -34,3 +35,34 @@ def filter_algorithm_files(
         return [f for f in tif_files if f.name.startswith("FLOOD-HM")]
 
     return []
+
+
+def split_algorithm_files(files: List[Path]) -> Dict[GFMAlgorithm, List[Path]]:
+    """
+    Bucket one directory listing by algorithm in a single pass.
+    Each bucket equals `filter_algorithm_files(files, algorithm)`.
+    """
+    buckets: Dict[GFMAlgorithm, List[Path]] = {algo: [] for algo in GFMAlgorithm}
+    flood_hm: List[Path] = []
+
+    for f in files:
+        if f.suffix != ".tif":
+            continue
+
+        buckets[GFMAlgorithm.ENSEMBLE].append(f)
+
+        name = f.name
+        if name.startswith("LIST"):
+            buckets[GFMAlgorithm.LIST].append(f)
+        elif name.startswith("DLR"):
+            buckets[GFMAlgorithm.DLR].append(f)
+        elif name.startswith("TUW"):
+            buckets[GFMAlgorithm.TUW].append(f)
+        elif name.startswith("FLOOD-HM"):
+            flood_hm.append(f)
+
+    # fallback: FLOOD-HM
+    if not buckets[GFMAlgorithm.TUW]:
+        buckets[GFMAlgorithm.TUW] = flood_hm
+
+    return buckets
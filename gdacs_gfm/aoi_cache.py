@@ -0,0 +1,126 @@
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import shapely
+from shapely.geometry import Polygon
+
+from .sqlite_utils import connect
+
+logger = logging.getLogger("gfm_logger")
+
+# Tolerance value recorded when only the bounding box selection worked
+BBOX_TOLERANCE = "bbox"
+
+
+class ToleranceCache:
+    """
+    Remembers which simplification tolerance made `select_polygon` work for
+    an event's AOI polygon, so reruns go straight to the working geometry.
+
+    Entries are keyed on the event, the AOI index and the AOI geometry
+    hash, so an edited GeoJSON starts the tolerance ladder from scratch.
+    """
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.conn = connect(db_path)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(tolerances)")]
+        if columns and "aoi_hash" not in columns:
+            # entries of the old (event, AOI index) key cannot be validated
+            self.conn.execute("DROP TABLE tolerances")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tolerances ("
+            "event_id TEXT NOT NULL, aoi_index INTEGER NOT NULL, aoi_hash TEXT NOT NULL, "
+            "tolerance TEXT NOT NULL, PRIMARY KEY (event_id, aoi_index))"
+        )
+        self.conn.commit()
+
+    def get(
+        self, event_id: str, aoi_index: int, aoi_hash: str
+    ) -> Optional[Union[float, str]]:
+        """Tolerance recorded for this AOI geometry, None on a miss or an edited AOI."""
+        row = self.conn.execute(
+            "SELECT aoi_hash, tolerance FROM tolerances WHERE event_id = ? AND aoi_index = ?",
+            (str(event_id), aoi_index),
+        ).fetchone()
+        if row is None or row[0] != aoi_hash:
+            return None
+        return row[1] if row[1] == BBOX_TOLERANCE else float(row[1])
+
+    def put(self, event_id: str, aoi_index: int, aoi_hash: str, tolerance: Union[float, str]):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tolerances VALUES (?, ?, ?, ?)",
+                (str(event_id), aoi_index, aoi_hash, str(tolerance)),
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+# Status of a cached AOI entry
+AOI_OK = "ok"
+AOI_NO_FEATURES = "no_features"
+AOI_NO_POLYGON = "no_polygon"
+
+
+class AOICache:
+    """
+    Binary (WKB) store of the AOI polygons parsed from `aois/<event_id>.json`.
+
+    Entries are keyed on the event id and valid as long as the GeoJSON file
+    keeps its mtime and size. Events without features or without a valid
+    polygon are cached as well, so reruns only `stat` the GeoJSON files.
+    """
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.conn = connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS aois ("
+            "event_id TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, "
+            "status TEXT NOT NULL, wkb BLOB)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def source_key(geojson_path: Union[str, Path]) -> Tuple[int, int]:
+        stat = os.stat(geojson_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(
+        self, event_id: str, source_key: Tuple[int, int]
+    ) -> Optional[Tuple[str, Optional[List[Polygon]]]]:
+        """`(status, polygons)` of a still valid entry, None on a miss."""
+        row = self.conn.execute(
+            "SELECT mtime_ns, size, status, wkb FROM aois WHERE event_id = ?",
+            (str(event_id),),
+        ).fetchone()
+        if row is None or (row[0], row[1]) != tuple(source_key):
+            return None
+
+        status, wkb = row[2], row[3]
+        if wkb is None:
+            return status, None
+        return status, list(shapely.get_parts(shapely.from_wkb(wkb)))
+
+    def put(
+        self,
+        event_id: str,
+        source_key: Tuple[int, int],
+        status: str,
+        polygons: Optional[List[Polygon]] = None,
+    ):
+        wkb = None
+        if polygons is not None:
+            # one collection per event keeps the polygon order
+            wkb = shapely.to_wkb(shapely.geometrycollections(polygons))
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO aois VALUES (?, ?, ?, ?, ?)",
+                (str(event_id), *source_key, status, wkb),
+            )
+
+    def close(self):
+        self.conn.close()
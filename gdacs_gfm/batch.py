@@ -0,0 +1,172 @@
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+from shapely.geometry import Polygon
+
+from .executors import MetricsExecutor
+from .layer_stack import STACK_LAYERS
+from .metric_cache import MetricCache
+from .pipeline import (
+    add_flood_metrics_executor,
+    add_layer_metrics,
+    aoi_labels,
+    event_file_table,
+    save_event_results,
+)
+from .results_dataset import ResultsDataset
+from .status_store import StatusStore
+
+logger = logging.getLogger("gfm_logger")
+
+# Batch AOI labels are `<work item index>/<event AOI label>`
+BATCH_AOI_SEP = "/"
+
+
+@dataclass
+class EventWork:
+    """
+    An event ready for its flood metrics: the file table of its datacubes
+    (`filepath`, `aoi`, ...), its AOI polygons by label (None for whole-tile
+    metrics) and the context layer files of the event, if any.
+    """
+
+    event: pd.Series
+    event_df: pd.DataFrame
+    polygons: Optional[Dict[str, Polygon]] = None
+    layer_files: Optional[Dict[str, List]] = None
+
+    @property
+    def event_id(self):
+        return self.event["GDACS_ID"]
+
+
+def event_work(event, dcs, polygons=None, layer_files=None, LOGGER=None) -> EventWork:
+    """`EventWork` of the AOI datacubes `dcs` and their aligned `polygons`."""
+    event_df = event_file_table(event["GDACS_ID"], dcs, LOGGER or logger)
+    labels = aoi_labels(polygons) if polygons is not None else None
+    return EventWork(event, event_df, labels, layer_files)
+
+
+def merge_layer_files(works: List[EventWork]) -> Optional[Dict[str, List]]:
+    """Context layer files of all work items, None if none of them has any."""
+    if all(work.layer_files is None for work in works):
+        return None
+
+    merged = {layer: {} for layer in STACK_LAYERS}
+    for work in works:
+        for layer in STACK_LAYERS:
+            for fp in (work.layer_files or {}).get(layer) or []:
+                merged[layer][str(fp)] = None
+    return {layer: list(files) for layer, files in merged.items()}
+
+
+def batch_flood_metrics(
+    works: List[EventWork],
+    executor: MetricsExecutor,
+    LOGGER=None,
+    detailed=False,
+    cache: Optional[MetricCache] = None,
+) -> List[pd.DataFrame]:
+    """
+    Flood metrics of many events at once: the (file, event, AOI) rows of
+    all work items are scheduled together, grouped by file so that each
+    raster is read once, and split back into one table per work item with
+    the columns of the per-event path.
+
+    Events of the same region and season share most of their tiles, so the
+    I/O of a batch scales with its distinct files rather than its events.
+    """
+    LOGGER = LOGGER or logger
+    aoi_masked = works[0].polygons is not None
+    if any((work.polygons is not None) != aoi_masked for work in works):
+        raise ValueError("A batch is either AOI-masked or whole-tile")
+
+    frames = []
+    polygons = {}
+    for k, work in enumerate(works):
+        df = work.event_df.copy()
+        df["batch_item"] = k
+        if aoi_masked:
+            # AOI labels are only unique within an event
+            df["aoi"] = [f"{k}{BATCH_AOI_SEP}{aoi}" for aoi in df["aoi"]]
+            for aoi, poly in work.polygons.items():
+                polygons[f"{k}{BATCH_AOI_SEP}{aoi}"] = poly
+        frames.append(df)
+
+    batch_df = pd.concat(frames, ignore_index=True)
+    polygons = polygons if aoi_masked else None
+
+    LOGGER.info(
+        f"Batch: {len(works)} events, {len(batch_df)} file/AOI rows, "
+        f"{batch_df['filepath'].nunique()} distinct files"
+    )
+
+    layer_files = merge_layer_files(works)
+    if layer_files is not None:
+        batch_df = add_layer_metrics(
+            batch_df, layer_files, executor, polygons, LOGGER, cache=cache, detailed=detailed
+        )
+    else:
+        batch_df = add_flood_metrics_executor(
+            batch_df, executor, polygons, LOGGER, detailed=detailed, cache=cache
+        )
+
+    results = []
+    for k, work in enumerate(works):
+        df = batch_df[batch_df["batch_item"] == k].drop(columns="batch_item")
+        df = df.reset_index(drop=True)
+        df["aoi"] = work.event_df["aoi"].to_numpy()
+        # unreadable files of other events turn pixel counts into floats
+        for column in df.columns:
+            if "pixel" in column and df[column].dtype.kind == "f" and df[column].notna().all():
+                df[column] = df[column].astype("int64")
+        results.append(df)
+    return results
+
+
+def process_event_batch(
+    works: List[EventWork],
+    algorithm,
+    results_dir: Path,
+    LOGGER,
+    executor: MetricsExecutor,
+    detailed=False,
+    metric_cache: Optional[MetricCache] = None,
+    composite_dir=None,
+    status_store: Optional[StatusStore] = None,
+    results_dataset: Optional[ResultsDataset] = None,
+) -> Dict[str, str]:
+    """
+    `process_event` for a batch of events sharing one metrics pass (see
+    `batch_flood_metrics`). Each event gets its own results (CSV or
+    `results_dataset` part), composites and status (in `status_store` if given); returns the status per event id
+    ("error" if saving failed).
+    """
+    if not works:
+        return {}
+
+    event_dfs = batch_flood_metrics(works, executor, LOGGER, detailed, metric_cache)
+
+    statuses = {}
+    for work, event_df in zip(works, event_dfs):
+        try:
+            statuses[work.event_id] = save_event_results(
+                work.event,
+                algorithm,
+                event_df,
+                Path(results_dir),
+                LOGGER,
+                work.polygons,
+                composite_dir,
+                status_store,
+                results_dataset,
+            )
+        except Exception as e:
+            LOGGER.exception(f"Error saving results of event {work.event_id}: {e}")
+            statuses[work.event_id] = "error"
+            if status_store is not None:
+                status_store.set(work.event_id, algorithm, "error")
+    return statuses
@@ -0,0 +1,260 @@
+import logging
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import rasterio
+import rasterio.shutil
+from affine import Affine
+from numba import njit
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask
+from rasterio.windows import Window, from_bounds
+from shapely.geometry import Polygon, box
+
+from .gfm_catalog import file_tile
+from .raster_stats import FLOOD_VALUE, NON_FLOOD_VALUE, AOIProjector, aoi_window, iter_blocks
+
+logger = logging.getLogger("gfm_logger")
+
+# Bands of the composite: max extent (0/1), first flooded day, flooded count
+COMPOSITE_BANDS = ("max_extent", "first_flooded", "flood_count")
+COMPOSITE_NODATA = 65535
+# Days are counted from this date in the first_flooded band (0 = never flooded)
+EPOCH = datetime(1970, 1, 1)
+COMPOSITE_BLOCK = 1024
+
+
+@njit(cache=True, nogil=True)
+def fold_flood_block(block, day, extent, first, count):
+    """Fold one flood extent block (acquired on `day`) into the composite arrays."""
+    rows, cols = block.shape
+    for i in range(rows):
+        for j in range(cols):
+            value = block[i, j]
+            if value == FLOOD_VALUE:
+                extent[i, j] = 1
+                count[i, j] += 1
+                if first[i, j] == 0 or day < first[i, j]:
+                    first[i, j] = day
+            elif value == NON_FLOOD_VALUE and extent[i, j] == COMPOSITE_NODATA:
+                extent[i, j] = 0
+
+
+def _to_day(time) -> int:
+    """Days since `EPOCH` (>= 1) of a file register time value."""
+    if isinstance(time, str):
+        time = datetime.strptime(time[:15], "%Y%m%dT%H%M%S")
+    return max(1, (pd.Timestamp(time).to_pydatetime().replace(tzinfo=None) - EPOCH).days)
+
+
+def composite_grid(files: List[Union[str, Path]], geom: Polygon):
+    """
+    `(crs, transform, width, height)` of the composite: the AOI bounds
+    clipped to the files' extents, snapped to their pixel grid. None if the
+    AOI misses every file.
+
+    Files of one Equi7 tile share its grid, so only one reference file per
+    tile is opened (every file whose name has no tile).
+    """
+    references = {}
+    for fp in files:
+        references.setdefault(file_tile(Path(fp).name) or str(fp), fp)
+
+    crs, res, extent = None, None, None
+    for fp in references.values():
+        with rasterio.open(fp) as src:
+            crs = crs or src.crs
+            res = res or src.res
+            bounds = box(*src.bounds)
+        extent = bounds if extent is None else extent.union(bounds)
+
+    clipped = extent.intersection(box(*geom.bounds))
+    if clipped.is_empty:
+        return None
+
+    xres, yres = res
+    minx, miny, maxx, maxy = clipped.bounds
+    minx, maxx = np.floor(minx / xres) * xres, np.ceil(maxx / xres) * xres
+    miny, maxy = np.floor(miny / yres) * yres, np.ceil(maxy / yres) * yres
+
+    width = int(round((maxx - minx) / xres))
+    height = int(round((maxy - miny) / yres))
+    transform = Affine(xres, 0.0, minx, 0.0, -yres, maxy)
+    return crs, transform, width, height
+
+
+def _composite_window(src, block: Window, transform: Affine, width: int, height: int):
+    """
+    Target window of a source block in the composite grid, clipped to it,
+    and the matching source sub-window. None if the block misses the grid.
+    """
+    bounds = src.window_bounds(block)
+    # both grids are snapped to the same pixels: the offsets are whole numbers
+    target = from_bounds(*bounds, transform=transform).round_offsets().round_lengths()
+    try:
+        clipped = target.intersection(Window(0, 0, width, height))
+    except WindowError:
+        return None
+
+    # matching source sub-window
+    src_window = Window(
+        block.col_off + (clipped.col_off - target.col_off),
+        block.row_off + (clipped.row_off - target.row_off),
+        clipped.width,
+        clipped.height,
+    )
+    return clipped, src_window
+
+
+def build_flood_composite(
+    files: List[Union[str, Path]],
+    times: List,
+    polygon: Polygon,
+    out_path: Union[str, Path],
+    tmp_dir: Optional[Union[str, Path]] = None,
+) -> Optional[Path]:
+    """
+    Fold the flood extent files of one AOI, time step by time step, into a
+    maximum extent / first flooded day / flooded count composite and write
+    it as a COG. `polygon` is the (lat, lon) AOI; pixels outside it are
+    nodata.
+
+    The running composite lives in memory-mapped scratch files and the files
+    are read block by block, so memory stays bounded for large AOIs.
+    """
+    if not files:
+        return None
+
+    order = np.argsort([_to_day(t) for t in times], kind="stable")
+    files = [files[i] for i in order]
+    days = [_to_day(times[i]) for i in order]
+
+    with rasterio.open(files[0]) as src:
+        geom = AOIProjector({"aoi": polygon}).get("aoi", src.crs)
+
+    grid = composite_grid(files, geom)
+    if grid is None:
+        return None
+    crs, transform, width, height = grid
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as scratch:
+        shape = (height, width)
+        extent = np.memmap(os.path.join(scratch, "extent"), np.uint16, "w+", shape=shape)
+        first = np.memmap(os.path.join(scratch, "first"), np.uint16, "w+", shape=shape)
+        count = np.memmap(os.path.join(scratch, "count"), np.uint16, "w+", shape=shape)
+        extent[:] = COMPOSITE_NODATA
+
+        # time step by time step
+        for fp, day in zip(files, days):
+            with rasterio.open(fp) as src:
+                if src.crs != crs:
+                    logger.warning(f"Composite: {fp} is not in the composite CRS, skipped")
+                    continue
+                # covers every pixel touching the AOI bounds, clipped to the file
+                aoi = aoi_window(src, geom)
+                if aoi is None:
+                    continue
+
+                for block in iter_blocks(src, aoi):
+                    windows = _composite_window(src, block, transform, width, height)
+                    if windows is None:
+                        continue
+                    target, src_window = windows
+                    if target.width <= 0 or target.height <= 0:
+                        continue
+                    data = src.read(1, window=src_window)
+                    rows, cols = target.toslices()
+                    fold_flood_block(
+                        data,
+                        day,
+                        np.asarray(extent[rows, cols]),
+                        np.asarray(first[rows, cols]),
+                        np.asarray(count[rows, cols]),
+                    )
+
+        _write_composite(extent, first, count, geom, crs, transform, out_path, scratch)
+
+    logger.info(f"Composite of {len(files)} files written to {out_path}")
+    return out_path
+
+
+def _write_composite(extent, first, count, geom, crs, transform, out_path, scratch):
+    """Write the composite block by block (AOI-masked), then convert it to a COG."""
+    height, width = extent.shape
+    profile = dict(
+        driver="GTiff",
+        width=width,
+        height=height,
+        count=len(COMPOSITE_BANDS),
+        dtype="uint16",
+        crs=crs,
+        transform=transform,
+        nodata=COMPOSITE_NODATA,
+        tiled=True,
+        blockxsize=512,
+        blockysize=512,
+        compress="deflate",
+        BIGTIFF="IF_SAFER",
+    )
+    tmp_path = os.path.join(scratch, "composite.tif")
+
+    with rasterio.open(tmp_path, "w", **profile) as dst:
+        for name, band in zip(COMPOSITE_BANDS, range(1, len(COMPOSITE_BANDS) + 1)):
+            dst.set_band_description(band, name)
+
+        for row in range(0, height, COMPOSITE_BLOCK):
+            for col in range(0, width, COMPOSITE_BLOCK):
+                window = Window(
+                    col, row, min(COMPOSITE_BLOCK, width - col), min(COMPOSITE_BLOCK, height - row)
+                )
+                rows, cols = window.toslices()
+                outside = geometry_mask(
+                    [geom],
+                    out_shape=(int(window.height), int(window.width)),
+                    transform=rasterio.windows.transform(window, transform),
+                )
+                bands = np.stack([extent[rows, cols], first[rows, cols], count[rows, cols]])
+                # never observed or outside the AOI
+                bands[:, outside] = COMPOSITE_NODATA
+                bands[:, extent[rows, cols] == COMPOSITE_NODATA] = COMPOSITE_NODATA
+                dst.write(bands, window=window)
+
+    rasterio.shutil.copy(
+        tmp_path, out_path, driver="COG", compress="deflate", BIGTIFF="IF_SAFER"
+    )
+
+
+def build_event_composites(
+    event_df: pd.DataFrame,
+    polygons: Dict[str, Polygon],
+    out_dir: Union[str, Path],
+    prefix: str,
+    LOGGER=None,
+) -> Dict[str, Path]:
+    """
+    One composite COG per AOI of an event (`<prefix>_<AOI>.tif` in
+    `out_dir`) from the event file table (`filepath`, `time`, `aoi`).
+    """
+    composites = {}
+    for aoi, aoi_df in event_df.groupby("aoi", sort=True):
+        if aoi not in polygons:
+            continue
+        out_path = Path(out_dir) / f"{prefix}_{aoi}.tif"
+        try:
+            path = build_flood_composite(
+                list(aoi_df["filepath"]), list(aoi_df["time"]), polygons[aoi], out_path
+            )
+        except Exception as e:
+            if LOGGER:
+                LOGGER.warning(f"Composite for {prefix} {aoi} failed: {e}")
+            continue
+        if path is not None:
+            composites[aoi] = path
+    return composites
@@ -4,6 +4,20 @@ from collections import OrderedDict
 
 DIMENSIONS = ["algorithm", "var_name", "time", "pol", "equi7_grid", "tile_name"]
 
+# Equi7 tile names, e.g. E048N021T3
+TILE_NAME_PATTERN = r"[EW]\d{3}[NS]\d{3}T\d"
+
+# EPSG codes of the Equi7Grid continental projections (first two letters of the grid code)
+EQUI7_EPSG = {
+    "AF": 27701,
+    "AN": 27702,
+    "AS": 27703,
+    "EU": 27704,
+    "NA": 27705,
+    "OC": 27706,
+    "SA": 27707,
+}
+
 # Fields definition for the flood extent layer of the GFM and NRT Archive products
 FIELDS_DEF = OrderedDict(
     [
@@ -191,4 +205,40 @@ ARCH_ADV_FIELDS_DEF = OrderedDict(
         ("equi7_grid", {"len": 6}),
         ("tile_name", {"len": 10}),
     ]
-)
\ No newline at end of file
+)
+
+# --- NAMING SCHEMES ---
+# Strict patterns used to recognise a naming scheme from the file name structure
+FIELD_PATTERNS = {
+    "time": r"\d{8}T\d{6}",
+    "pol": r"[A-Z]{2}",
+    "equi7_grid": r"[A-Z]{2}\d{3}M",
+    "tile_name": TILE_NAME_PATTERN,
+}
+
+# (scheme, fields definition, literal values of identifying fields), most specific first
+NAMING_SCHEMES = [
+    ("nrt_advflag", NRT_ADV_FIELDS_DEF, {"var_name": "ADVFLAG"}),
+    ("archive_advflag", ARCH_ADV_FIELDS_DEF, {"var_name": "ADVFLAG"}),
+    ("archive_exclusion", ARCH_EXCLUSION_FIELDS_DEF, {"algorithm": "EXCLUSION"}),
+    ("archive_obswater", ARCH_OBS_FIELDS_DEF, {"algorithm": "OBSERVED"}),
+    ("nrt_obswater", NRT_OBS_FIELDS_DEF, {"var_name": "OBSWATER"}),
+    ("nrt_exclusion", NRT_EXCLUSION_FIELDS_DEF, {}),
+    ("flood_hm", HM_FIELDS_DEF, {"algorithm": "FLOOD-HM"}),
+    ("ensemble_uncertainty", UNCERTAINTY_FIELDS_DEF, {"algorithm": "ENSEMBLE"}),
+    ("ensemble_flood", FL_DEF_DICT["ensemble"], {"algorithm": "ENSEMBLE"}),
+    ("flood", TUW_FIELDS_DEF, {"algorithm": "TUW|DLR"}),
+    ("list_flood", LIST_FIELDS_DEF, {"algorithm": "LIST"}),
+    ("nrt_uncertainty", NRT_UNCERTAINTY_FIELDS_DEF, {"algorithm": "TUW|DLR"}),
+    (
+        "list_nrt_uncertainty",
+        OrderedDict(NRT_UNCERTAINTY_FIELDS_DEF, algorithm={"len": 4}),
+        {"algorithm": "LIST"},
+    ),
+    ("archive_uncertainty", ARCH_UNCERTAINTY_FIELDS_DEF, {"algorithm": "TUW|DLR"}),
+    (
+        "list_archive_uncertainty",
+        OrderedDict(ARCH_UNCERTAINTY_FIELDS_DEF, algorithm={"len": 4}),
+        {"algorithm": "LIST"},
+    ),
+]
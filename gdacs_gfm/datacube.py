@@ -1,11 +1,19 @@
 from pathlib import Path
 
 from typing import List, Optional
+import numpy as np
+import pandas as pd
+import rasterio
+import shapely
 from yeoda.datacube import DataCubeReader
 from geopathfinder.file_naming import SmartFilename
 from shapely.geometry import Polygon
 from .process_geojson import load_event_geojson, filterby_dc_poly
+from .file_register import decode_file_register, parse_file_register
+from .aoi_cache import ToleranceCache
+from .tile_index import equi7_epsg, project_geometries, tile_footprints
 from geospade.crs import SpatialRef
+from geospade.raster import MosaicGeometry, Tile
 import logging
 
 # disable future warnings
@@ -19,10 +27,30 @@ logger = logging.getLogger("gfm_logger")
 def build_datacube(
     images_paths: List[Path],
     dimensions: tuple,
-    fields_def: dict,
+    fields_def: Optional[dict] = None,
     stack_dimension: str = "time",
     tile_dimension: str = "tile_name",
+    fast_parse: bool = False,
 ):
+    # no fields definition: detect the naming scheme of every file
+    if fields_def is None:
+        file_register = decode_file_register(
+            images_paths, dimensions, with_scheme=False
+        )
+        return build_datacube_from_register(
+            file_register,
+            stack_dimension=stack_dimension,
+            tile_dimension=tile_dimension,
+        )
+
+    if fast_parse:
+        file_register = parse_file_register(images_paths, fields_def, dimensions)
+        return build_datacube_from_register(
+            file_register,
+            stack_dimension=stack_dimension,
+            tile_dimension=tile_dimension,
+        )
+
     return DataCubeReader.from_filepaths(
         filepaths=images_paths,
         dimensions=dimensions,
@@ -33,25 +61,174 @@ def build_datacube(
     )
 
 
+def build_datacube_from_register(
+    file_register: pd.DataFrame,
+    stack_dimension: str = "time",
+    tile_dimension: str = "tile_name",
+):
+    """
+    Build a datacube from a prebuilt file register (see `parse_file_register`),
+    skipping yeoda's per-file `SmartFilename` parsing.
+    Only one reference file per tile is opened to derive the mosaic.
+    """
+    tiles = register_tiles(file_register, tile_dimension=tile_dimension)
+    mosaic = MosaicGeometry.from_tile_list(tiles)
+
+    return DataCubeReader(
+        file_register,
+        mosaic,
+        stack_dimension=stack_dimension,
+        tile_dimension=tile_dimension,
+    )
+
+
+def register_tiles(file_register: pd.DataFrame, tile_dimension: str = "tile_name") -> List[Tile]:
+    """
+    Tiles of a file register: the grid of one reference file per
+    `tile_dimension` value (all files of a tile share it).
+    """
+    tiles = []
+    reference = file_register.drop_duplicates(tile_dimension)
+    for tile_name, filepath in zip(reference[tile_dimension], reference["filepath"]):
+        with rasterio.open(filepath) as src:
+            tiles.append(
+                Tile(
+                    src.height,
+                    src.width,
+                    SpatialRef(src.crs.to_wkt()),
+                    geotrans=src.transform.to_gdal(),
+                    name=tile_name,
+                )
+            )
+    return tiles
+
+
+def tile_membership(
+    tile_names,
+    polygons: List[Polygon],
+    equi7_grid: str,
+    tile_dimension: str = "tile_name",
+) -> pd.DataFrame:
+    """
+    Tile/AOI pairs (`tile_name`, `aoi`) of the tiles intersecting each AOI
+    (`AOI_1`, `AOI_2`, ... in polygon order).
+
+    All polygons are intersected with all tile footprints in one
+    vectorised shapely call. The table only depends on the tiles and AOIs,
+    so it can be computed once per event and shared by all algorithms.
+    """
+    tiles = np.array(sorted({t for t in tile_names if t is not None}), dtype=object)
+    footprints = tile_footprints(tiles)
+    aois = project_geometries(polygons, f"EPSG:{equi7_epsg(equi7_grid)}")
+
+    hits = shapely.intersects(footprints[:, np.newaxis], aois[np.newaxis, :])
+    tile_idx, aoi_idx = np.nonzero(hits)
+
+    return pd.DataFrame(
+        {
+            tile_dimension: tiles[tile_idx],
+            "aoi": [f"AOI_{i + 1}" for i in aoi_idx],
+        }
+    )
+
+
+def aoi_membership(
+    file_register: pd.DataFrame,
+    polygons: List[Polygon],
+    equi7_grid: Optional[str] = None,
+    tile_dimension: str = "tile_name",
+    membership: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    Per-file AOI membership table: one row per file and intersecting AOI,
+    with the AOI label (`AOI_1`, `AOI_2`, ... in polygon order) in `aoi`.
+    A precomputed `tile_membership` covering the register's tiles may be
+    passed as `membership`.
+    """
+    if membership is None:
+        if equi7_grid is None:
+            equi7_grid = file_register["equi7_grid"].dropna().iloc[0]
+        membership = tile_membership(
+            file_register[tile_dimension].dropna().unique(),
+            polygons,
+            equi7_grid,
+            tile_dimension,
+        )
+    return file_register.merge(membership, on=tile_dimension, how="inner")
+
+
 def filter_datacube_by_event(
     dc,
     event_id: str,
     polygons: List[Polygon],
     sref: SpatialRef,
     LOGGER=None,
+    require_reduction: bool = True,
+    batched: bool = False,
+    tile_dimension: str = "tile_name",
+    tolerance_cache: Optional[ToleranceCache] = None,
+    return_polygons: bool = False,
+    membership: Optional[pd.DataFrame] = None,
 ):
-
+    """
+    Per-AOI datacubes of an event. AOIs without data are dropped; with
+    `return_polygons=True` the polygons of the kept AOIs are returned as
+    well, aligned with the cubes. In batched mode a `tile_membership` of
+    the event may be passed to skip the AOI/tile intersection.
+    """
     logger.info(f"Event ({event_id}): Loaded {len(polygons)} polygons from GeoJSON")
 
-    filtered_dcs = []
-    for poly in polygons:
-        dc_sel = filterby_dc_poly(dc, poly, sref, event_id, LOGGER)
-        if dc_sel is not None:
-            filtered_dcs.append(dc_sel)
+    if batched:
+        filtered_dcs, kept_polygons = _filter_datacube_batched(
+            dc, event_id, polygons, require_reduction, tile_dimension, LOGGER, membership
+        )
+    else:
+        filtered_dcs, kept_polygons = [], []
+        for i, poly in enumerate(polygons):
+            dc_sel = filterby_dc_poly(
+                dc,
+                poly,
+                sref,
+                event_id,
+                LOGGER,
+                require_reduction=require_reduction,
+                tolerance_cache=tolerance_cache,
+                aoi_index=i,
+            )
+            if dc_sel is not None:
+                filtered_dcs.append(dc_sel)
+                kept_polygons.append(poly)
 
     if not filtered_dcs:
         if LOGGER:
             LOGGER.warning(f"Event ({event_id}): No data after AOI filtering")
-        return None
+        return (None, None) if return_polygons else None
 
+    if return_polygons:
+        return filtered_dcs, kept_polygons
     return filtered_dcs
+
+
+def _filter_datacube_batched(
+    dc, event_id, polygons, require_reduction, tile_dimension, LOGGER=None, membership=None
+):
+    """Per-AOI cubes from one membership table (tile level, no clipping)."""
+    membership = aoi_membership(
+        dc.file_register, polygons, tile_dimension=tile_dimension, membership=membership
+    )
+    n_files = len(dc.file_register)
+
+    filtered_dcs, kept_polygons = [], []
+    for i, poly in enumerate(polygons, start=1):
+        aoi_files = membership[membership["aoi"] == f"AOI_{i}"]
+        if aoi_files.empty or (require_reduction and len(aoi_files) == n_files):
+            if LOGGER:
+                LOGGER.warning(
+                    f"Event ({event_id}): AOI selection returned full cube or no data"
+                )
+            continue
+
+        filtered_dcs.append(dc.select_tiles(list(aoi_files[tile_dimension].unique())))
+        kept_polygons.append(poly)
+
+    return filtered_dcs, kept_polygons
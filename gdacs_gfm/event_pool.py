@@ -0,0 +1,254 @@
+import logging
+import multiprocessing as mp
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from .executors import init_worker
+from .logger import setup_logging
+
+logger = logging.getLogger("gfm_logger")
+
+# Outcomes of an event
+OK = "ok"
+ERROR = "error"
+TIMEOUT = "timeout"
+CRASHED = "crashed"
+
+# Seconds a terminated worker gets before it is killed
+TERMINATE_GRACE = 5
+
+
+@dataclass
+class EventResult:
+    """Outcome of one event: `value` returned by the task, or the error message."""
+
+    event_id: Any
+    status: str
+    value: Any = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == OK
+
+
+def _worker_main(conn, task, initializer, initargs, gdal_env):
+    """Loop of a worker process: run `task(event)` for every event received."""
+    try:
+        setup_logging()
+        init_worker(gdal_env)
+        if initializer is not None:
+            initializer(*initargs)
+    except Exception as e:
+        conn.send((ERROR, None, f"{type(e).__name__}: {e}"))
+        conn.close()
+        return
+    conn.send((OK, None, None))
+
+    while True:
+        try:
+            event = conn.recv()
+        except EOFError:
+            break
+        if event is None:
+            break
+        try:
+            conn.send((OK, task(event), None))
+        except Exception as e:
+            logger.exception(f"Error processing event {event.get('GDACS_ID')}: {e}")
+            conn.send((ERROR, None, f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+class _Worker:
+    """A worker process, its pipe and the event it is running."""
+
+    def __init__(self, ctx, target_args):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, *target_args))
+        self.process.start()
+        child_conn.close()
+        self.event_id = None
+        self.started = 0.0
+
+    def ready(self):
+        """Wait for the worker's initialisation; a failure stops the run."""
+        try:
+            status, _, error = self.conn.recv()
+        except EOFError:
+            self.process.join(TERMINATE_GRACE)
+            status, error = ERROR, f"worker died (exit code {self.process.exitcode})"
+        if status != OK:
+            self.stop()
+            raise RuntimeError(f"Worker initialisation failed: {error}")
+
+    def submit(self, event_id, event):
+        self.event_id, self.started = event_id, time.monotonic()
+        self.conn.send(event)
+
+    def stop(self):
+        """Terminate the process (then kill it) and close the pipe."""
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(TERMINATE_GRACE)
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class EventPool:
+    """
+    Runs `task(event)` for many events on a pool of worker processes.
+
+    Every worker runs one event at a time, so at most `max_workers` events
+    are in flight and the event iterable is consumed lazily. Each worker
+    sets up logging, the GDAL environment (`executors.init_worker`) and
+    `initializer(*initargs)` once, so per-worker state (stores, caches) is
+    reused across its events.
+
+    An event exceeding `timeout` seconds gets its worker terminated; a
+    worker that dies (segfault, out of memory) only fails its own event.
+    Either way a fresh worker replaces it and the run goes on. `task`,
+    `initializer` and the events must be picklable (events are dicts).
+
+    Workers are spawned by default, so they open their own SQLite
+    connections and GDAL state instead of inheriting the parent's.
+    """
+
+    def __init__(
+        self,
+        task: Callable[[Dict], Any],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = (),
+        gdal_env: Optional[Dict[str, str]] = None,
+        mp_context: Optional[str] = "spawn",
+    ):
+        self.max_workers = max_workers or mp.cpu_count()
+        self.timeout = timeout
+        self._ctx = mp.get_context(mp_context)
+        self._target_args = (task, initializer, initargs, gdal_env)
+
+    def _result(self, worker: _Worker, status, value=None, error=None) -> EventResult:
+        result = EventResult(
+            worker.event_id, status, value, error, time.monotonic() - worker.started
+        )
+        worker.event_id = None
+        return result
+
+    def _wait_timeout(self, busy) -> Optional[float]:
+        if self.timeout is None:
+            return None
+        now = time.monotonic()
+        return max(0.0, min(w.started + self.timeout - now for w in busy))
+
+    def run(self, events: Iterable[Dict], key: str = "GDACS_ID") -> Iterator[EventResult]:
+        """Yield an `EventResult` per event, in completion order."""
+        events = iter(events)
+        workers = []
+        idle = []
+
+        def replace(worker):
+            worker.stop()
+            workers.remove(worker)
+            new = _Worker(self._ctx, self._target_args)
+            workers.append(new)
+            new.ready()
+            idle.append(new)
+
+        retries = []
+
+        def feed():
+            while idle:
+                event = next(events, None)
+                if event is None:
+                    return
+                worker = idle.pop()
+                try:
+                    worker.submit(event[key], event)
+                except OSError:
+                    # died while idle: the event goes to a fresh worker
+                    worker.event_id = None
+                    replace(worker)
+                    retries.append(event)
+
+        try:
+            for _ in range(self.max_workers):
+                workers.append(_Worker(self._ctx, self._target_args))
+            for worker in workers:
+                worker.ready()
+                idle.append(worker)
+
+            events = _chain_retries(retries, events)
+            feed()
+            while True:
+                busy = [w for w in workers if w.event_id is not None]
+                if not busy:
+                    break
+
+                handles = {w.conn: w for w in busy}
+                handles.update({w.process.sentinel: w for w in busy})
+                ready = wait(list(handles), self._wait_timeout(busy))
+
+                done = set()
+                for handle in ready:
+                    worker = handles[handle]
+                    if worker in done:
+                        continue
+                    done.add(worker)
+                    try:
+                        # a result sent before exiting is still read
+                        status, value, error = worker.conn.recv()
+                    except (EOFError, OSError):
+                        worker.process.join(TERMINATE_GRACE)
+                        code = worker.process.exitcode
+                        result = self._result(
+                            worker, CRASHED, error=f"Worker died (exit code {code})"
+                        )
+                        logger.error(f"Event {result.event_id}: {result.error}")
+                        replace(worker)
+                        yield result
+                        continue
+                    idle.append(worker)
+                    yield self._result(worker, status, value, error)
+
+                if self.timeout is not None:
+                    now = time.monotonic()
+                    for worker in busy:
+                        if worker in done or worker.event_id is None:
+                            continue
+                        if now - worker.started >= self.timeout:
+                            result = self._result(
+                                worker, TIMEOUT, error=f"Timed out after {self.timeout:.0f} s"
+                            )
+                            logger.error(f"Event {result.event_id}: {result.error}")
+                            replace(worker)
+                            yield result
+                feed()
+        finally:
+            for worker in workers:
+                if worker.event_id is None and worker.process.is_alive():
+                    try:
+                        worker.conn.send(None)
+                    except OSError:
+                        pass
+            for worker in workers:
+                worker.process.join(TERMINATE_GRACE if worker.event_id is None else 0)
+                worker.stop()
+
+
+def _chain_retries(retries: list, events: Iterator) -> Iterator:
+    """Events of `retries` (appended while iterating) first, then `events`."""
+    while True:
+        if retries:
+            yield retries.pop()
+            continue
+        event = next(events, None)
+        if event is None:
+            return
+        yield event
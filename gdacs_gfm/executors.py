@@ -0,0 +1,136 @@
+import logging
+import math
+import os
+from concurrent.futures import (
+    BrokenExecutor,
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("gfm_logger")
+
+EXECUTOR_BACKENDS = ("serial", "threads", "processes")
+
+# GDAL settings applied in every worker before rasterio opens a file
+DEFAULT_GDAL_ENV = {
+    "GDAL_CACHEMAX": "256",
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "GDAL_NUM_THREADS": "1",
+}
+
+# Chunks per worker: enough to balance uneven files, few enough to keep overhead low
+CHUNKS_PER_WORKER = 4
+
+# (result, error message) of one job
+JobResult = Tuple[Any, Optional[str]]
+
+
+def init_worker(gdal_env: Optional[Dict[str, str]] = None):
+    """Configure GDAL for a worker (process) before its first raster read."""
+    for key, value in (DEFAULT_GDAL_ENV if gdal_env is None else gdal_env).items():
+        os.environ.setdefault(key, str(value))
+
+
+def run_chunk(func: Callable, chunk: Sequence[tuple]) -> List[JobResult]:
+    """Run `func(*job)` for every job of a chunk, keeping per-job errors."""
+    results = []
+    for job in chunk:
+        try:
+            results.append((func(*job), None))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def make_chunks(jobs: Sequence[tuple], chunk_size: int) -> List[Sequence[tuple]]:
+    return [jobs[i : i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+
+
+class MetricsExecutor:
+    """
+    Runs per-file metric jobs serially, on threads or on processes.
+
+    Jobs are scheduled in chunks, and a failing job yields its error message
+    instead of aborting the batch. The pool is created on first use and
+    reused until `close()`, so it can serve many events.
+    """
+
+    def __init__(
+        self,
+        backend: str = "serial",
+        max_workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        gdal_env: Optional[Dict[str, str]] = None,
+    ):
+        if backend not in EXECUTOR_BACKENDS:
+            raise ValueError(f"Unknown executor backend: {backend}")
+
+        self.backend = backend
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.gdal_env = gdal_env
+        self._pool: Optional[Executor] = None
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.backend == "threads":
+                init_worker(self.gdal_env)
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=init_worker,
+                    initargs=(self.gdal_env,),
+                )
+        return self._pool
+
+    def _chunk_size(self, n_jobs: int) -> int:
+        if self.chunk_size:
+            return self.chunk_size
+        return max(1, math.ceil(n_jobs / (self.max_workers * CHUNKS_PER_WORKER)))
+
+    def map(self, func: Callable, jobs: Sequence[tuple]) -> List[JobResult]:
+        """
+        `(result, error)` of `func(*job)` for every job, in job order.
+        With the process backend `func` and the jobs must be picklable.
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return []
+
+        if self.backend == "serial":
+            init_worker(self.gdal_env)
+            return run_chunk(func, jobs)
+
+        chunks = make_chunks(jobs, self._chunk_size(len(jobs)))
+        pool = self._get_pool()
+        futures = [pool.submit(run_chunk, func, chunk) for chunk in chunks]
+
+        results: List[JobResult] = []
+        broken = False
+        for chunk, future in zip(chunks, futures):
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                # the worker itself failed (e.g. a crashed process)
+                broken = broken or isinstance(e, BrokenExecutor)
+                error = f"{type(e).__name__}: {e}"
+                results.extend((None, error) for _ in chunk)
+
+        if broken:
+            logger.warning("Executor pool broke, it will be recreated")
+            self.close()
+        return results
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
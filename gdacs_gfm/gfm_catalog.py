@@ -0,0 +1,405 @@
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .config import TILE_NAME_PATTERN
+from .gfm_layout import STORAGE_BRANCHES, GFMStoragePeriod, get_gfm_storage_periods
+from .sqlite_utils import connect
+
+logger = logging.getLogger("gfm_logger")
+
+TILE_RE = re.compile(TILE_NAME_PATTERN)
+
+# Name length of the directory levels below a layer dir: YYYY / MM / DD
+DATE_DIR_DIGITS = (4, 2, 2)
+DAY_DEPTH = len(DATE_DIR_DIGITS)
+# Coarsest directory mtime resolution expected (NFS, FAT): an mtime this close
+# to the last sync may hide a later write in the same tick
+MTIME_GRANULARITY_NS = 2_000_000_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    layer_dir TEXT NOT NULL,
+    period TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    layer TEXT NOT NULL,
+    equi7_grid TEXT NOT NULL,
+    day TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    tile TEXT,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_layer_dir_day ON files (layer_dir, day);
+CREATE INDEX IF NOT EXISTS files_grid_layer_day ON files (equi7_grid, layer, day);
+CREATE INDEX IF NOT EXISTS files_prefix ON files (prefix);
+CREATE INDEX IF NOT EXISTS files_tile ON files (tile);
+
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    layer_dir TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_layer_dir ON dirs (layer_dir);
+
+CREATE TABLE IF NOT EXISTS layer_dirs (
+    layer_dir TEXT PRIMARY KEY,
+    period TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    layer TEXT NOT NULL,
+    equi7_grid TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS layer_syncs (
+    layer_dir TEXT PRIMARY KEY,
+    synced_ns INTEGER NOT NULL
+);
+"""
+
+
+def _subdirs(path: Union[str, Path], digits: Optional[int] = None) -> Iterator[os.DirEntry]:
+    """Yield sub-directories of `path`, optionally only `YYYY`/`MM`/`DD` style names."""
+    try:
+        with os.scandir(path) as it:
+            entries = [e for e in it if e.is_dir()]
+    except FileNotFoundError:
+        return
+
+    for entry in entries:
+        if digits is None or (len(entry.name) == digits and entry.name.isdigit()):
+            yield entry
+
+
+def day_from_path(day_path: Union[str, Path]) -> date:
+    """Date of a `.../YYYY/MM/DD` directory."""
+    year, month, day = Path(day_path).parts[-3:]
+    return date(int(year), int(month), int(day))
+
+
+def _is_day_path(day_path: Union[str, Path]) -> bool:
+    try:
+        day_from_path(day_path)
+    except ValueError:
+        return False
+    return True
+
+
+def iter_layer_dirs(
+    period: GFMStoragePeriod,
+) -> Iterator[Tuple[str, str, str, Path]]:
+    """Yield `(branch, layer, equi7_grid, path)` for a storage period root."""
+    for branch in STORAGE_BRANCHES:
+        for layer in _subdirs(period.root_dir / branch):
+            for grid in _subdirs(layer.path):
+                yield branch, layer.name, grid.name, Path(grid.path)
+
+
+def scan_day_dir(day_path: Union[str, Path]) -> List[str]:
+    """Return the GeoTIFF file names in a day directory."""
+    try:
+        with os.scandir(day_path) as it:
+            return [e.name for e in it if e.name.endswith(".tif") and e.is_file()]
+    except FileNotFoundError:
+        return []
+
+
+def file_prefix(name: str) -> str:
+    """Algorithm/product prefix of a GFM file name, e.g. `TUW` or `FLOOD-HM`."""
+    return name.split("_", 1)[0]
+
+
+def file_tile(name: str) -> Optional[str]:
+    """Equi7 tile name contained in a GFM file name, if any."""
+    match = TILE_RE.search(name)
+    return match.group(0) if match else None
+
+
+class GFMCatalog:
+    """
+    SQLite catalog of the GeoTIFFs in the GFM archive and NRT storage trees.
+
+    The catalog is filled with `refresh()` and afterwards answers the same
+    questions as the per-day directory walks in `gfm_index` and
+    `retrieve_gfm_product` without touching the shared file system.
+    """
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = Path(db_path)
+        self.conn = connect(self.db_path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # --- Building ---
+
+    def refresh(
+        self,
+        periods: Optional[List[GFMStoragePeriod]] = None,
+        incremental: bool = True,
+    ) -> int:
+        """
+        Index every GeoTIFF below the storage period roots.
+
+        With `incremental=True` the recorded mtimes of the `YYYY/MM/DD`
+        directories are compared with the current ones: directories whose
+        mtime did not change are not listed again, and only day directories
+        that changed (or are new) are rescanned. Directories whose mtime is
+        within `MTIME_GRANULARITY_NS` of the last sync are listed again, and
+        layer directories that disappeared are purged. Returns the number of
+        rescanned day directories.
+        """
+        periods = get_gfm_storage_periods() if periods is None else periods
+
+        n_days = 0
+        for period in periods:
+            synced = set()
+            for branch, layer, grid, layer_dir in iter_layer_dirs(period):
+                n_days += self._sync_layer_dir(
+                    period, branch, layer, grid, layer_dir, incremental
+                )
+                synced.add(str(layer_dir))
+            self._purge_layer_dirs(period, synced)
+
+        mode = "incremental" if incremental else "full"
+        logger.info(f"GFM catalog ({mode}): rescanned {n_days} day directories")
+        return n_days
+
+    def _sync_layer_dir(
+        self,
+        period: GFMStoragePeriod,
+        branch: str,
+        layer: str,
+        grid: str,
+        layer_dir: Path,
+        incremental: bool,
+    ) -> int:
+        key = str(layer_dir)
+        # taken before listing, so writes during the walk are seen next time
+        sync_ns = time.time_ns()
+
+        known: Dict[str, int] = {}
+        known_days: List[str] = []
+        known_children: Dict[str, List[str]] = defaultdict(list)
+        # mtimes from this close to the last sync may hide writes of the same tick
+        trusted_before = 0
+        if incremental:
+            row = self.conn.execute(
+                "SELECT synced_ns FROM layer_syncs WHERE layer_dir = ?", (key,)
+            ).fetchone()
+            trusted_before = row[0] - MTIME_GRANULARITY_NS if row else 0
+            for path, parent, depth, mtime_ns in self.conn.execute(
+                "SELECT path, parent, depth, mtime_ns FROM dirs WHERE layer_dir = ?",
+                (key,),
+            ):
+                known[path] = mtime_ns
+                known_children[parent].append(path)
+                if depth == DAY_DEPTH and _is_day_path(path):
+                    known_days.append(path)
+
+        seen: Dict[str, Tuple[str, int, int]] = {}
+        changed_days: List[str] = []
+
+        def walk(path: str, parent: str, depth: int):
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                return
+            seen[path] = (parent, depth, mtime_ns)
+            unchanged = known.get(path) == mtime_ns and mtime_ns < trusted_before
+
+            if depth == DAY_DEPTH:
+                if not unchanged and _is_day_path(path):
+                    changed_days.append(path)
+                return
+
+            # An unchanged directory still has the same children
+            if unchanged:
+                children = known_children[path]
+            else:
+                children = [e.path for e in _subdirs(path, DATE_DIR_DIGITS[depth])]
+
+            for child in children:
+                walk(child, path, depth + 1)
+
+        walk(key, "", 0)
+
+        removed_days = [path for path in known_days if path not in seen]
+
+        rows = []
+        for day_path in changed_days:
+            day = day_from_path(day_path)
+            rows.extend(
+                self._file_rows(period, branch, layer, grid, layer_dir, day, day_path)
+            )
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO layer_dirs VALUES (?, ?, ?, ?, ?)",
+                (key, period.name, branch, layer, grid),
+            )
+            if not incremental:
+                self.conn.execute("DELETE FROM files WHERE layer_dir = ?", (key,))
+            for day_path in changed_days + removed_days:
+                self.conn.execute(
+                    "DELETE FROM files WHERE layer_dir = ? AND day = ?",
+                    (key, day_from_path(day_path).isoformat()),
+                )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.execute("DELETE FROM dirs WHERE layer_dir = ?", (key,))
+            self.conn.executemany(
+                "INSERT INTO dirs VALUES (?, ?, ?, ?, ?)",
+                [
+                    (path, parent, key, depth, mtime_ns)
+                    for path, (parent, depth, mtime_ns) in seen.items()
+                ],
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO layer_syncs VALUES (?, ?)", (key, sync_ns)
+            )
+
+        logger.debug(
+            f"GFM catalog: {layer_dir} -> {len(changed_days)} changed, "
+            f"{len(removed_days)} removed day directories, {len(rows)} files"
+        )
+        return len(changed_days)
+
+    def _purge_layer_dirs(self, period: GFMStoragePeriod, synced: set):
+        """Drop the rows of layer directories of `period` that no longer exist."""
+        stale = [
+            layer_dir
+            for (layer_dir,) in self.conn.execute(
+                "SELECT layer_dir FROM layer_dirs WHERE period = ?", (period.name,)
+            )
+            if layer_dir not in synced
+        ]
+        if not stale:
+            return
+        with self.conn:
+            for table in ("files", "dirs", "layer_syncs", "layer_dirs"):
+                self.conn.executemany(
+                    f"DELETE FROM {table} WHERE layer_dir = ?", [(d,) for d in stale]
+                )
+        logger.info(f"GFM catalog: purged {len(stale)} removed layer directories")
+
+    @staticmethod
+    def _file_rows(period, branch, layer, grid, layer_dir, day, day_path) -> List[tuple]:
+        return [
+            (
+                os.path.join(day_path, name),
+                str(layer_dir),
+                period.name,
+                branch,
+                layer,
+                grid,
+                day.isoformat(),
+                file_prefix(name),
+                file_tile(name),
+                name,
+            )
+            for name in scan_day_dir(day_path)
+        ]
+
+    # --- Queries ---
+
+    def has_layer_dir(self, layer_dir: Union[str, Path]) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM layer_dirs WHERE layer_dir = ?", (str(layer_dir),)
+        ).fetchone()
+        return row is not None
+
+    def day_files(
+        self,
+        layer_dir: Union[str, Path],
+        days: Iterable[datetime],
+    ) -> Dict[date, List[Path]]:
+        """
+        Files of a layer directory grouped by day, for a contiguous range of days.
+        Days without files are missing from the result.
+        """
+        days = sorted(d.date() if isinstance(d, datetime) else d for d in days)
+        if not days:
+            return {}
+
+        rows = self.conn.execute(
+            "SELECT day, path FROM files "
+            "WHERE layer_dir = ? AND day BETWEEN ? AND ? ORDER BY day, name",
+            (str(layer_dir), days[0].isoformat(), days[-1].isoformat()),
+        )
+
+        listing: Dict[date, List[Path]] = {}
+        for day, path in rows:
+            listing.setdefault(date.fromisoformat(day), []).append(Path(path))
+        return listing
+
+    def query(
+        self,
+        layer: Optional[str] = None,
+        equi7_grid: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        prefix: Optional[Union[str, List[str]]] = None,
+        tile: Optional[Union[str, List[str]]] = None,
+        period: Optional[str] = None,
+        branch: Optional[str] = None,
+    ) -> List[Path]:
+        """Generic lookup of indexed files by layer, grid, date range, prefix and tile."""
+        clauses, params = [], []
+
+        for column, value in (
+            ("layer", layer),
+            ("equi7_grid", equi7_grid),
+            ("period", period),
+            ("branch", branch),
+            ("prefix", prefix),
+            ("tile", tile),
+        ):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+        if start is not None:
+            clauses.append("day >= ?")
+            params.append(start.date().isoformat())
+        if end is not None:
+            clauses.append("day <= ?")
+            params.append(end.date().isoformat())
+
+        sql = "SELECT path FROM files"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY day, name"
+
+        return [Path(p) for (p,) in self.conn.execute(sql, params)]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build/refresh the GFM file catalog")
+    parser.add_argument("db_path", nargs="?", default="gfm_catalog.sqlite")
+    parser.add_argument(
+        "--full", action="store_true", help="rescan every day directory"
+    )
+    args = parser.parse_args()
+
+    with GFMCatalog(args.db_path) as catalog:
+        catalog.refresh(incremental=not args.full)
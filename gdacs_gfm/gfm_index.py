@@ -1,8 +1,14 @@
-from datetime import datetime, timedelta
-from .algorithms import GFMAlgorithm, filter_algorithm_files
-from .gfm_layout import get_algorithm_root
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, TYPE_CHECKING
+from .algorithms import GFMAlgorithm, filter_algorithm_files, split_algorithm_files
+from .gfm_layout import get_algorithm_root, get_gfm_layers_dirs
 from pathlib import Path
 
+if TYPE_CHECKING:
+    from .gfm_catalog import GFMCatalog
+
 
 def iterate_days(start, end, buffer_days=0):
     current = start - timedelta(days=buffer_days)
@@ -13,12 +19,39 @@ def iterate_days(start, end, buffer_days=0):
         current += timedelta(days=1)
 
 
+def list_day_files(
+    layer_dir: Path,
+    days: List[datetime],
+    catalog: Optional["GFMCatalog"] = None,
+) -> Dict[date, List[Path]]:
+    """
+    Files of `layer_dir/YYYY/MM/DD` grouped by day.
+    Served from the catalog when one is given, otherwise from the file system.
+    """
+    if catalog is not None:
+        return catalog.day_files(layer_dir, days)
+
+    listing: Dict[date, List[Path]] = {}
+    for day in days:
+        day_path = layer_dir / day.strftime("%Y") / day.strftime("%m") / day.strftime("%d")
+
+        # one scandir per day instead of exists() + iterdir()
+        try:
+            with os.scandir(day_path) as it:
+                listing[day.date()] = [Path(entry.path) for entry in it]
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+
+    return listing
+
+
 def find_gfm_images(
     event_start: datetime,
     event_end: datetime,
     equi7_code: str,
     algorithm: GFMAlgorithm,
     buffer_days: int = 0,
+    catalog: Optional["GFMCatalog"] = None,
 ) -> list[Path]:
 
     root = get_algorithm_root(
@@ -29,18 +62,109 @@ def find_gfm_images(
 
     images: list[Path] = []
 
-    for day in iterate_days(event_start, event_end, buffer_days):
-        day_path = root / day.strftime("%Y") / day.strftime("%m") / day.strftime("%d")
+    days = list(iterate_days(event_start, event_end, buffer_days))
+    listing = list_day_files(root, days, catalog)
 
-        if not day_path.exists():
+    for day in days:
+        day_files = listing.get(day.date())
+        if not day_files:
             continue
 
-        day_files = list(day_path.iterdir())
         images.extend(filter_algorithm_files(day_files, algorithm))
 
     return sorted(images)
 
 
+MAIN_LAYERS = ("flood_extent", "uncertainty")
+CONTEXT_LAYERS = ("exclusion", "observed_water", "advisory_flags")
+
+
+@dataclass
+class EventImages:
+    """GFM images of one event bucketed by algorithm and layer."""
+
+    layers: Dict[GFMAlgorithm, Dict[str, List[Path]]] = field(default_factory=dict)
+    context: Dict[str, List[Path]] = field(default_factory=dict)
+
+    def images(
+        self,
+        algorithm: GFMAlgorithm,
+        layer: str = "flood_extent",
+    ) -> List[Path]:
+        """Same list as `find_gfm_images` for `flood_extent`."""
+        if layer in CONTEXT_LAYERS:
+            return self.context.get(layer, [])
+        return self.layers.get(algorithm, {}).get(layer, [])
+
+    def layers_images(self, algorithm: GFMAlgorithm) -> List[List[Path]]:
+        """Layer lists in the order returned by `find_gfm_layers_images`."""
+        return [self.images(algorithm, layer) for layer in MAIN_LAYERS + CONTEXT_LAYERS]
+
+
+def discover_event_images(
+    event_start: datetime,
+    event_end: datetime,
+    equi7_code: str,
+    algorithms: Optional[List[GFMAlgorithm]] = None,
+    buffer_days: int = 0,
+    with_context: bool = True,
+    catalog: Optional["GFMCatalog"] = None,
+) -> EventImages:
+    """
+    Discover the images of all requested algorithms and layers in one pass.
+
+    Every day directory is listed once and its files are bucketed by
+    algorithm, instead of listing the same directories once per algorithm.
+    Missing layer directories yield empty lists.
+    """
+    algorithms = list(GFMAlgorithm) if algorithms is None else algorithms
+    days = list(iterate_days(event_start, event_end, buffer_days))
+
+    # [flood_extent, uncertainty, exclusion, observed_water, advisory_flags]
+    ensemble_dirs = get_gfm_layers_dirs(
+        event_start, equi7_code, GFMAlgorithm.ENSEMBLE, check_exists=False
+    )
+    interim_dirs = get_gfm_layers_dirs(
+        event_start, equi7_code, GFMAlgorithm.TUW, check_exists=False
+    )
+
+    result = EventImages(layers={algo: {} for algo in algorithms})
+    interim_algorithms = [a for a in algorithms if a != GFMAlgorithm.ENSEMBLE]
+
+    for i, layer in enumerate(MAIN_LAYERS):
+        if GFMAlgorithm.ENSEMBLE in algorithms:
+            listing = list_day_files(ensemble_dirs[i], days, catalog)
+            result.layers[GFMAlgorithm.ENSEMBLE][layer] = sorted(
+                f
+                for day in days
+                for f in filter_algorithm_files(
+                    listing.get(day.date(), []), GFMAlgorithm.ENSEMBLE
+                )
+            )
+
+        if not interim_algorithms:
+            continue
+
+        listing = list_day_files(interim_dirs[i], days, catalog)
+        buckets: Dict[GFMAlgorithm, List[Path]] = {a: [] for a in interim_algorithms}
+        for day in days:
+            day_buckets = split_algorithm_files(listing.get(day.date(), []))
+            for algo in interim_algorithms:
+                buckets[algo].extend(day_buckets[algo])
+
+        for algo in interim_algorithms:
+            result.layers[algo][layer] = sorted(buckets[algo])
+
+    if with_context:
+        for layer, layer_dir in zip(CONTEXT_LAYERS, ensemble_dirs[len(MAIN_LAYERS):]):
+            listing = list_day_files(layer_dir, days, catalog)
+            result.context[layer] = sorted(
+                f for day in days for f in listing.get(day.date(), []) if f.suffix == ".tif"
+            )
+
+    return result
+
+
 if __name__ == "__main__":
     from datetime import datetime
     from .datacube import build_datacube
@@ -1,9 +1,13 @@
 from pathlib import Path
+from typing import Optional
 from .algorithms import GFMAlgorithm
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 
+# Sub-directories of a storage root holding the ensemble / per-algorithm layers
+STORAGE_BRANCHES = ("layers", "interim_layers")
+
 
 @dataclass(frozen=True)
 class GFMStoragePeriod:
@@ -59,6 +63,55 @@ def get_algorithm_root(
     return storage_root / "interim_layers/flood_extent" / equi7_code
 
 
+def get_gfm_layers_dirs(
+    start_date: datetime = datetime(2024, 6, 12),
+    equi7_grid: Optional[str] = None,
+    gfm_algorithm: Optional[GFMAlgorithm] = None,
+    check_exists: bool = True,
+):
+    if equi7_grid is None:
+        raise ValueError("equi7_grid must be provided")
+
+    storage_root = resolve_storage_root(start_date)
+
+    # Select correct root based on algorithm
+    if gfm_algorithm.value == "ensemble":
+        storage_root = storage_root / "layers"
+    else:
+        storage_root = storage_root / "interim_layers"
+
+    # Main layers
+    root_layers = ["flood_extent", "uncertainty"]
+    root_dirs = [storage_root / layer / equi7_grid for layer in root_layers]
+
+    # Context layers
+    # Observed water naming
+    observed_name = (
+        "observed_water" if storage_root.parent.name == "output" else "obswater_mask"
+    )
+
+    exclusion_name = (
+        "exclusion_layer" if storage_root.parent.name == "output" else "exlusion_mask"
+    )
+    context_layers = [exclusion_name, observed_name, "advisory_flags"]
+    context_root = storage_root.parent / "layers"
+    context_dirs = [context_root / layer / equi7_grid for layer in context_layers]
+
+    all_dirs = root_dirs + context_dirs
+
+    if not check_exists:
+        return all_dirs
+
+    # Validate existence
+    missing = [str(p) for p in all_dirs if not p.exists()]
+    if missing:
+        raise FileNotFoundError(
+            "The following GFM layer directories do not exist:\n" + "\n".join(missing)
+        )
+
+    return all_dirs
+
+
 if __name__ == "__main__":
     test = resolve_storage_root(datetime(2025, 6, 15))
     print(test)
@@ -0,0 +1,117 @@
+import numpy as np
+from numba import njit
+
+# GFM layers are uint8 rasters
+N_VALUES = 256
+
+
+@njit(cache=True, nogil=True)
+def histogram_u8(data, mask, hist):
+    """
+    Add the value counts of a uint8 block to `hist` (length 256) in one pass.
+    Pixels where `mask` is False are skipped; `mask=None` counts all pixels.
+    """
+    rows, cols = data.shape
+    for i in range(rows):
+        for j in range(cols):
+            if mask is None or mask[i, j]:
+                hist[data[i, j]] += 1
+
+
+def new_histogram() -> np.ndarray:
+    return np.zeros(N_VALUES, dtype=np.int64)
+
+
+def accumulate_histogram(data: np.ndarray, hist: np.ndarray, mask: np.ndarray = None):
+    """`histogram_u8` for any block; non-uint8 data falls back to NumPy."""
+    if data.dtype == np.uint8:
+        histogram_u8(data, mask, hist)
+        return
+
+    values = data if mask is None else data[mask]
+    values = values[(values >= 0) & (values < N_VALUES)].astype(np.int64)
+    hist += np.bincount(values.ravel(), minlength=N_VALUES)
+
+
+def binned_counts(hist: np.ndarray, edges) -> np.ndarray:
+    """
+    Counts of a value histogram in the bins `[edges[k], edges[k + 1])`,
+    e.g. uncertainty classes `(0, 10, 20, ..., 101)`.
+    """
+    edges = np.asarray(edges)
+    cumulative = np.concatenate([[0], np.cumsum(hist)])
+    return cumulative[edges[1:]] - cumulative[edges[:-1]]
+
+
+# Counts accumulated by `layer_stack_counts`
+LAYER_COUNTS = (
+    "flooded",
+    "flooded_valid",
+    "excluded",
+    "reference_water",
+    "valid",
+    "uncertainty_pixels",
+    "nodata",
+)
+# Sums accumulated by `layer_stack_counts`: uncertainty (0-100) and confidence (0-1)
+LAYER_SUMS = ("uncertainty", "confidence")
+
+
+@njit(cache=True, nogil=True)
+def layer_stack_counts(flood, exclusion, obswater, uncertainty, mask, counts, sums, uhist):
+    """
+    One pass over aligned blocks of the flood extent and its context layers
+    (any of which may be None), adding to `counts` (see `LAYER_COUNTS`),
+    `sums` (see `LAYER_SUMS`) and the uncertainty value histogram `uhist`.
+
+    Flooded pixels flagged in the exclusion mask are not `flooded_valid`;
+    observed water that is not flooded is counted as reference water.
+    Reference water is not subtracted from the flood: GFM's flood extent
+    is the observed water minus the reference water, so a flooded pixel is
+    never reference water and only the exclusion mask applies.
+    Uncertainty and confidence are summed, and uncertainty values counted,
+    over the valid flooded pixels.
+    """
+    rows, cols = flood.shape
+    for i in range(rows):
+        for j in range(cols):
+            if mask is not None:
+                if not mask[i, j]:
+                    continue
+
+            value = flood[i, j]
+            if value > 1:
+                counts[6] += 1
+                continue
+            counts[4] += 1
+
+            excluded = False
+            if exclusion is not None:
+                if exclusion[i, j] == 1:
+                    excluded = True
+                    counts[2] += 1
+
+            if value == 1:
+                counts[0] += 1
+                if excluded:
+                    continue
+                counts[1] += 1
+                if uncertainty is not None:
+                    u = uncertainty[i, j]
+                    if u <= 100:
+                        counts[5] += 1
+                        sums[0] += u
+                        sums[1] += (100 - u) / 100.0
+                        uhist[u] += 1
+            elif obswater is not None:
+                if obswater[i, j] == 1:
+                    counts[3] += 1
+
+
+def new_layer_accumulators():
+    """`(counts, sums, uhist)` of `layer_stack_counts`."""
+    return (
+        np.zeros(len(LAYER_COUNTS), dtype=np.int64),
+        np.zeros(len(LAYER_SUMS), dtype=np.float64),
+        new_histogram(),
+    )
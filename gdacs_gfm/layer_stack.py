@@ -0,0 +1,160 @@
+import logging
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import rasterio
+
+from .file_register import decode_file_register
+from .kernels import LAYER_COUNTS, LAYER_SUMS, layer_stack_counts, new_layer_accumulators
+from .raster_stats import (
+    AOIProjector,
+    iter_aoi_blocks,
+    iter_blocks,
+    pixels_to_km2,
+    uncertainty_histogram_stats,
+)
+
+logger = logging.getLogger("gfm_logger")
+
+# Context layers read together with the flood extent, in kernel argument order
+STACK_LAYERS = ("exclusion", "observed_water", "uncertainty")
+MATCH_DIMENSIONS = ["time", "tile_name"]
+
+
+def match_layer_files(
+    flood_files: List[Union[str, Path]],
+    layer_files: Dict[str, List[Union[str, Path]]],
+) -> pd.DataFrame:
+    """
+    Flood extent files with the co-registered context layer file of the same
+    tile and timestamp in one column per layer (None where missing).
+    """
+    register = decode_file_register(flood_files, MATCH_DIMENSIONS, with_scheme=False)
+
+    for layer in STACK_LAYERS:
+        files = layer_files.get(layer) or []
+        if files:
+            layer_register = decode_file_register(files, MATCH_DIMENSIONS, with_scheme=False)
+            layer_register = layer_register.dropna(subset=MATCH_DIMENSIONS)
+            layer_register = layer_register.drop_duplicates(MATCH_DIMENSIONS)
+            layer_register = layer_register.rename(columns={"filepath": layer})
+            register = register.merge(layer_register, on=MATCH_DIMENSIONS, how="left")
+        else:
+            register[layer] = None
+
+    register = register.astype(object).where(register.notna(), None)
+    return register[["filepath"] + list(STACK_LAYERS)]
+
+
+def _open_aligned(stack: ExitStack, src, fp) -> Optional[rasterio.DatasetReader]:
+    """Open a context layer, None if it is missing or not on the flood grid."""
+    if fp is None:
+        return None
+    layer = stack.enter_context(rasterio.open(fp))
+    if layer.shape != src.shape or layer.transform != src.transform:
+        logger.warning(f"Layer {fp} is not aligned with {src.name}, ignored")
+        return None
+    return layer
+
+
+def layer_stack_statistics(
+    flood_fp,
+    exclusion_fp=None,
+    observed_water_fp=None,
+    uncertainty_fp=None,
+    aoi: Optional[str] = None,
+    projector: Optional[AOIProjector] = None,
+    detailed: bool = False,
+) -> Dict[str, float]:
+    """
+    Flood metrics from the flood extent and its context layers, read
+    together block by block (within the AOI if given) in a single pass:
+    flooded pixels without the exclusion mask, reference water, and the
+    mean uncertainty and confidence-weighted area of the valid flood.
+    The flood extent already excludes reference water (see
+    `kernels.layer_stack_counts`), so only the exclusion mask is removed.
+
+    `detailed=True` adds the non-flooded and nodata pixel counts and, when
+    the uncertainty layer is read, the valid flooded pixels per uncertainty
+    class (`uncertainty_<lo>_<hi>`), from the same pass.
+    """
+    aois = [aoi] if aoi is not None else None
+    return layer_stack_statistics_aois(
+        flood_fp, exclusion_fp, observed_water_fp, uncertainty_fp, aois, projector, detailed
+    )[0]
+
+
+def layer_stack_statistics_aois(
+    flood_fp,
+    exclusion_fp=None,
+    observed_water_fp=None,
+    uncertainty_fp=None,
+    aois: Optional[Sequence[str]] = None,
+    projector: Optional[AOIProjector] = None,
+    detailed: bool = False,
+) -> List[Dict[str, float]]:
+    """
+    `layer_stack_statistics` for several AOIs (None: the whole tile), every
+    block of the stack being read once for all AOIs it overlaps.
+    """
+    n_results = len(aois) if aois is not None else 1
+    accumulators = [new_layer_accumulators() for _ in range(n_results)]
+
+    with ExitStack() as stack:
+        src = stack.enter_context(rasterio.open(flood_fp))
+        layers = [
+            _open_aligned(stack, src, fp)
+            for fp in (exclusion_fp, observed_water_fp, uncertainty_fp)
+        ]
+
+        has_uncertainty = layers[2] is not None
+
+        if aois is None:
+            blocks = ((block, [(0, None)]) for block in iter_blocks(src))
+        else:
+            blocks = iter_aoi_blocks(src, [projector.get(aoi, src.crs) for aoi in aois])
+
+        for block, masks in blocks:
+            flood = src.read(1, window=block)
+            data = [
+                layer.read(1, window=block) if layer is not None else None
+                for layer in layers
+            ]
+            for k, mask in masks:
+                layer_stack_counts(flood, *data, mask, *accumulators[k])
+
+    return [
+        _layer_stack_stats(counts, sums, uhist, has_uncertainty, detailed)
+        for counts, sums, uhist in accumulators
+    ]
+
+
+def _layer_stack_stats(
+    counts, sums, uhist, has_uncertainty: bool, detailed: bool
+) -> Dict[str, float]:
+    c = dict(zip(LAYER_COUNTS, counts.tolist()))
+    s = dict(zip(LAYER_SUMS, sums.tolist()))
+    n_uncertainty = c["uncertainty_pixels"]
+
+    stats = {
+        "pixel_count": c["flooded"],
+        "area_km2": pixels_to_km2(c["flooded"]),
+        "flooded_valid_pixels": c["flooded_valid"],
+        "flooded_valid_area_km2": pixels_to_km2(c["flooded_valid"]),
+        "excluded_pixels": c["excluded"],
+        "reference_water_pixels": c["reference_water"],
+        "valid_pixels": c["valid"],
+        "mean_uncertainty": s["uncertainty"] / n_uncertainty if n_uncertainty else np.nan,
+        "confidence_weighted_area_km2": (
+            pixels_to_km2(s["confidence"]) if has_uncertainty else np.nan
+        ),
+    }
+    if detailed:
+        stats["non_flooded_pixels"] = c["valid"] - c["flooded"]
+        stats["nodata_pixels"] = c["nodata"]
+        if has_uncertainty:
+            stats.update(uncertainty_histogram_stats(uhist))
+    return stats
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import shapely
+from shapely.geometry import Polygon
+
+from .sqlite_utils import connect
+
+logger = logging.getLogger("gfm_logger")
+
+# Entries kept before the least recently used ones are evicted
+DEFAULT_MAX_ENTRIES = 2_000_000
+# Rows written between two eviction checks (each check counts the table)
+EVICT_CHECK_ROWS = 50_000
+# Paths per lookup query, below SQLite's bound parameter limit
+LOOKUP_CHUNK = 900
+
+# (path, size, mtime_ns, aoi_hash, kind); aoi_hash is "" for whole-tile metrics
+MetricKey = Tuple[str, int, int, str, str]
+
+
+def aoi_hash(polygon: Optional[Polygon]) -> str:
+    """Stable hash of an AOI geometry ("" for whole-tile metrics)."""
+    if polygon is None:
+        return ""
+    return hashlib.sha1(shapely.to_wkb(polygon)).hexdigest()[:16]
+
+
+def metric_key(fp: Union[str, Path], kind: str, aoi: str = "") -> Optional[MetricKey]:
+    """Cache key of a file's metric, None if the file cannot be stat'ed."""
+    try:
+        stat = os.stat(fp)
+    except OSError:
+        return None
+    return (os.path.abspath(fp), stat.st_size, stat.st_mtime_ns, aoi, kind)
+
+
+def files_kind(prefix: str, files: Iterable[Optional[Union[str, Path]]]) -> str:
+    """
+    Cache kind of a result that also depends on other files (e.g. context
+    layers): `prefix` plus a hash of their paths, sizes and mtimes, None for
+    missing files, so replacing or adding one of them invalidates it.
+    """
+    signature = []
+    for fp in files:
+        if fp is None:
+            signature.append(None)
+            continue
+        try:
+            stat = os.stat(fp)
+            signature.append((os.path.abspath(fp), stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append((os.path.abspath(fp), None, None))
+    digest = hashlib.sha1(json.dumps(signature).encode()).hexdigest()[:16]
+    return f"{prefix}_{digest}"
+
+
+class MetricCache:
+    """
+    Persistent per-file (and per-file-per-AOI) metric results.
+
+    GFM files are immutable once written, so a result stays valid as long as
+    the file keeps its path, size and mtime. Only successful results are
+    stored; the least recently used entries are evicted beyond
+    `max_entries` (checked every `EVICT_CHECK_ROWS` written rows).
+    """
+
+    def __init__(self, db_path: Union[str, Path], max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._unchecked_rows = 0
+        self.conn = connect(db_path)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS metrics ("
+            "path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "aoi TEXT NOT NULL, kind TEXT NOT NULL, value TEXT NOT NULL, "
+            "last_used REAL NOT NULL, PRIMARY KEY (path, size, mtime_ns, aoi, kind));"
+            "CREATE INDEX IF NOT EXISTS metrics_last_used ON metrics (last_used);"
+        )
+        self.conn.commit()
+
+    def get_many(self, keys: Iterable[Optional[MetricKey]]) -> Dict[MetricKey, Any]:
+        """Cached values of the given keys; misses are absent from the result."""
+        wanted = {k for k in keys if k is not None}
+        paths = sorted({key[0] for key in wanted})
+
+        found = {}
+        for i in range(0, len(paths), LOOKUP_CHUNK):
+            chunk = paths[i : i + LOOKUP_CHUNK]
+            rows = self.conn.execute(
+                "SELECT path, size, mtime_ns, aoi, kind, value FROM metrics "
+                f"WHERE path IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            for *key, value in rows:
+                key = tuple(key)
+                if key in wanted:
+                    found[key] = json.loads(value)
+
+        if found:
+            now = time.time()
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE metrics SET last_used = ? "
+                    "WHERE path = ? AND size = ? AND mtime_ns = ? AND aoi = ? AND kind = ?",
+                    [(now, *key) for key in found],
+                )
+        return found
+
+    def put_many(self, items: Dict[MetricKey, Any]):
+        if not items:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(*key, json.dumps(value), now) for key, value in items.items()],
+            )
+        self._unchecked_rows += len(items)
+        if self._unchecked_rows >= EVICT_CHECK_ROWS:
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used entries beyond `max_entries`."""
+        self._unchecked_rows = 0
+        (n_entries,) = self.conn.execute("SELECT COUNT(*) FROM metrics").fetchone()
+        excess = n_entries - self.max_entries
+        if excess <= 0:
+            return
+
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM metrics WHERE rowid IN "
+                "(SELECT rowid FROM metrics ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+        logger.debug(f"Metric cache: evicted {excess} entries")
+
+    def close(self):
+        self.conn.close()
+
+
+def cached_run(
+    cache: Optional[MetricCache],
+    keys: List[Optional[MetricKey]],
+    compute,
+) -> List[Tuple[Any, Optional[str]]]:
+    """
+    `(value, error)` for every key: cached values are reused and `compute`
+    is called with the indices of the misses only (returning their
+    `(value, error)` in the same order). Successful results are stored.
+    """
+    if cache is None:
+        return compute(list(range(len(keys))))
+
+    cached = cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+
+    results: List[Tuple[Any, Optional[str]]] = [
+        (cached.get(key), None) for key in keys
+    ]
+    if missing:
+        computed = compute(missing)
+        new_items = {}
+        for i, (value, error) in zip(missing, computed):
+            results[i] = (value, error)
+            if error is None and value is not None and keys[i] is not None:
+                new_items[keys[i]] = value
+        cache.put_many(new_items)
+
+    logger.debug(f"Metric cache: {len(keys) - len(missing)} hits, {len(missing)} misses")
+    return results
@@ -1,72 +1,396 @@
-import csv
+import os
 from pathlib import Path
 from tqdm import tqdm
-import numpy as np
 import pandas as pd
+from functools import partial
+from typing import Optional
+
+from .composite import build_event_composites
+from .executors import MetricsExecutor
+from .layer_stack import (
+    STACK_LAYERS,
+    layer_stack_statistics,
+    layer_stack_statistics_aois,
+    match_layer_files,
+)
+from .metric_cache import MetricCache, aoi_hash, cached_run, files_kind, metric_key
+from .raster_stats import (
+    OVERVIEW_FACTOR,
+    AOIProjector,
+    approximate_flood_statistics,
+    approximate_flood_statistics_aois,
+    flood_metrics,
+    flood_metrics_in_aois,
+    flood_statistics,
+    flood_statistics_aois,
+)
+from .results_dataset import ResultsDataset
+from .status_store import StatusStore
+
+# "tile": count the whole tile, "aoi": read the AOI window and mask by the polygon,
+# "approx": estimate from overviews for triage
+METRICS_MODES = ("tile", "aoi", "approx")
+# Per-event triage summaries, in `results_dir/triage`
+TRIAGE_SUMMARY_DIR = "summaries"
+
+
+def _run_executor_jobs(
+    df,
+    executor: MetricsExecutor,
+    func,
+    polygons=None,
+    LOGGER=None,
+    cache: Optional[MetricCache] = None,
+    kind="metrics",
+    row_args=None,
+):
+    """
+    `(values, errors)` of `func` over the rows of `df`, per AOI if `polygons`.
+    `row_args` are extra arguments per row passed after the file path.
+    Rows with a result in `cache` under `kind` (one or one per row) are not
+    recomputed.
+
+    Rows are grouped by file, so each file is read once. With `polygons`,
+    `func` is a multi-AOI variant (`func(fp, *args, aois, projector)`
+    returning one result per AOI) evaluating all AOIs of a file at once.
+    """
+    filepaths = list(df["filepath"])
+    kinds = kind if isinstance(kind, list) else [kind] * len(filepaths)
+    row_args = row_args if row_args is not None else [()] * len(filepaths)
 
-from concurrent.futures import ThreadPoolExecutor
-import numpy as np
-import pandas as pd
-import rasterio
-from pathlib import Path
+    if polygons is None:
+        jobs = [(fp, *args) for fp, args in zip(filepaths, row_args)]
+        keys = [metric_key(fp, k) for fp, k in zip(filepaths, kinds)]
+
+        def _compute(indices):
+            # rows of the same file (and context layers) share one job
+            unique = list(dict.fromkeys(jobs[i] for i in indices))
+            results = dict(zip(unique, executor.map(func, unique)))
+            return [results[jobs[i]] for i in indices]
+
+    else:
+        projector = AOIProjector(polygons)
+        projectors = {}
+        hashes = {label: aoi_hash(poly) for label, poly in polygons.items()}
+        aois = list(df["aoi"])
+        jobs = [(fp, *args) for fp, args in zip(filepaths, row_args)]
+        keys = [
+            metric_key(fp, k, hashes[aoi]) for fp, k, aoi in zip(filepaths, kinds, aois)
+        ]
+
+        def _compute(indices):
+            # one job per file (and context layers): all of its AOIs at once,
+            # identical AOIs (e.g. of different events) evaluated once
+            groups = {}
+            for i in indices:
+                rows = groups.setdefault(jobs[i], {})
+                rows.setdefault(hashes[aois[i]], (aois[i], []))[1].append(i)
+
+            # each job carries only its own AOIs, not the whole batch's
+            group_jobs = []
+            for job, rows in groups.items():
+                labels = tuple(label for label, _ in rows.values())
+                if labels not in projectors:
+                    projectors[labels] = projector.subset(labels)
+                group_jobs.append((*job, labels, projectors[labels]))
+            group_results = executor.map(func, group_jobs)
+
+            by_index = {}
+            for rows, (values, error) in zip(groups.values(), group_results):
+                for k, (_, row_indices) in enumerate(rows.values()):
+                    value = values[k] if error is None else None
+                    for i in row_indices:
+                        by_index[i] = (value, error)
+            return [by_index[i] for i in indices]
+
+    results = cached_run(cache, keys, _compute)
+    errors = [r[1] for r in results]
+
+    if LOGGER:
+        for (fp, *_), error in zip(jobs, errors):
+            if error is not None:
+                LOGGER.warning(f"GeoTIFF error for {fp}: {error}")
+
+    return [r[0] for r in results], errors
+
+
+def _add_stats_columns(df, values, errors):
+    df = df.copy()
+    stats = pd.DataFrame([v or {} for v in values], index=df.index)
+    for column in stats.columns:
+        df[column] = stats[column]
+    df["error"] = errors
+    return df
 
 
-def _process_file(fp):
-    try:
-        with rasterio.open(fp) as src:
-            data = src.read(1)
-            flooded_pixels = int(np.count_nonzero(data == 1))
-            area_km2 = flooded_pixels * 400 / 1e6
-            return flooded_pixels, area_km2
-    except:
-        return None, None
+def add_flood_metrics_executor(
+    df,
+    executor: MetricsExecutor,
+    polygons=None,
+    LOGGER=None,
+    detailed=False,
+    cache: Optional[MetricCache] = None,
+):
+    """
+    Adds pixel_count, area_km2 and error columns, running the per-file
+    metrics on `executor`. With `polygons` (AOI label -> polygon) only the
+    pixels inside each row's AOI are counted. `detailed=True` also adds the
+    non-flooded, nodata and valid pixel counts from the same pass.
+    """
+    if polygons is None:
+        func = flood_statistics if detailed else flood_metrics
+    else:
+        func = flood_statistics_aois if detailed else flood_metrics_in_aois
 
+    kind = "stats" if detailed else "metrics"
+    values, errors = _run_executor_jobs(df, executor, func, polygons, LOGGER, cache, kind)
 
-def add_flood_metrics_parallel(df, max_workers=8):
-    with ThreadPoolExecutor(max_workers=max_workers) as exe:
-        results = list(exe.map(_process_file, df["filepath"]))
+    if detailed:
+        return _add_stats_columns(df, values, errors)
 
+    values = [v or (None, None) for v in values]
     df = df.copy()
-    df["pixel_count"] = [r[0] for r in results]
-    df["area_km2"] = [r[1] for r in results]
+    df["pixel_count"] = [v[0] for v in values]
+    df["area_km2"] = [v[1] for v in values]
+    df["error"] = errors
 
     return df
 
 
-def add_flood_metrics(df, LOGGER=None):
+def add_flood_estimates(
+    df,
+    executor: MetricsExecutor,
+    polygons=None,
+    LOGGER=None,
+    overview_factor=OVERVIEW_FACTOR,
+    overview_cache_dir=None,
+    cache: Optional[MetricCache] = None,
+):
+    """
+    Adds estimated pixel_count/area_km2 with an area_km2_error bound, read
+    from GeoTIFF overviews (see `approximate_flood_statistics`).
+    """
+    func = partial(
+        approximate_flood_statistics if polygons is None else approximate_flood_statistics_aois,
+        factor=overview_factor,
+        cache_dir=overview_cache_dir,
+    )
+    kind = f"approx_{overview_factor}"
+    values, errors = _run_executor_jobs(df, executor, func, polygons, LOGGER, cache, kind)
+    return _add_stats_columns(df, values, errors)
+
+
+def add_layer_metrics(
+    df,
+    layer_files,
+    executor: MetricsExecutor,
+    polygons=None,
+    LOGGER=None,
+    cache: Optional[MetricCache] = None,
+    detailed=False,
+):
+    """
+    Adds flood metrics computed jointly with the context layers of the same
+    tile and timestamp (`layer_files`: layer name -> files, see
+    `layer_stack.STACK_LAYERS`) in one block-wise pass per file: flooded
+    pixels outside the exclusion mask, reference water, mean uncertainty
+    and confidence-weighted area, plus pixel_count/area_km2.
+    `detailed=True` also adds the non-flooded and nodata pixel counts and
+    the uncertainty class counts (see `layer_stack_statistics`).
+    """
+    matched = match_layer_files(list(df["filepath"].unique()), layer_files)
+    matched = matched.set_index("filepath")
+
+    row_args = [tuple(matched.loc[fp, list(STACK_LAYERS)]) for fp in df["filepath"]]
+    # results depend on which context layers were found, and on their contents
+    prefix = "layers_detailed" if detailed else "layers"
+    layer_kinds = {args: files_kind(prefix, args) for args in set(row_args)}
+    kinds = [layer_kinds[args] for args in row_args]
+
+    func = layer_stack_statistics if polygons is None else layer_stack_statistics_aois
+    values, errors = _run_executor_jobs(
+        df,
+        executor,
+        partial(func, detailed=detailed),
+        polygons,
+        LOGGER,
+        cache,
+        kinds,
+        row_args,
+    )
+    return _add_stats_columns(df, values, errors)
+
+
+def read_triage_summary(results_dir: Path) -> pd.DataFrame:
+    """Event level triage estimates (one row per event and algorithm), largest area first."""
+    paths = sorted((Path(results_dir) / "triage" / TRIAGE_SUMMARY_DIR).glob("*.csv"))
+    if not paths:
+        return pd.DataFrame()
+    summary = pd.concat([pd.read_csv(p) for p in paths], ignore_index=True)
+    return summary.sort_values("area_km2", ascending=False, ignore_index=True)
+
+
+def export_triage_summary(results_dir: Path) -> Path:
+    """Write `triage/triage_summary.csv`, to rank events before running the exact path."""
+    path = Path(results_dir) / "triage" / "triage_summary.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    read_triage_summary(results_dir).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def summarize_triage(event_df) -> dict:
+    """Event level flood area estimate; per-file errors are summed as a worst case."""
+    return {
+        "n_files": len(event_df),
+        "area_km2": float(event_df["area_km2"].sum()),
+        "area_km2_error": float(event_df["area_km2_error"].sum()),
+        "max_file_area_km2": float(event_df["area_km2"].max()),
+    }
+
+
+def add_flood_metrics_parallel(df, max_workers=8, LOGGER=None, cache=None):
+    with MetricsExecutor("threads", max_workers=max_workers) as executor:
+        return add_flood_metrics_executor(df, executor, LOGGER=LOGGER, cache=cache)
+
+
+def add_flood_metrics(df, LOGGER=None, cache: Optional[MetricCache] = None):
     """
     Adds pixel_count and area_km2 columns to the DataFrame
     by reading each GeoTIFF in the 'filepath' column.
     Assumes 20 m resolution (400 m² per pixel).
+    Files with a result in `cache` (same path, size and mtime) are not opened.
     """
+    filepaths = list(df["filepath"])
+    keys = [metric_key(fp, "metrics") for fp in filepaths]
+
+    def _compute(indices):
+        results = []
+        for i in tqdm(indices):
+            fp = filepaths[i]
+            try:
+                # streamed block by block, fixed 20m pixel size
+                results.append((flood_metrics(fp), None))
+            except Exception as e:
+                if LOGGER:
+                    LOGGER.warning(f"GeoTIFF error for {fp}: {e}")
+                results.append((None, str(e)))
+        return results
+
+    values = [r[0] or (None, None) for r in cached_run(cache, keys, _compute)]
 
-    pixel_counts = []
-    areas = []
+    df = df.copy()
+    df["pixel_count"] = [v[0] for v in values]
+    df["area_km2"] = [v[1] for v in values]
 
-    for fp in tqdm(df["filepath"]):
-        try:
-            with rasterio.open(fp) as src:
-                data = src.read(1)
+    return df
 
-                flooded_pixels = int(np.count_nonzero(data == 1))
 
-                # Fixed 20m pixel size
-                area_km2 = flooded_pixels * 400 / 1e6
+def add_flood_metrics_aoi(
+    df, polygons, LOGGER=None, parallel=False, max_workers=8, cache=None
+):
+    """
+    Adds pixel_count and area_km2 columns counting only flooded pixels
+    inside the AOI polygon of each row (`aoi` column, `AOI_1`, ...).
+    `polygons` maps the AOI labels to their (lat, lon) polygons.
+    """
+    backend = "threads" if parallel else "serial"
+    with MetricsExecutor(backend, max_workers=max_workers) as executor:
+        return add_flood_metrics_executor(df, executor, polygons, LOGGER, cache=cache)
 
-                pixel_counts.append(flooded_pixels)
-                areas.append(area_km2)
 
-        except Exception as e:
-            if LOGGER:
-                LOGGER.warning(f"GeoTIFF error for {fp}: {e}")
-            pixel_counts.append(None)
-            areas.append(None)
+def event_file_table(event_id, dcs, LOGGER) -> pd.DataFrame:
+    """File registers of the event datacubes in one table, `aoi` = `AOI_<i>`."""
+    if not isinstance(dcs, list):
+        dcs = [dcs]
 
-    df = df.copy()
-    df["pixel_count"] = pixel_counts
-    df["area_km2"] = areas
+    # Collect file registers from all AOIs
+    dfs = []
+    for i, dc in enumerate(dcs, start=1):
+        df = dc.file_register.copy()
+        df["aoi"] = f"AOI_{i}"
+        dfs.append(df)
 
-    return df
+        LOGGER.info(
+            f"Event {event_id}: AOI {i} has {len(df)} images"
+        )
+
+    # Merge all AOIs into one dataframe
+    return pd.concat(dfs, ignore_index=True)
+
+
+def aoi_labels(polygons) -> dict:
+    """AOI label (`AOI_<i>`, as in `event_file_table`) -> polygon."""
+    return {f"AOI_{i}": poly for i, poly in enumerate(polygons, start=1)}
+
+
+def save_event_results(
+    event,
+    algorithm,
+    event_df,
+    results_dir: Path,
+    LOGGER,
+    aoi_polygons=None,
+    composite_dir=None,
+    status_store: Optional[StatusStore] = None,
+    results_dataset: Optional[ResultsDataset] = None,
+) -> str:
+    """
+    Write the per-file metrics of an event (to `results_dataset` if given,
+    else to `<event_id>_<algorithm>.csv`), its composites if
+    `composite_dir` and `aoi_polygons`, and its detected/missed status in
+    `status_store` (else in `processing_results.csv`). Returns the status.
+    """
+    event_id = event["GDACS_ID"]
+    country = event["country"]
+
+    if composite_dir is not None and aoi_polygons is None:
+        LOGGER.warning(f"Event {event_id}: No AOI polygons, flood composites skipped")
+    elif composite_dir is not None:
+        readable = event_df
+        if "error" in event_df.columns:
+            readable = event_df[event_df["error"].isna()]
+        composites = build_event_composites(
+            readable,
+            aoi_polygons,
+            Path(composite_dir),
+            f"{event_id}_{algorithm.value}",
+            LOGGER,
+        )
+        LOGGER.info(f"Event {event_id}: Wrote {len(composites)} flood composites")
+
+    # Add event metadata
+    event_df["event_id"] = event_id
+    event_df["country"] = country
+
+    if results_dataset is not None:
+        results_dataset.write_event(event, algorithm, event_df)
+    else:
+        # Save CSV
+        results_dir.mkdir(parents=True, exist_ok=True)
+        csv_path = results_dir / f"{event_id}_{algorithm.value}.csv"
+        event_df.to_csv(csv_path, index=False)
+
+    if event_df["pixel_count"].sum() == 0:
+        status = "missed"
+        LOGGER.warning(f"{country} ({event_id}): No flooded pixels detected.")
+    else:
+        status = "detected"
+        LOGGER.info(f"{country} ({event_id}): Flood detected.")
+
+    # Update processing results table
+    if status_store is not None:
+        status_store.set(event_id, algorithm, status)
+    else:
+        results_df_path = results_dir / "processing_results.csv"
+        results_df = pd.read_csv(results_df_path)
+        results_df.loc[results_df["GDACS_ID"] == event_id, "processed"] = True
+        results_df.loc[results_df["GDACS_ID"] == event_id, algorithm.value] = status
+        results_df.to_csv(results_df_path, index=False)
+
+    LOGGER.info(f"Event {event_id}: Processing completed")
+    return status
 
 
 def process_event(
@@ -77,11 +401,57 @@ def process_event(
     LOGGER,
     parallel=False,
     max_workers=8,
+    metrics_mode="tile",
+    polygons=None,
+    executor: Optional[MetricsExecutor] = None,
+    detailed=False,
+    overview_factor=OVERVIEW_FACTOR,
+    overview_cache_dir=None,
+    metric_cache: Optional[MetricCache] = None,
+    layer_files=None,
+    composite_dir=None,
+    status_store: Optional[StatusStore] = None,
+    results_dataset: Optional[ResultsDataset] = None,
 ):
     """
     Process a single flood event using file-based metrics.
     Computes flood area per file and saves results to CSV.
+
+    With `metrics_mode="aoi"` only the AOI window of each file is read and
+    masked by the AOI polygon; `polygons` must then be aligned with `dcs`
+    (see `filter_datacube_by_event(..., return_polygons=True)`).
+
+    An `executor` (serial, threads or processes) takes precedence over
+    `parallel`/`max_workers` and adds a per-file `error` column;
+    `detailed=True` then also records non-flooded, nodata and valid pixels.
+
+    `metrics_mode="approx"` is a triage mode: areas are estimated from
+    overviews decimated by `overview_factor` (AOI-masked if `polygons` are
+    given), written to `results_dir/triage` with an error bound, and the
+    processing status is left untouched. Returns the event summary.
+
+    Files with results in `metric_cache` (same path, size, mtime and AOI)
+    are not read again.
+
+    With `layer_files` (exclusion, observed_water and uncertainty files of
+    the event) the flood extent is read together with its context layers
+    (see `add_layer_metrics`) instead of on its own; `detailed=True` then
+    adds the uncertainty class counts as well.
+
+    With `composite_dir` a maximum extent / first flooded / flooded count
+    COG is written per AOI (`<event_id>_<algorithm>_<AOI>.tif`), whatever
+    the metrics mode; this needs the AOI `polygons` (skipped with a warning
+    otherwise) and reads the flood files a second time, so it is opt-in.
+
+    The detected/missed status goes to `status_store` if given, else it is
+    written into `results_dir/processing_results.csv`. With
+    `results_dataset` the per-file metrics are appended to the Parquet
+    dataset instead of a per-event CSV.
     """
+    if metrics_mode not in METRICS_MODES:
+        raise ValueError(f"Unknown metrics mode: {metrics_mode}")
+    if metrics_mode == "aoi" and polygons is None:
+        raise ValueError("metrics_mode='aoi' requires the AOI polygons")
 
     event_id = event["GDACS_ID"]
     country = event["country"]
@@ -92,60 +462,133 @@ def process_event(
         LOGGER.warning(f"Event {event_id}: No GFM data available")
         return
 
-    if not isinstance(dcs, list):
-        dcs = [dcs]
-
-    # Collect file registers from all AOIs
-    dfs = []
-    for i, dc in enumerate(dcs, start=1):
-        df = dc.file_register.copy()
-        df["aoi"] = f"AOI_{i}"
-        dfs.append(df)
-
-        LOGGER.info(
-            f"Event {event_id}: AOI {i} has {len(df)} images"
-        )
+    event_df = event_file_table(event_id, dcs, LOGGER)
 
-    # Merge all AOIs into one dataframe
-    event_df = pd.concat(dfs, ignore_index=True)
-     
     # Compute flood metrics
     LOGGER.info(f"Event {event_id}: Starting flood metrics computation")
 
-    if parallel:
+    aoi_polygons = None
+    if polygons is not None and metrics_mode in ("aoi", "approx"):
+        aoi_polygons = aoi_labels(polygons)
+
+    if metrics_mode == "approx":
+        return _triage_event(
+            event,
+            algorithm,
+            event_df,
+            results_dir,
+            LOGGER,
+            executor or MetricsExecutor("serial"),
+            aoi_polygons,
+            overview_factor,
+            overview_cache_dir,
+            metric_cache,
+        )
+
+    if layer_files is not None:
+        LOGGER.info(f"Event {event_id}: Running joint flood/context layer metrics")
+        event_df = add_layer_metrics(
+            event_df,
+            layer_files,
+            executor or MetricsExecutor("serial"),
+            aoi_polygons,
+            LOGGER,
+            cache=metric_cache,
+            detailed=detailed,
+        )
+    elif executor is not None:
+        LOGGER.info(
+            f"Event {event_id}: Running {metrics_mode} flood metrics on "
+            f"{executor.backend} executor (max_workers={executor.max_workers})"
+        )
+        event_df = add_flood_metrics_executor(
+            event_df, executor, aoi_polygons, LOGGER, detailed=detailed, cache=metric_cache
+        )
+    elif metrics_mode == "aoi":
+        LOGGER.info(f"Event {event_id}: Running AOI-masked flood metrics")
+        event_df = add_flood_metrics_aoi(
+            event_df,
+            aoi_polygons,
+            LOGGER,
+            parallel=parallel,
+            max_workers=max_workers,
+            cache=metric_cache,
+        )
+    elif parallel:
         LOGGER.info(
             f"Event {event_id}: Running flood metrics in parallel "
             f"(max_workers={max_workers})"
         )
-        event_df = add_flood_metrics_parallel(event_df, max_workers=max_workers)
+        event_df = add_flood_metrics_parallel(
+            event_df, max_workers=max_workers, LOGGER=LOGGER, cache=metric_cache
+        )
     else:
         LOGGER.info(f"Event {event_id}: Running flood metrics in single-threaded mode")
-        event_df = add_flood_metrics(event_df, LOGGER)
-    
+        event_df = add_flood_metrics(event_df, LOGGER, cache=metric_cache)
+
+    # composites are per AOI in every metrics mode
+    save_event_results(
+        event,
+        algorithm,
+        event_df,
+        results_dir,
+        LOGGER,
+        aoi_labels(polygons) if polygons is not None else None,
+        composite_dir,
+        status_store,
+        results_dataset,
+    )
+
+
+def _triage_event(
+    event,
+    algorithm,
+    event_df,
+    results_dir: Path,
+    LOGGER,
+    executor: MetricsExecutor,
+    aoi_polygons,
+    overview_factor,
+    overview_cache_dir,
+    metric_cache=None,
+):
+    event_id = event["GDACS_ID"]
+    country = event["country"]
 
-    # Add event metadata
+    LOGGER.info(
+        f"Event {event_id}: Estimating flood area from overviews "
+        f"(factor={overview_factor})"
+    )
+    event_df = add_flood_estimates(
+        event_df,
+        executor,
+        aoi_polygons,
+        LOGGER,
+        overview_factor=overview_factor,
+        overview_cache_dir=overview_cache_dir or results_dir / "overview_cache",
+        cache=metric_cache,
+    )
     event_df["event_id"] = event_id
     event_df["country"] = country
 
-    # Save CSV
-    results_dir.mkdir(parents=True, exist_ok=True)
-    csv_path = results_dir / f"{event_id}_{algorithm.value}.csv"
-    event_df.to_csv(csv_path, index=False)
-
-    # Update processing results table
-    results_df_path = results_dir / "processing_results.csv"
-    results_df = pd.read_csv(results_df_path)
-
-    if event_df["pixel_count"].sum() == 0:
-        status = "missed"
-        LOGGER.warning(f"{country} ({event_id}): No flooded pixels detected.")
-    else:
-        status = "detected"
-        LOGGER.info(f"{country} ({event_id}): Flood detected.")
-
-    results_df.loc[results_df["GDACS_ID"] == event_id, "processed"] = True
-    results_df.loc[results_df["GDACS_ID"] == event_id, algorithm.value] = status
-    results_df.to_csv(results_df_path, index=False)
-
-    LOGGER.info(f"Event {event_id}: Processing completed")
+    triage_dir = results_dir / "triage"
+    triage_dir.mkdir(parents=True, exist_ok=True)
+    event_df.to_csv(triage_dir / f"{event_id}_{algorithm.value}.csv", index=False)
+
+    summary = {"event_id": event_id, "country": country, "algorithm": algorithm.value}
+    summary.update(summarize_triage(event_df))
+
+    # one file per event and algorithm: reruns replace it, parallel workers never share one
+    summary_dir = triage_dir / TRIAGE_SUMMARY_DIR
+    summary_dir.mkdir(parents=True, exist_ok=True)
+    summary_path = summary_dir / f"{event_id}_{algorithm.value}.csv"
+    tmp_path = summary_path.with_suffix(f".{os.getpid()}.tmp")
+    pd.DataFrame([summary]).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, summary_path)
+
+    LOGGER.info(
+        f"{country} ({event_id}): estimated flood area "
+        f"{summary['area_km2']:.1f} ± {summary['area_km2_error']:.1f} km²"
+    )
+    return summary
 
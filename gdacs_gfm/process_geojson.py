@@ -1,153 +1,310 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import List, Union, Tuple
-from shapely.ops import transform
+from functools import lru_cache
+from typing import List, Optional, Union, Tuple
 import pyproj
 import json
-from shapely.geometry import Polygon, shape, Point
+import shapely
+from shapely.geometry import MultiPolygon, Polygon, box, shape, Point
+from shapely.geometry.polygon import orient
 from geospade.crs import SpatialRef
 from shapely.geometry import Polygon
 import numpy as np
 import logging
 
+from .aoi_cache import (
+    AOI_NO_FEATURES,
+    AOI_NO_POLYGON,
+    AOI_OK,
+    BBOX_TOLERANCE,
+    AOICache,
+    ToleranceCache,
+)
+from .metric_cache import aoi_hash
+
 logger = logging.getLogger("gfm_logger")
 
 
+# Equal-area CRS used to rank AOI polygons by size
+EQUAL_AREA_CRS = "EPSG:6933"
+MAX_AOI_POLYGONS = 5
+
+
+@lru_cache(maxsize=None)
+def _equal_area_transformer() -> pyproj.Transformer:
+    return pyproj.Transformer.from_crs("EPSG:4326", EQUAL_AREA_CRS, always_xy=True)
+
+
+def polygons_area_km2(polygons: Union[Polygon, List[Polygon], np.ndarray]) -> np.ndarray:
+    """
+    Area in km² of each (lon, lat) polygon, projected to an equal-area CRS
+    in a single vectorised call.
+    """
+    geoms = np.atleast_1d(np.asarray(polygons, dtype=object))
+    transformer = _equal_area_transformer()
+
+    def _project(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+
+    return shapely.area(shapely.transform(geoms, _project)) / 1_000_000
+
+
 def compute_polygons_area_km2(polygons: Union[Polygon, List[Polygon]]) -> float:
     """
-    Compute area in km² for a polygon or list of polygons.
+    Compute area in km² for an AOI polygon or list of polygons, in the
+    (lat, lon) order returned by `load_event_geojson`.
     """
     if isinstance(polygons, Polygon):
         polygons = [polygons]
 
-    # Project to Web Mercator (meters)
-    project = pyproj.Transformer.from_crs(
-        "EPSG:4326", "EPSG:3857", always_xy=True
-    ).transform
+    lonlat = shapely.transform(np.asarray(polygons, dtype=object), lambda c: c[:, ::-1])
+    return float(polygons_area_km2(lonlat).sum())
+
+
+def _exterior_rings(features: list) -> List[list]:
+    """Exterior ring coordinates of all Polygon / MultiPolygon parts."""
+    rings = []
+    for feature in features:
+        geom = feature.get("geometry")
+        if not geom:
+            continue
+
+        geom_type = geom.get("type")
+        coords = geom.get("coordinates")
+
+        if geom_type == "Polygon":
+            rings.append(coords[0])
+        elif geom_type == "MultiPolygon":
+            rings.extend(poly_coords[0] for poly_coords in coords)
+
+    return [ring for ring in rings if _is_ring(ring)]
+
 
-    total_area_m2 = 0.0
-    for poly in polygons:
-        poly_m = transform(project, poly)
-        total_area_m2 += poly_m.area
+def _is_ring(ring: list) -> bool:
+    """A closed ring needs 4 positions (3 distinct), an unclosed one 3."""
+    if len(ring) < 3:
+        return False
+    closed = list(ring[0][:2]) == list(ring[-1][:2])
+    return len(ring) >= (4 if closed else 3)
 
-    return total_area_m2 / 1_000_000  # km²
+
+def _parse_event_geojson(
+    event_id: str,
+    geojson_path: Path,
+) -> Tuple[str, Optional[List[Polygon]]]:
+    """Parse an event GeoJSON into `(status, (lat, lon) polygons)`."""
+    with geojson_path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    features = data.get("features", [])
+    if not features:
+        return AOI_NO_FEATURES, None
+
+    logger.info(f"Number of features in GeoJSON: {len(features)}")
+
+    rings = _exterior_rings(features)
+    if not rings:
+        return AOI_NO_POLYGON, None
+
+    # All exterior rings as one coordinate array (lon, lat)
+    coords = np.concatenate([np.asarray(ring, dtype=float)[:, :2] for ring in rings])
+    ring_index = np.repeat(np.arange(len(rings)), [len(ring) for ring in rings])
+
+    lonlat = shapely.polygons(shapely.linearrings(coords, indices=ring_index))
+
+    # Keep only the 5 largest polygons if more than 5 exist
+    keep = np.arange(len(lonlat))
+    if len(lonlat) > MAX_AOI_POLYGONS:
+        areas = polygons_area_km2(lonlat)
+        keep = np.argsort(-areas, kind="stable")[:MAX_AOI_POLYGONS]
+
+        logger.info(
+            f"Event ({event_id}): Reduced polygons to {MAX_AOI_POLYGONS} largest by area (km²)"
+        )
+
+    # GDACS AOIs are WGS84, stored (lat, lon) as expected by SpatialRef(4326)
+    return AOI_OK, list(shapely.transform(lonlat[keep], lambda c: c[:, ::-1]))
 
 
 def load_event_geojson(
     event_id: str,
     geojson_dir: Union[str, Path],
     point_buffer_radius: float = 0.1,
+    cache: Optional[AOICache] = None,
 ) -> Tuple[List[Polygon], SpatialRef]:
+    """
+    Load the (at most 5 largest) AOI polygons of an event.
 
+    With a `cache` the parsed polygons, or the fact that there are none, are
+    reused as long as the GeoJSON file keeps its mtime and size.
+    """
     geojson_path = Path(geojson_dir) / f"{event_id}.json"
     if not geojson_path.exists():
         raise FileNotFoundError(f"GeoJSON file not found: {geojson_path}")
 
-    with geojson_path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    cached = None
+    if cache is not None:
+        source_key = cache.source_key(geojson_path)
+        cached = cache.get(event_id, source_key)
 
-    features = data.get("features", [])
-    if not features:
+    if cached is None:
+        status, polygons = _parse_event_geojson(event_id, geojson_path)
+        if cache is not None:
+            cache.put(event_id, source_key, status, polygons)
+    else:
+        status, polygons = cached
+
+    if status == AOI_NO_FEATURES:
         raise ValueError(f"No features found in GeoJSON file: {geojson_path}")
+    if status == AOI_NO_POLYGON:
+        logger.warning(f"Event ({event_id}): No valid polygon found in GeoJSON")
+        return None, None
 
-    polygons: List[Polygon] = []
-    logger.info(f"Number of features in GeoJSON: {len(features)}")
+    sref = SpatialRef(4326)
 
-    for feature in features:
-        geom = feature.get("geometry")
-        geom_type = geom.get("type") if geom else None
-        geom_coords = geom.get("coordinates") if geom else None
-        if geom is None:
-            continue
+    return polygons, sref
 
-        if geom_type == "Point":
-            continue
 
-        if geom_type == "Polygon":
-            coor = geom_coords
-            polygons.append(Polygon((lat, lon) for lon, lat in coor[0]))
-            continue
+# --- GEOMETRY PREPARATION --->
+# Coordinate budget of a selection-ready AOI polygon
+MAX_AOI_COORDS = 2000
+BUDGET_TOLERANCES = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
 
-        if geom_type == "MultiPolygon":
-            coor = geom_coords
-            for poly_coor in coor:
-                polygons.append(Polygon((lat, lon) for lon, lat in poly_coor[0]))
-            continue
 
-    if not polygons:
-        logger.warning(f"Event ({event_id}): No valid polygon found in GeoJSON")
-        return None, None
+def prepare_aoi_geometry(
+    poly: Polygon,
+    max_coords: int = MAX_AOI_COORDS,
+) -> Union[Polygon, MultiPolygon]:
+    """
+    Turn an AOI polygon into a selection-ready geometry once per event:
+    repair invalid rings, orient the exterior counter-clockwise in
+    (lon, lat) and simplify until it fits the coordinate budget.
 
-    # Keep only the 5 largest polygons if more than 5 exist
-    if len(polygons) > 5:
-        polygons_with_area = [
-            (poly, compute_polygons_area_km2(poly)) for poly in polygons
+    An invalid polygon that `make_valid` splits stays whole as a
+    MultiPolygon of its polygonal parts (repaired lines and points have no
+    area), so the flood metrics still cover all of it.
+    """
+    geom = poly if poly.is_valid else shapely.make_valid(poly)
+
+    if not isinstance(geom, Polygon):
+        parts = [
+            q
+            for p in shapely.get_parts(geom)
+            if isinstance(p, (Polygon, MultiPolygon))
+            for q in shapely.get_parts(p)
         ]
-        polygons_with_area.sort(key=lambda x: x[1], reverse=True)
-        polygons = [poly for poly, _ in polygons_with_area[:5]]
+        if not parts:
+            return poly
+        geom = parts[0] if len(parts) == 1 else MultiPolygon(parts)
+        if len(parts) > 1:
+            logger.info(f"AOI polygon repaired into {len(parts)} parts, all kept")
 
-        logger.info(
-            f"Event ({event_id}): Reduced polygons to 5 largest by area (km²)"
-        )
+    # counter-clockwise in (lon, lat) is clockwise in the stored (lat, lon) order
+    if isinstance(geom, MultiPolygon):
+        geom = MultiPolygon([orient(p, sign=-1.0) for p in geom.geoms])
+    else:
+        geom = orient(geom, sign=-1.0)
 
-    # GDACS AOIs are WGS84
-    sref = SpatialRef(4326)
+    for tolerance in BUDGET_TOLERANCES:
+        if shapely.get_num_coordinates(geom) <= max_coords:
+            break
+        geom = geom.simplify(tolerance, preserve_topology=True)
 
-    return polygons, sref
+    return geom
 
 
+def prepare_event_aois(
+    polygons: List[Polygon],
+    max_coords: int = MAX_AOI_COORDS,
+) -> List[Union[Polygon, MultiPolygon]]:
+    return [prepare_aoi_geometry(poly, max_coords) for poly in polygons]
 
 
 # --- DATA CUBE FILTERING --->
-def filterby_dc_poly(dc, poly, sref, event_id, LOGGER=None):
-    try:
-        dc_sel = dc.select_polygon(poly, sref)
-
-    except Exception as e:
-        if LOGGER:
-            LOGGER.info(
-                f"Event ({event_id}): polygon selection failed, "
-                f"trying simplification. Error: {e}"
-            )
+def _bbox_polygon(poly: Polygon) -> Polygon:
+    minx, miny, maxx, maxy = poly.bounds
+    return box(minx, miny, maxx, maxy)
 
-        dc_sel = None
 
-        # progressively simplify geometry
-        for tolerance in (0.01 * i for i in range(1, 11)):
-            try:
-                poly_simplified = poly.simplify(tolerance, preserve_topology=False)
-                dc_sel = dc.select_polygon(poly_simplified, sref)
-                if dc_sel is not None:
-                    break
-            except Exception:
-                continue
+def _select_polygon_ladder(dc, poly, sref, event_id, LOGGER=None, first=None):
+    """
+    Try the polygon, progressively simplified versions of it and finally its
+    bounding box. `first` (a cached tolerance) is tried before the ladder.
+    Returns the selection and the tolerance that worked.
+    """
+    ladder = [0.0] + [0.01 * i for i in range(1, 11)] + [BBOX_TOLERANCE]
+    if first is not None:
+        ladder = [first] + [t for t in ladder if t != first]
 
-        # final fallback → bounding box
-        if dc_sel is None:
+    for tolerance in ladder:
+        if tolerance == BBOX_TOLERANCE:
             if LOGGER:
                 LOGGER.warning(
                     f"Event ({event_id}): Simplification failed, using bounding box"
                 )
+            geom = _bbox_polygon(poly)
+        elif tolerance == 0.0:
+            geom = poly
+        else:
+            geom = poly.simplify(tolerance, preserve_topology=False)
+
+        try:
+            dc_sel = dc.select_polygon(geom, sref)
+        except Exception as e:
+            if LOGGER and tolerance == 0.0:
+                LOGGER.info(
+                    f"Event ({event_id}): polygon selection failed, "
+                    f"trying simplification. Error: {e}"
+                )
+            continue
 
-            x, y = poly.exterior.coords.xy
-            bbox = Polygon(
-                [
-                    (min(x), min(y)),
-                    (max(x), min(y)),
-                    (max(x), max(y)),
-                    (min(x), max(y)),
-                ]
-            )
+        if dc_sel is not None:
+            return dc_sel, tolerance
+
+    if LOGGER:
+        LOGGER.warning(f"Event ({event_id}): Bounding box selection failed")
+    return None, None
+
+
+def filterby_dc_poly(
+    dc,
+    poly,
+    sref,
+    event_id,
+    LOGGER=None,
+    require_reduction=True,
+    tolerance_cache: Optional[ToleranceCache] = None,
+    aoi_index: int = 0,
+):
+    """
+    Select the part of the datacube covered by `poly`.
+
+    With `require_reduction=True` a selection that keeps the whole cube is
+    treated as failed. Cubes already prefiltered to the AOI tiles
+    (see `tile_index.filter_images_by_aoi`) should pass False.
+
+    With a `tolerance_cache` the simplification tolerance that worked is
+    recorded per (event, AOI, AOI geometry) and tried first on the next run.
+    """
+    cached = None
+    if tolerance_cache is not None:
+        geom_hash = aoi_hash(poly)
+        cached = tolerance_cache.get(event_id, aoi_index, geom_hash)
+
+    dc_sel, tolerance = _select_polygon_ladder(
+        dc, poly, sref, event_id, LOGGER, first=cached
+    )
 
-            try:
-                dc_sel = dc.select_polygon(bbox, sref)
-            except Exception:
-                if LOGGER:
-                    LOGGER.warning(f"Event ({event_id}): Bounding box selection failed")
-                return None
+    if tolerance_cache is not None and tolerance is not None and tolerance != cached:
+        tolerance_cache.put(event_id, aoi_index, geom_hash, tolerance)
 
     # sanity check: selection actually reduced data
-    if dc_sel is None or len(dc_sel) == len(dc):
+    if (
+        dc_sel is None
+        or len(dc_sel) == 0
+        or (require_reduction and len(dc_sel) == len(dc))
+    ):
         if LOGGER:
             LOGGER.warning(
                 f"Event ({event_id}): AOI selection returned full cube or no data"
@@ -0,0 +1,352 @@
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio.enums import Resampling
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask, geometry_window
+from rasterio.windows import Window, union
+from shapely.geometry import Polygon, box, mapping
+
+from .kernels import accumulate_histogram, binned_counts, new_histogram
+from .tile_index import project_geometries
+
+logger = logging.getLogger("gfm_logger")
+
+# Fixed 20 m GFM pixel size
+PIXEL_AREA_M2 = 400
+FLOOD_VALUE = 1
+NON_FLOOD_VALUE = 0
+NODATA_VALUE = 255
+
+# Uncertainty classes [edge_k, edge_k+1) of the 0-100 uncertainty layer
+UNCERTAINTY_EDGES = (0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 101)
+
+# Decimation of the triage reads (8 -> 160 m pixels) and z-score of its error bound
+OVERVIEW_FACTOR = 8
+ERROR_Z = 1.96
+# Side-cache overviews of files without internal overviews (see `side_overview`)
+OVERVIEW_CACHE_DIR = Path(tempfile.gettempdir()) / "gfm_overview_cache"
+
+
+def pixels_to_km2(pixel_count: int) -> float:
+    return pixel_count * PIXEL_AREA_M2 / 1e6
+
+
+class AOIProjector:
+    """
+    Projects (lat, lon) AOI polygons to the CRS of the rasters they are
+    applied to, once per AOI and CRS.
+    """
+
+    def __init__(self, polygons: Dict[str, Polygon]):
+        self.polygons = polygons
+        self._projected: Dict[Tuple[str, str], Polygon] = {}
+
+    def get(self, aoi: str, crs) -> Polygon:
+        crs_key = crs.to_wkt() if hasattr(crs, "to_wkt") else str(crs)
+        key = (aoi, crs_key)
+        if key not in self._projected:
+            self._projected[key] = project_geometries(self.polygons[aoi], crs_key)[0]
+        return self._projected[key]
+
+    def subset(self, aois: Sequence[str]) -> "AOIProjector":
+        """Projector of the `aois` only (with their projections so far), to ship to a worker."""
+        sub = AOIProjector({aoi: self.polygons[aoi] for aoi in aois})
+        sub._projected = {
+            key: geom for key, geom in self._projected.items() if key[0] in sub.polygons
+        }
+        return sub
+
+
+def aoi_window(src, geom: Polygon) -> Optional[Window]:
+    """Pixel window of `src` covering the bounds of `geom` (in `src.crs`), None if disjoint."""
+    try:
+        window = geometry_window(src, [mapping(box(*geom.bounds))])
+    except WindowError:
+        return None
+    if window.width == 0 or window.height == 0:
+        return None
+    return window
+
+
+def aoi_mask(src, geom: Polygon, window: Window) -> np.ndarray:
+    """Boolean mask of the window pixels whose centre lies inside `geom`."""
+    return geometry_mask(
+        [geom],
+        out_shape=(int(window.height), int(window.width)),
+        transform=src.window_transform(window),
+        invert=True,
+    )
+
+
+def iter_blocks(src, window: Optional[Window] = None) -> Iterator[Window]:
+    """Internal blocks of band 1, clipped to `window` if given."""
+    for _, block in src.block_windows(1):
+        if window is not None:
+            try:
+                block = block.intersection(window)
+            except WindowError:
+                continue
+        yield block
+
+
+def iter_aoi_blocks(
+    src, geoms: List[Polygon]
+) -> Iterator[Tuple[Window, List[Tuple[int, np.ndarray]]]]:
+    """
+    Blocks of the union of the AOI windows, each with the `(index, mask)`
+    of the AOIs it overlaps, so every block is read once for all AOIs.
+    """
+    windows = [aoi_window(src, geom) for geom in geoms]
+    hits = [w for w in windows if w is not None]
+    if not hits:
+        return
+
+    for block in iter_blocks(src, union(*hits)):
+        masks = []
+        for k, (geom, window) in enumerate(zip(geoms, windows)):
+            if window is None:
+                continue
+            try:
+                block.intersection(window)
+            except WindowError:
+                continue
+            masks.append((k, aoi_mask(src, geom, block)))
+        if masks:
+            yield block, masks
+
+
+def value_histograms(src, geoms: List[Polygon]) -> List[np.ndarray]:
+    """`value_histogram` of several AOIs from a single read of each block."""
+    hists = [new_histogram() for _ in geoms]
+    for block, masks in iter_aoi_blocks(src, geoms):
+        data = src.read(1, window=block)
+        for k, mask in masks:
+            accumulate_histogram(data, hists[k], mask)
+    return hists
+
+
+def value_histogram(src, geom: Optional[Polygon] = None) -> np.ndarray:
+    """
+    Value counts (0-255) of band 1, optionally only inside `geom`.
+
+    The raster is streamed block by block (`block_windows`) and every block
+    is counted in a single JIT-compiled pass, so memory stays at one block
+    per call whatever the tile size.
+    """
+    if geom is not None:
+        return value_histograms(src, [geom])[0]
+
+    hist = new_histogram()
+    for block in iter_blocks(src):
+        accumulate_histogram(src.read(1, window=block), hist)
+    return hist
+
+
+def count_pixels(src, value: int = FLOOD_VALUE, geom: Optional[Polygon] = None) -> int:
+    """Pixels of band 1 equal to `value`, optionally only inside `geom`."""
+    return int(value_histogram(src, geom)[value])
+
+
+def count_flood_in_aoi(src, geom: Polygon) -> int:
+    """
+    Flooded pixels of band 1 inside `geom`.
+    Only the blocks of the AOI window are read, so I/O and memory scale with
+    the AOI size.
+    """
+    return count_pixels(src, FLOOD_VALUE, geom)
+
+
+def flood_metrics_in_aoi(fp, aoi: str, projector: AOIProjector):
+    """`(pixel_count, area_km2)` of a GeoTIFF within an AOI."""
+    with rasterio.open(fp) as src:
+        flooded_pixels = count_flood_in_aoi(src, projector.get(aoi, src.crs))
+    return flooded_pixels, pixels_to_km2(flooded_pixels)
+
+
+def flood_metrics_in_aois(fp, aois: Sequence[str], projector: AOIProjector):
+    """`flood_metrics_in_aoi` for several AOIs, reading the file once."""
+    with rasterio.open(fp) as src:
+        hists = value_histograms(src, [projector.get(aoi, src.crs) for aoi in aois])
+    return [(int(h[FLOOD_VALUE]), pixels_to_km2(int(h[FLOOD_VALUE]))) for h in hists]
+
+
+def flood_metrics(fp):
+    """`(pixel_count, area_km2)` of a whole GeoTIFF, streamed block by block."""
+    with rasterio.open(fp) as src:
+        flooded_pixels = count_pixels(src, FLOOD_VALUE)
+    return flooded_pixels, pixels_to_km2(flooded_pixels)
+
+
+def flood_histogram_stats(hist: np.ndarray, nodata: Optional[int] = None) -> Dict[str, float]:
+    """Flood extent metrics from a value histogram."""
+    nodata = NODATA_VALUE if nodata is None else int(nodata)
+    flooded = int(hist[FLOOD_VALUE])
+    return {
+        "pixel_count": flooded,
+        "area_km2": pixels_to_km2(flooded),
+        "non_flooded_pixels": int(hist[NON_FLOOD_VALUE]),
+        "nodata_pixels": int(hist[nodata]),
+        "valid_pixels": int(hist[FLOOD_VALUE] + hist[NON_FLOOD_VALUE]),
+    }
+
+
+def uncertainty_histogram_stats(hist: np.ndarray, edges=UNCERTAINTY_EDGES) -> Dict[str, int]:
+    """Pixel counts per uncertainty class, keyed `uncertainty_<lo>_<hi>`."""
+    counts = binned_counts(hist, edges)
+    return {
+        f"uncertainty_{lo:02d}_{hi - 1:02d}": int(n)
+        for lo, hi, n in zip(edges[:-1], edges[1:], counts)
+    }
+
+
+def flood_statistics(fp, aoi: Optional[str] = None, projector: Optional[AOIProjector] = None):
+    """
+    Flooded, non-flooded, nodata and valid pixel counts of a flood extent
+    GeoTIFF (within an AOI if given), from a single pass over its blocks.
+    """
+    with rasterio.open(fp) as src:
+        geom = projector.get(aoi, src.crs) if aoi is not None else None
+        hist = value_histogram(src, geom)
+        return flood_histogram_stats(hist, src.nodata)
+
+
+def flood_statistics_aois(fp, aois: Sequence[str], projector: AOIProjector):
+    """`flood_statistics` for several AOIs, reading the file once."""
+    with rasterio.open(fp) as src:
+        hists = value_histograms(src, [projector.get(aoi, src.crs) for aoi in aois])
+        return [flood_histogram_stats(hist, src.nodata) for hist in hists]
+
+
+# --- OVERVIEW TRIAGE --->
+def _overview_level(src, factor: int) -> Optional[int]:
+    """Index of the first internal overview decimating by at least `factor`."""
+    overviews = src.overviews(1)
+    if not overviews:
+        return None
+    for level, decimation in enumerate(overviews):
+        if decimation >= factor:
+            return level
+    return len(overviews) - 1
+
+
+def side_overview(fp, factor: int, cache_dir: Union[str, Path]) -> Path:
+    """
+    Nearest-neighbour decimated copy of a GeoTIFF, built once into
+    `cache_dir` and reused while the source keeps its mtime and size.
+    """
+    stat = os.stat(fp)
+    key = f"{os.path.abspath(fp)}|{stat.st_mtime_ns}|{stat.st_size}|{factor}"
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    path = Path(cache_dir) / digest[:2] / f"{digest}.tif"
+    if path.exists():
+        return path
+
+    with rasterio.open(fp) as src:
+        data, transform = _decimated_read(src, factor)
+        profile = src.profile.copy()
+
+    profile.update(
+        driver="GTiff",
+        width=data.shape[1],
+        height=data.shape[0],
+        count=1,
+        transform=transform,
+        tiled=True,
+        blockxsize=256,
+        blockysize=256,
+        compress="deflate",
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with rasterio.open(tmp_path, "w", **profile) as dst:
+        dst.write(data, 1)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _decimated_read(src, factor: int) -> Tuple[np.ndarray, Affine]:
+    out_shape = (max(1, src.height // factor), max(1, src.width // factor))
+    data = src.read(1, out_shape=out_shape, resampling=Resampling.nearest)
+    transform = src.transform * Affine.scale(
+        src.width / out_shape[1], src.height / out_shape[0]
+    )
+    return data, transform
+
+
+def _estimate_from_histogram(
+    hist: np.ndarray, scale: float, nodata: Optional[int], factor: float
+) -> Dict[str, float]:
+    """
+    Scale sampled counts to full resolution. The error bound treats the
+    overview pixels as a sample of the valid area (binomial standard error
+    at `ERROR_Z`); spatially clustered flooding makes it optimistic.
+    """
+    stats = flood_histogram_stats(hist, nodata)
+    n = stats["valid_pixels"]
+    p = stats["pixel_count"] / n if n else 0.0
+    error_pixels = float(ERROR_Z * np.sqrt(p * (1 - p) * n) * scale) if n else 0.0
+
+    estimate = {
+        key: int(round(value * scale)) for key, value in stats.items() if key != "area_km2"
+    }
+    estimate["area_km2"] = pixels_to_km2(estimate["pixel_count"])
+    estimate["area_km2_error"] = pixels_to_km2(error_pixels)
+    estimate["overview_factor"] = float(factor)
+    return estimate
+
+
+def approximate_flood_statistics(
+    fp,
+    aoi: Optional[str] = None,
+    projector: Optional[AOIProjector] = None,
+    factor: int = OVERVIEW_FACTOR,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> Dict[str, float]:
+    """
+    Estimated flood metrics of a flood extent GeoTIFF from a decimated read:
+    an internal overview if there is one, else a side-cache overview in
+    `cache_dir` (default `OVERVIEW_CACHE_DIR`), built on the first read.
+    Adds `area_km2_error` (about 95 %) and the decimation actually used.
+    """
+    aois = [aoi] if aoi is not None else None
+    return approximate_flood_statistics_aois(fp, aois, projector, factor, cache_dir)[0]
+
+
+def approximate_flood_statistics_aois(
+    fp,
+    aois: Optional[Sequence[str]],
+    projector: Optional[AOIProjector] = None,
+    factor: int = OVERVIEW_FACTOR,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> List[Dict[str, float]]:
+    """`approximate_flood_statistics` for several AOIs (None: whole file), one read."""
+    with rasterio.open(fp) as src:
+        level = _overview_level(src, factor)
+        full_pixels = src.width * src.height
+        nodata = src.nodata
+        geoms = [projector.get(aoi, src.crs) for aoi in aois] if aois is not None else None
+
+    if level is not None:
+        path, kwargs = fp, {"overview_level": level}
+    else:
+        # the full tile is decoded once, later triage runs read the side overview
+        path, kwargs = side_overview(fp, factor, cache_dir or OVERVIEW_CACHE_DIR), {}
+
+    with rasterio.open(path, **kwargs) as ov:
+        if geoms is None:
+            hists = [value_histogram(ov)]
+        else:
+            hists = value_histograms(ov, geoms)
+        scale = full_pixels / (ov.width * ov.height)
+    return [
+        _estimate_from_histogram(hist, scale, nodata, round(np.sqrt(scale), 2))
+        for hist in hists
+    ]
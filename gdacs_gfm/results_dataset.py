@@ -0,0 +1,237 @@
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger("gfm_logger")
+
+# Hive partitions of the dataset: <root>/algorithm=<algorithm>/year=<year>/
+PARTITIONING = ds.partitioning(
+    pa.schema([("algorithm", pa.string()), ("year", pa.int32())]), flavor="hive"
+)
+
+# Typed columns of every part; other metric columns keep their own types
+COLUMN_TYPES = {
+    "event_id": pa.string(),
+    "country": pa.string(),
+    "aoi": pa.string(),
+    "tile": pa.string(),
+    "time": pa.timestamp("s"),
+    "filepath": pa.string(),
+    "pixel_count": pa.int64(),
+    "area_km2": pa.float64(),
+    "error": pa.string(),
+    "written_at": pa.timestamp("ms"),
+}
+
+# Per-event parts are named after the event, so rewriting an event replaces its part
+EVENT_PART = "event-{event_id}.parquet"
+COMPACTED_PART = "part-{uid}.parquet"
+COMPACTING_SUFFIX = ".compacting"
+
+
+def _event_year(event, event_df: pd.DataFrame) -> int:
+    """Year partition of an event: its start date, else its first image time."""
+    fromdate = event.get("fromdate") if hasattr(event, "get") else None
+    if fromdate is not None and not pd.isna(fromdate):
+        return pd.Timestamp(fromdate).year
+    return int(_to_timestamps(event_df["time"]).min().year)
+
+
+def _to_timestamps(values: pd.Series) -> pd.Series:
+    """File register times (`20230801T000000` strings or datetimes) as timestamps."""
+    first = values.dropna().iloc[0] if values.notna().any() else None
+    if isinstance(first, str):
+        return pd.to_datetime(values, format="%Y%m%dT%H%M%S", errors="coerce")
+    return pd.to_datetime(values, errors="coerce")
+
+
+def results_table(event_df: pd.DataFrame, event_id) -> pa.Table:
+    """
+    Typed Arrow table of an event's per-file metrics: event_id, aoi, tile,
+    time and the metric columns. The file register algorithm is dropped
+    (it is the partition).
+    """
+    df = event_df.drop(columns=["algorithm"], errors="ignore").copy()
+    df = df.rename(columns={"tile_name": "tile"})
+    df["event_id"] = str(event_id)
+    if "time" in df.columns:
+        df["time"] = _to_timestamps(df["time"]).dt.floor("s")
+    df["written_at"] = pd.Timestamp.now().floor("ms")
+
+    fields = []
+    for column in df.columns:
+        if column in COLUMN_TYPES:
+            fields.append(pa.field(column, COLUMN_TYPES[column]))
+        elif "pixel" in column:
+            # pixel counts stay integers, also next to failed files
+            fields.append(pa.field(column, pa.int64()))
+        elif df[column].dtype == object or pd.api.types.is_string_dtype(df[column].dtype):
+            fields.append(pa.field(column, pa.string()))
+        else:
+            fields.append(pa.field(column, pa.from_numpy_dtype(df[column].dtype)))
+
+    for field in fields:
+        if pa.types.is_integer(field.type):
+            df[field.name] = df[field.name].astype("Int64")
+        elif pa.types.is_string(field.type):
+            df[field.name] = df[field.name].map(lambda v: None if pd.isna(v) else str(v))
+
+    return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+
+def _latest(table: pa.Table) -> pa.Table:
+    """Rows of the latest write of every event (reruns supersede older rows)."""
+    if table.num_rows == 0:
+        return table
+    keys = [k for k in ("event_id", "algorithm") if k in table.column_names]
+    latest = table.group_by(keys).aggregate([("written_at", "max")])
+    latest = latest.rename_columns(
+        ["latest_written_at" if name == "written_at_max" else name for name in latest.column_names]
+    )
+    table = table.join(latest, keys)
+    table = table.filter(pc.equal(table["written_at"], table["latest_written_at"]))
+    return table.drop_columns(["latest_written_at"])
+
+
+class ResultsDataset:
+    """
+    Per-file flood metrics of all events in one Parquet dataset partitioned
+    by algorithm and year, instead of one CSV per event.
+
+    Every event is written as its own small part (atomic rename, so writers
+    of different events never collide, and a rerun replaces the event's
+    part); `compact` merges the parts of each partition into one file so
+    cross-event queries read a few columnar files.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+
+    def partition_dir(self, algorithm, year: int) -> Path:
+        algorithm = getattr(algorithm, "value", algorithm)
+        return self.root / f"algorithm={algorithm}" / f"year={int(year)}"
+
+    def write_event(self, event, algorithm, event_df: pd.DataFrame) -> Path:
+        """Write (or replace) the per-file metrics of one event."""
+        event_id = event["GDACS_ID"]
+        directory = self.partition_dir(algorithm, _event_year(event, event_df))
+        directory.mkdir(parents=True, exist_ok=True)
+
+        path = directory / EVENT_PART.format(event_id=event_id)
+        tmp_path = directory / f".{path.name}.{os.getpid()}.tmp"
+        pq.write_table(results_table(event_df, event_id), tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def _files(self) -> List[Path]:
+        if not self.root.exists():
+            return []
+        return sorted(p for p in self.root.glob("algorithm=*/year=*/*.parquet"))
+
+    def dataset(self) -> Optional[ds.Dataset]:
+        """Arrow dataset over all parts (schemas unified), None if empty."""
+        files = self._files()
+        if not files:
+            return None
+        schema = pa.unify_schemas(
+            [pq.read_schema(fp) for fp in files], promote_options="permissive"
+        )
+        for field in PARTITIONING.schema:
+            schema = schema.append(field)
+        return ds.dataset(
+            [str(fp) for fp in files],
+            schema=schema,
+            partitioning=PARTITIONING,
+            partition_base_dir=str(self.root),
+        )
+
+    def read(self, columns: Optional[List[str]] = None, filter=None) -> pd.DataFrame:
+        """
+        Metrics of the latest write of every event, e.g.
+        `read(filter=(ds.field("algorithm") == "ensemble") & (ds.field("year") >= 2022))`.
+        """
+        dataset = self.dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=columns)
+
+        read_columns = None
+        if columns is not None:
+            read_columns = list(
+                dict.fromkeys(list(columns) + ["event_id", "algorithm", "written_at"])
+            )
+        table = _latest(dataset.to_table(columns=read_columns, filter=filter))
+        df = table.to_pandas()
+        return df[columns] if columns is not None else df
+
+    def event_ids(self, algorithm) -> set:
+        """Ids of the events with results for `algorithm` (reads one column)."""
+        dataset = self.dataset()
+        if dataset is None:
+            return set()
+        algorithm = getattr(algorithm, "value", algorithm)
+        table = dataset.to_table(
+            columns=["event_id"], filter=ds.field("algorithm") == algorithm
+        )
+        return set(table["event_id"].to_pylist())
+
+    def compact(self, min_files: int = 2) -> int:
+        """
+        Merge the parts of every partition with at least `min_files` files
+        into one file, keeping only the latest write of each event. Parts
+        written while compacting are left for the next run. Returns the
+        number of files merged.
+        """
+        merged = 0
+        for directory in sorted({fp.parent for fp in self._files()}):
+            parts = sorted(directory.glob("*.parquet"))
+            # parts claimed by an interrupted compaction
+            claimed = sorted(directory.glob(f"*.parquet{COMPACTING_SUFFIX}"))
+            if len(parts) + len(claimed) < min_files:
+                continue
+
+            # claim the parts, so a concurrent rewrite of an event creates a new one
+            for fp in parts:
+                target = fp.with_name(fp.name + COMPACTING_SUFFIX)
+                os.replace(fp, target)
+                claimed.append(target)
+
+            table = pa.concat_tables(
+                [pq.read_table(fp) for fp in claimed], promote_options="permissive"
+            )
+            table = _latest(table).sort_by([("event_id", "ascending")])
+
+            path = directory / COMPACTED_PART.format(uid=uuid.uuid4().hex[:12])
+            tmp_path = directory / f".{path.name}.tmp"
+            pq.write_table(table, tmp_path, row_group_size=256_000)
+            os.replace(tmp_path, path)
+            for fp in claimed:
+                fp.unlink()
+
+            merged += len(claimed)
+            logger.info(f"Results dataset: compacted {len(claimed)} files in {directory}")
+        return merged
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .logger import setup_logging
+
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Compact the Parquet results dataset")
+    parser.add_argument("root", nargs="?", default="results/metrics")
+    parser.add_argument("--min-files", type=int, default=2)
+    args = parser.parse_args()
+
+    start = time.time()
+    n_files = ResultsDataset(args.root).compact(args.min_files)
+    logger.info(f"Results dataset: compacted {n_files} files in {time.time() - start:.1f} s")
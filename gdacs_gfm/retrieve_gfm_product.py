@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, List
@@ -14,9 +15,10 @@ import logging
 
 
 from .datacube import build_datacube
-from .gfm_layout import resolve_storage_root
+from .gfm_layout import get_gfm_layers_dirs
 from .algorithms import GFMAlgorithm, filter_algorithm_files
-from .gfm_index import iterate_days
+from .gfm_index import iterate_days, list_day_files
+from .gfm_catalog import GFMCatalog
 from .config import (
     DIMENSIONS,
     FL_DEF_DICT,
@@ -32,61 +34,26 @@ from .config import (
 logger = logging.getLogger("gfm_logger")
 
 
-def get_gfm_layers_dirs(
-    start_date: datetime = datetime(2024, 6, 12),
-    equi7_grid: Optional[str] = None,
-    gfm_algorithm: Optional[GFMAlgorithm] = None,
-):
-    if equi7_grid is None:
-        raise ValueError("equi7_grid must be provided")
-
-    storage_root = resolve_storage_root(start_date)
-
-    # Select correct root based on algorithm
-    if gfm_algorithm.value == "ensemble":
-        storage_root = storage_root / "layers"
-    else:
-        storage_root = storage_root / "interim_layers"
-
-    # Main layers
-    root_layers = ["flood_extent", "uncertainty"]
-    root_dirs = [storage_root / layer / equi7_grid for layer in root_layers]
-
-    # Context layers
-    # Observed water naming
-    observed_name = (
-        "observed_water" if storage_root.parent.name == "output" else "obswater_mask"
-    )
-
-    exclusion_name = (
-        "exclusion_layer" if storage_root.parent.name == "output" else "exlusion_mask"
-    )
-    context_layers = [exclusion_name, observed_name, "advisory_flags"]
-    context_root = storage_root.parent / "layers"
-    context_dirs = [context_root / layer / equi7_grid for layer in context_layers]
-
-    all_dirs = root_dirs + context_dirs
-
-    # Validate existence
-    missing = [str(p) for p in all_dirs if not p.exists()]
-    if missing:
-        raise FileNotFoundError(
-            "The following GFM layer directories do not exist:\n" + "\n".join(missing)
-        )
-
-    return all_dirs
-
-
-
-
 def find_gfm_layers_images(
     event_start: datetime,
     event_end: datetime,
     equi7_code: str,
     algorithm: GFMAlgorithm,
     buffer_days: int = 0,
+    catalog: Optional[GFMCatalog] = None,
 ) -> list[list[Path]]:
-    layers_dirs = get_gfm_layers_dirs(event_start, equi7_code, algorithm)
+    if catalog is None:
+        layers_dirs = get_gfm_layers_dirs(event_start, equi7_code, algorithm)
+    else:
+        layers_dirs = get_gfm_layers_dirs(
+            event_start, equi7_code, algorithm, check_exists=False
+        )
+        missing = [str(p) for p in layers_dirs if not catalog.has_layer_dir(p)]
+        if missing:
+            raise FileNotFoundError(
+                "The following GFM layer directories are not in the catalog:\n"
+                + "\n".join(missing)
+            )
 
     # Pre-allocate based on actual number of layers
     layers_images: list[list[Path]] = [[] for _ in layers_dirs]
@@ -96,20 +63,13 @@ def find_gfm_layers_images(
 
     for i, layer_dir in enumerate(layers_dirs):
         layer_name = layer_dir.parent.name  
+        listing = list_day_files(layer_dir, days, catalog)
 
         for day in days:
-            day_path = (
-                layer_dir
-                / day.strftime("%Y")
-                / day.strftime("%m")
-                / day.strftime("%d")
-            )
-
-            if not day_path.exists():
+            day_files = listing.get(day.date())
+            if not day_files:
                 continue
 
-            day_files = list(day_path.iterdir())
-
             if layer_name in {"flood_extent", "uncertainty"}:
                 layers_images[i].extend(
                     filter_algorithm_files(day_files, algorithm)
@@ -138,7 +98,8 @@ def select_field_defs(
     else:
         UN_FIELDS_DEF = UN_DEF_DICT["archive"] if uncert_root == "output" else UN_DEF_DICT["nrt"]
         if algo.value == "list":
-            UN_FIELDS_DEF["algorithm"] = {"len": 4}
+            # copy, the shared definition is used by TUW/DLR as well
+            UN_FIELDS_DEF = OrderedDict(UN_FIELDS_DEF, algorithm={"len": 4})
 
     return FL_FIELDS_DEF, UN_FIELDS_DEF, EX_FIELDS_DEF, OBS_FIELDS_DEF, ADV_FIELDS_DEF
 
@@ -0,0 +1,484 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from tqdm import tqdm
+
+from .algorithms import GFMAlgorithm
+from .aoi_cache import AOICache
+from .batch import event_work, process_event_batch
+from .config import DIMENSIONS
+from .datacube import build_datacube, filter_datacube_by_event, tile_membership
+from .event_pool import EventPool
+from .executors import MetricsExecutor
+from .gfm_catalog import GFMCatalog, file_tile
+from .gfm_index import EventImages, discover_event_images
+from .metric_cache import MetricCache
+from .pipeline import METRICS_MODES, process_event
+from .process_geojson import load_event_geojson, prepare_event_aois
+from .results_dataset import ResultsDataset
+from .status_store import (
+    DONE,
+    ERROR,
+    NO_AOI,
+    NO_DATA,
+    SKIP_STATES,
+    StatusStore,
+    completion_state,
+)
+from .tile_index import filter_images_by_aoi
+
+logger = logging.getLogger("gfm_logger")
+
+ALGORITHMS = [GFMAlgorithm.ENSEMBLE, GFMAlgorithm.LIST, GFMAlgorithm.DLR, GFMAlgorithm.TUW]
+# Context layers read with the flood extent (see `pipeline.add_layer_metrics`)
+LAYER_FILES = ("exclusion", "observed_water", "uncertainty")
+
+# (AOI datacubes, their polygons, context layer files) of one event and algorithm
+Prepared = Tuple[list, list, Optional[Dict[str, list]]]
+
+
+@dataclass
+class RunConfig:
+    """
+    Inputs and options of a processing run. Only paths and flags, so a
+    config can be sent to worker processes that open their own stores.
+    """
+
+    results_dir: Path
+    geojson_dir: Path
+    # `python -m gdacs_gfm.gfm_catalog <path>`; directory walks if missing
+    catalog_path: Optional[Path] = None
+    metrics_mode: str = "aoi"
+    detailed: bool = True
+    layer_metrics: bool = True
+    # a second read of every flood file (see `composite.build_event_composites`)
+    composites: bool = False
+    buffer_days: int = 1
+
+    @property
+    def triage(self) -> bool:
+        return self.metrics_mode == "approx"
+
+
+def parse_dates(row) -> Tuple[datetime, datetime]:
+    """Parse fromdate and todate from a row."""
+    return (
+        datetime.strptime(row["fromdate"], "%Y-%m-%dT%H:%M:%S"),
+        datetime.strptime(row["todate"], "%Y-%m-%dT%H:%M:%S"),
+    )
+
+
+def save_indicator_file(event_id: str, folder: Path, message: str) -> None:
+    """Create a text file indicating an event issue."""
+    file_path = folder / f"{event_id}.txt"
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.write_text(message)
+
+
+class EventRunner:
+    """
+    Runs events through AOI loading, image discovery, datacube selection
+    and flood metrics, with the caches and stores of one results directory.
+
+    `run_event` is event-major: the AOI is loaded, the day directories are
+    listed and the AOI/tile selection is computed once per event, then all
+    pending algorithms are evaluated with the same per-algorithm outputs and
+    statuses as an algorithm-by-algorithm run. `run_batched` prepares events
+    the same way and batches their metrics per algorithm.
+    """
+
+    def __init__(self, config: RunConfig, LOGGER=None):
+        if config.metrics_mode not in METRICS_MODES:
+            raise ValueError(f"Unknown metrics mode: {config.metrics_mode}")
+
+        self.config = config
+        self.logger = LOGGER or logger
+        results_dir = Path(config.results_dir)
+        self.results_dir = results_dir
+
+        catalog_path = config.catalog_path
+        self.catalog = GFMCatalog(catalog_path) if catalog_path and Path(catalog_path).exists() else None
+        # Parsed AOI polygons, reused while the GeoJSON files are unchanged
+        self.aoi_cache = AOICache(results_dir / "aoi_cache.sqlite")
+        # Per-file (per-AOI) metric results, so reruns only read new or changed files
+        self.metric_cache = MetricCache(results_dir / "metric_cache.sqlite")
+        # Per-file metrics of all events, partitioned by algorithm and year
+        self.results_dataset = ResultsDataset(results_dir / "metrics")
+        # Processing status per event and algorithm (processing_results.csv is exported from it)
+        self.status_store = StatusStore(results_dir / "status.sqlite")
+        # Events estimated in triage mode
+        self.triage_status_store = StatusStore(results_dir / "triage" / "status.sqlite")
+        self.overview_cache_dir = results_dir / "overview_cache"
+        self.composite_dir = results_dir / "composites" if config.composites else None
+
+    # -----------------------
+    # Status
+    # -----------------------
+    @property
+    def done_store(self) -> StatusStore:
+        """Store answering which events are processed: triage results live apart."""
+        return self.triage_status_store if self.config.triage else self.status_store
+
+    def pending_algorithms(self, event_id, algorithms: List[GFMAlgorithm]) -> List[GFMAlgorithm]:
+        """Algorithms not yet processed for the event (errors are retried)."""
+        pending = [a for a in algorithms if not self.done_store.is_processed(event_id, a)]
+        if not pending:
+            self.logger.info(f"Skipping! Event {event_id} already processed. ")
+        return pending
+
+    def record(self, event_id, algorithms: List[GFMAlgorithm], status: str):
+        """
+        Record a status of an event for several algorithms, in the store of
+        the active mode (triage statuses never touch the exact results).
+        """
+        self.done_store.set_many((event_id, algorithm, status) for algorithm in algorithms)
+
+    # -----------------------
+    # Preparation
+    # -----------------------
+    def load_aois(self, event, algorithms: List[GFMAlgorithm]):
+        """`(polygons, sref)` of the event, None if it has no valid AOI (status set)."""
+        event_id = event["GDACS_ID"]
+        polygons, sref = load_event_geojson(
+            event_id, self.config.geojson_dir, cache=self.aoi_cache
+        )
+        if polygons is None:
+            self.logger.warning(f"{event['country']} ({event_id}): No valid AOI polygon.")
+            save_indicator_file(
+                event_id,
+                self.results_dir / "no_aoi",
+                f"Event {event_id} has no valid AOI polygon.\n",
+            )
+            self.record(event_id, algorithms, NO_AOI)
+            return None
+
+        # valid, oriented, coordinate-bounded geometries, computed once per event
+        return prepare_event_aois(polygons), sref
+
+    def discover(self, event, algorithms: List[GFMAlgorithm]) -> EventImages:
+        """Images of all algorithms (and context layers) of the event, one listing per day."""
+        event_start, event_end = parse_dates(event)
+        return discover_event_images(
+            event_start=event_start,
+            event_end=event_end,
+            equi7_code=event["equi7_grid_code"],
+            algorithms=algorithms,
+            buffer_days=self.config.buffer_days,
+            with_context=self.config.layer_metrics and not self.config.triage,
+            catalog=self.catalog,
+        )
+
+    def _no_data(self, event, algorithm: GFMAlgorithm, message: str):
+        event_id = event["GDACS_ID"]
+        self.logger.warning(f"{event['country']} ({event_id}): {message}")
+        save_indicator_file(
+            event_id,
+            self.results_dir / "no_data",
+            f"Event {event_id} has {message[0].lower()}{message[1:]}\n",
+        )
+        self.record(event_id, [algorithm], NO_DATA)
+
+    def prepare_algorithm(
+        self,
+        event,
+        algorithm: GFMAlgorithm,
+        polygons,
+        sref,
+        images: list,
+        event_images: EventImages,
+        membership: Optional[pd.DataFrame] = None,
+    ) -> Optional[Prepared]:
+        """
+        AOI datacubes of one algorithm from its AOI-tile `images`; None if
+        there is no data (status set).
+        """
+        event_id = event["GDACS_ID"]
+        if not images:
+            self._no_data(event, algorithm, "No images on AOI tiles.")
+            return None
+
+        dc = build_datacube(
+            images_paths=[str(img) for img in images],
+            dimensions=DIMENSIONS,
+            # naming scheme detected per file: TUW days may fall back to FLOOD-HM files
+            fields_def=None,
+        )
+
+        # the cube only holds AOI tiles, so a selection may keep all of it
+        dc_sel, aoi_polygons = filter_datacube_by_event(
+            dc,
+            event_id,
+            polygons,
+            sref,
+            self.logger,
+            require_reduction=False,
+            batched=True,
+            return_polygons=True,
+            membership=membership,
+        )
+        if dc_sel is None:
+            self._no_data(event, algorithm, "No data after AOI filtering.")
+            return None
+
+        layer_files = None
+        if self.config.layer_metrics and not self.config.triage:
+            layer_files = {layer: event_images.images(algorithm, layer) for layer in LAYER_FILES}
+        return dc_sel, aoi_polygons, layer_files
+
+    def prepare(self, event, algorithms: List[GFMAlgorithm]) -> Dict[GFMAlgorithm, Prepared]:
+        """
+        Prepared AOI datacubes of every pending algorithm of an event. The
+        AOI, the image discovery and the AOI/tile selection are shared.
+        """
+        event_id = event["GDACS_ID"]
+        self.logger.info(
+            f"Processing event {event_id} in {event['country']} "
+            f"(alert: {event.get('alertlevel')}, grid: {event['equi7_grid_code']})"
+        )
+
+        algorithms = self.pending_algorithms(event_id, algorithms)
+        if not algorithms:
+            return {}
+
+        aois = self.load_aois(event, algorithms)
+        if aois is None:
+            return {}
+        polygons, sref = aois
+
+        event_images = self.discover(event, algorithms)
+        images = {algorithm: event_images.images(algorithm) for algorithm in algorithms}
+        self.logger.info(
+            f"{event_id}: Found "
+            + ", ".join(f"{len(imgs)} {algo.value}" for algo, imgs in images.items())
+            + " images"
+        )
+
+        # Only keep tiles intersecting the AOI polygons, decided once for all algorithms
+        equi7grid = event["equi7_grid_code"]
+        all_images = sorted({img for imgs in images.values() for img in imgs})
+        on_aoi = set(filter_images_by_aoi(all_images, equi7grid, polygons))
+        images = {algo: [img for img in imgs if img in on_aoi] for algo, imgs in images.items()}
+
+        # AOI/tile intersections of all algorithms' tiles (untiled names: per cube)
+        tiles = {file_tile(Path(img).name) for img in on_aoi}
+        membership = None
+        if tiles and None not in tiles:
+            membership = tile_membership(tiles, polygons, equi7grid)
+
+        prepared = {}
+        for algorithm in algorithms:
+            self.logger.info(f"{event_id}: {len(images[algorithm])} {algorithm.value} images on AOI tiles")
+            result = self.prepare_algorithm(
+                event, algorithm, polygons, sref, images[algorithm], event_images, membership
+            )
+            if result is not None:
+                prepared[algorithm] = result
+        return prepared
+
+    # -----------------------
+    # Processing
+    # -----------------------
+    def process(
+        self,
+        event,
+        algorithm: GFMAlgorithm,
+        prepared: Prepared,
+        executor: Optional[MetricsExecutor] = None,
+    ) -> bool:
+        """Flood metrics and outputs of one prepared event/algorithm; False on error."""
+        event_id = event["GDACS_ID"]
+        dc_sel, aoi_polygons, layer_files = prepared
+        try:
+            process_event(
+                event=event,
+                algorithm=algorithm,
+                dcs=dc_sel,
+                results_dir=self.results_dir,
+                LOGGER=self.logger,
+                metrics_mode=self.config.metrics_mode,
+                polygons=aoi_polygons,
+                executor=executor,
+                detailed=self.config.detailed,
+                overview_cache_dir=self.overview_cache_dir,
+                metric_cache=self.metric_cache,
+                layer_files=layer_files,
+                composite_dir=self.composite_dir,
+                status_store=self.status_store,
+                results_dataset=self.results_dataset,
+            )
+        except Exception as e:
+            self.logger.exception(f"Error processing event {event_id}: {e}")
+            self.record(event_id, [algorithm], ERROR)
+            return False
+
+        # the detected/missed status is recorded by process_event
+        if self.config.triage:
+            self.triage_status_store.set(event_id, algorithm, DONE)
+        self.logger.info(f"{event_id}: Processing completed.")
+        return True
+
+    def run_event(
+        self,
+        event,
+        algorithms: List[GFMAlgorithm] = ALGORITHMS,
+        executor: Optional[MetricsExecutor] = None,
+    ) -> Dict[GFMAlgorithm, Optional[str]]:
+        """
+        Process all pending `algorithms` of one event (event-major). Returns
+        the completion state per algorithm.
+        """
+        event_id = event["GDACS_ID"]
+        try:
+            prepared = self.prepare(event, algorithms)
+        except Exception as e:
+            self.logger.exception(f"Error preparing event {event_id}: {e}")
+            prepared = {}
+            self.record(event_id, self.pending_algorithms(event_id, algorithms), ERROR)
+
+        for algorithm, item in prepared.items():
+            self.process(event, algorithm, item, executor)
+        return {a: self.done_store.state(event_id, a) for a in algorithms}
+
+    def run_batched(
+        self,
+        events: pd.DataFrame,
+        algorithms: List[GFMAlgorithm],
+        executor: MetricsExecutor,
+        batch_size: int,
+    ) -> None:
+        """
+        Process events in batches sharing one metrics pass, so that tiles hit
+        by several events of a batch are read once (see `process_event_batch`).
+        Events are ordered by grid and start date to batch neighbours together.
+
+        Event-major like `run_event`: each event is prepared once for all
+        pending `algorithms`, its work is queued per algorithm and a queue
+        is processed whenever it holds `batch_size` events (and at the end).
+        """
+        if self.config.metrics_mode != "aoi":
+            raise ValueError("Batched runs need metrics_mode='aoi'")
+        events = events.sort_values(["equi7_grid_code", "fromdate"], kind="stable")
+
+        queues = {algorithm: [] for algorithm in algorithms}
+        for _, row in tqdm(
+            events.iterrows(), total=len(events), desc="Preparing Flood Events", unit="event"
+        ):
+            event_id = row["GDACS_ID"]
+            try:
+                prepared = self.prepare(row, algorithms)
+            except Exception as e:
+                self.logger.exception(f"Error preparing event {event_id}: {e}")
+                prepared = {}
+                self.record(event_id, self.pending_algorithms(event_id, algorithms), ERROR)
+
+            for algorithm, (dc_sel, aoi_polygons, layer_files) in prepared.items():
+                queue = queues[algorithm]
+                queue.append(event_work(row, dc_sel, aoi_polygons, layer_files, self.logger))
+                if len(queue) >= batch_size:
+                    self.process_batch(queue, algorithm, executor)
+                    queue.clear()
+
+        for algorithm, queue in queues.items():
+            if queue:
+                self.process_batch(queue, algorithm, executor)
+
+    def process_batch(self, works: list, algorithm: GFMAlgorithm, executor: MetricsExecutor):
+        """Flood metrics and outputs of a batch of prepared events of one algorithm."""
+        self.logger.info(f"Processing batch of {len(works)} {algorithm.value} events")
+        try:
+            # statuses are recorded per event in the status store
+            process_event_batch(
+                works,
+                algorithm,
+                self.results_dir,
+                self.logger,
+                executor,
+                detailed=self.config.detailed,
+                metric_cache=self.metric_cache,
+                composite_dir=self.composite_dir,
+                status_store=self.status_store,
+                results_dataset=self.results_dataset,
+            )
+        except Exception as e:
+            self.logger.exception(f"Error processing batch of {len(works)} events: {e}")
+            for work in works:
+                self.record(work.event_id, [algorithm], ERROR)
+
+    def run_parallel(
+        self,
+        events: pd.DataFrame,
+        algorithms: List[GFMAlgorithm] = ALGORITHMS,
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, int]:
+        """
+        Process events on a pool of worker processes, one event per worker
+        at a time (see `event_pool.EventPool`); every worker runs its own
+        `EventRunner` with serial flood metrics.
+
+        Events already processed in the status store are not submitted, so
+        an interrupted run resumes where it stopped. Events that fail, time
+        out or crash their worker are recorded as errors (retried next run).
+        Returns the number of events per outcome.
+        """
+        pending = []
+        for event in events.to_dict(orient="records"):
+            if any(not self.done_store.is_processed(event["GDACS_ID"], a) for a in algorithms):
+                pending.append(event)
+        self.logger.info(f"{len(events) - len(pending)} events already processed, {len(pending)} to go")
+
+        pool = EventPool(
+            run_event_task,
+            max_workers=max_workers,
+            timeout=timeout,
+            initializer=init_runner_worker,
+            initargs=(self.config, algorithms),
+        )
+        outcomes: Dict[str, int] = {}
+        for result in tqdm(pool.run(pending), total=len(pending), desc="Processing Flood Events", unit="event"):
+            outcomes[result.status] = outcomes.get(result.status, 0) + 1
+            if not result.ok:
+                self.logger.error(f"Event {result.event_id}: {result.status}, {result.error}")
+                # algorithms the worker finished keep their status (read back from the database)
+                failed = [
+                    a
+                    for a in algorithms
+                    if completion_state(self.done_store.get(result.event_id, a)) not in SKIP_STATES
+                ]
+                self.record(result.event_id, failed, ERROR)
+        return outcomes
+
+    def initialize_status(self, results_file: Optional[Path] = None):
+        """
+        Fill a new status store from an existing processing_results.csv and
+        the outputs (scanned once).
+        """
+        if self.status_store.is_empty():
+            if results_file is not None and Path(results_file).exists():
+                self.status_store.import_csv(results_file, list(GFMAlgorithm))
+            self.status_store.rebuild(self.results_dir, list(GFMAlgorithm), self.results_dataset)
+        if self.config.triage and self.triage_status_store.is_empty():
+            self.triage_status_store.rebuild(self.results_dir / "triage", list(GFMAlgorithm))
+
+
+# -----------------------
+# Worker processes (`EventRunner.run_parallel`)
+# -----------------------
+_WORKER: Optional[Tuple[EventRunner, List[GFMAlgorithm], MetricsExecutor]] = None
+
+
+def init_runner_worker(config: RunConfig, algorithms: List[GFMAlgorithm]):
+    """Open the stores of a worker once; events are parallel, file metrics serial."""
+    global _WORKER
+    _WORKER = (EventRunner(config), algorithms, MetricsExecutor("serial"))
+
+
+def run_event_task(event: dict) -> Dict[str, Optional[str]]:
+    """Completion state per algorithm of one event, run in a worker."""
+    runner, algorithms, executor = _WORKER
+    states = runner.run_event(event, algorithms, executor)
+    return {algorithm.value: state for algorithm, state in states.items()}
@@ -0,0 +1,19 @@
+import sqlite3
+from pathlib import Path
+from typing import Union
+
+
+def connect(db_path: Union[str, Path], timeout: float = 60.0) -> sqlite3.Connection:
+    """
+    Open a SQLite database used as a local index/cache.
+
+    WAL mode lets readers proceed while another process writes, which is
+    what we need on the shared processing nodes.
+    """
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(db_path, timeout=timeout)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,286 @@
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import pandas as pd
+
+from .results_dataset import ResultsDataset
+from .sqlite_utils import connect
+
+logger = logging.getLogger("gfm_logger")
+
+# Columns of processing_results.csv that are not algorithm statuses
+EVENT_COLUMN = "GDACS_ID"
+PROCESSED_COLUMN = "processed"
+
+# Completion states answered by `StatusStore.state`
+DONE = "done"
+NO_AOI = "no_aoi"
+NO_DATA = "no_data"
+ERROR = "error"
+# Statuses meaning the event's results were written
+DONE_STATUSES = (DONE, "detected", "missed")
+# Statuses of the event itself, whatever the algorithm (as the no_aoi/no_data markers)
+EVENT_STATUSES = (NO_AOI, NO_DATA)
+# States of events that are not processed again (errors are retried)
+SKIP_STATES = (DONE, NO_AOI, NO_DATA)
+
+
+def _algorithm_name(algorithm) -> str:
+    """Status column name of a `GFMAlgorithm` (or of its value)."""
+    return getattr(algorithm, "value", algorithm)
+
+
+def completion_state(status: Optional[str]) -> Optional[str]:
+    """done / no_aoi / no_data / error (or another status as is) of a status."""
+    return DONE if status in DONE_STATUSES else status
+
+
+class StatusStore:
+    """
+    Processing status per (event, algorithm), replacing the rewrites of
+    processing_results.csv.
+
+    Every update is a single-row upsert in its own transaction, so workers
+    in many processes can record statuses concurrently (WAL mode, see
+    `sqlite_utils.connect`). `export_csv` produces the CSV on demand.
+
+    `state` / `is_processed` answer from an in-memory index loaded once and
+    updated on every write of this process; `rebuild` reconstructs the
+    statuses from the result files.
+    """
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = Path(db_path)
+        self._conn = None
+        self._pid = None
+        # (event_id, algorithm) -> completion state, event_id -> event status
+        self._states: Optional[Dict[Tuple[str, str], str]] = None
+        self._event_states: Dict[str, str] = {}
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS status ("
+            "event_id TEXT NOT NULL, algorithm TEXT NOT NULL, status TEXT NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (event_id, algorithm));"
+            "CREATE INDEX IF NOT EXISTS status_algorithm ON status (algorithm, status);"
+        )
+        self.conn.commit()
+
+    @property
+    def conn(self):
+        # SQLite connections must not be shared with forked workers
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = connect(self.db_path)
+            self._pid = os.getpid()
+        return self._conn
+
+    def set(self, event_id, algorithm, status: str):
+        """Record the status of one event and algorithm (atomic upsert)."""
+        self.set_many([(event_id, algorithm, status)])
+
+    def set_many(self, items: Iterable[Tuple[object, object, str]]):
+        now = time.time()
+        rows = [
+            (str(event_id), _algorithm_name(algorithm), status, now)
+            for event_id, algorithm, status in items
+        ]
+        if not rows:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO status VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (event_id, algorithm) DO UPDATE SET "
+                "status = excluded.status, updated_at = excluded.updated_at",
+                rows,
+            )
+        if self._states is not None:
+            for event_id, algorithm, status, _ in rows:
+                self._index(event_id, algorithm, status)
+
+    def _index(self, event_id: str, algorithm: str, status: str):
+        self._states[(event_id, algorithm)] = completion_state(status)
+        if status in EVENT_STATUSES:
+            self._event_states[event_id] = status
+
+    def load_index(self):
+        """(Re)load the completion index from the database."""
+        self._states, self._event_states = {}, {}
+        for (event_id, algorithm), status in self.statuses().items():
+            self._index(event_id, algorithm, status)
+
+    def state(self, event_id, algorithm) -> Optional[str]:
+        """
+        Completion state of an event and algorithm: done, no_aoi, no_data,
+        error, or None if it was never processed. no_aoi / no_data apply to
+        every algorithm of the event.
+        """
+        if self._states is None:
+            self.load_index()
+        event_id = str(event_id)
+        state = self._states.get((event_id, _algorithm_name(algorithm)))
+        if state in SKIP_STATES:
+            return state
+        return self._event_states.get(event_id, state)
+
+    def is_processed(self, event_id, algorithm) -> bool:
+        """True if the event is done, or has no AOI or no data (errors are retried)."""
+        return self.state(event_id, algorithm) in SKIP_STATES
+
+    def get(self, event_id, algorithm) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT status FROM status WHERE event_id = ? AND algorithm = ?",
+            (str(event_id), _algorithm_name(algorithm)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def statuses(self, algorithm=None) -> Dict:
+        """Event id -> status of one algorithm, or (event id, algorithm) -> status."""
+        if algorithm is None:
+            rows = self.conn.execute("SELECT event_id, algorithm, status FROM status")
+            return {(event_id, algo): status for event_id, algo, status in rows}
+        rows = self.conn.execute(
+            "SELECT event_id, status FROM status WHERE algorithm = ?",
+            (_algorithm_name(algorithm),),
+        )
+        return dict(rows.fetchall())
+
+    def is_empty(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM status LIMIT 1").fetchone() is None
+
+    def import_csv(self, csv_path: Union[str, Path], algorithms: Iterable) -> int:
+        """
+        Load the statuses of an existing processing_results.csv (one column
+        per algorithm); empty cells are skipped. Returns the rows imported.
+        """
+        df = pd.read_csv(csv_path)
+        items = []
+        for algorithm in algorithms:
+            column = _algorithm_name(algorithm)
+            if column not in df.columns:
+                continue
+            for event_id, status in zip(df[EVENT_COLUMN], df[column]):
+                if isinstance(status, str) and status:
+                    items.append((event_id, column, status))
+        self.set_many(items)
+        logger.info(f"Status store: imported {len(items)} statuses from {csv_path}")
+        return len(items)
+
+    def rebuild(
+        self,
+        results_dir: Union[str, Path],
+        algorithms: Iterable,
+        results_dataset: Optional[ResultsDataset] = None,
+    ) -> int:
+        """
+        Reconstruct the statuses from the outputs in `results_dir`, scanned
+        once: `no_aoi/<event_id>.txt` and `no_data/<event_id>.txt` markers
+        (for every algorithm) and `<event_id>_<algorithm>.csv` results, or
+        the events of `results_dataset` (done). Recorded detected/missed
+        statuses are kept. Returns the statuses set.
+        """
+        results_dir = Path(results_dir)
+        algorithms = [_algorithm_name(a) for a in algorithms]
+        current = self.statuses()
+        items = {}
+
+        for status in EVENT_STATUSES:
+            directory = results_dir / status
+            if not directory.is_dir():
+                continue
+            for f in directory.iterdir():
+                if not f.is_file():
+                    continue
+                for algorithm in algorithms:
+                    if current.get((f.stem, algorithm)) not in DONE_STATUSES:
+                        items[(f.stem, algorithm)] = status
+
+        if results_dir.is_dir():
+            for f in results_dir.iterdir():
+                event_id, _, algorithm = f.stem.partition("_")
+                if not f.is_file() or f.suffix != ".csv" or algorithm not in algorithms:
+                    continue
+                if current.get((event_id, algorithm)) not in DONE_STATUSES:
+                    items[(event_id, algorithm)] = DONE
+
+        if results_dataset is not None:
+            for algorithm in algorithms:
+                for event_id in results_dataset.event_ids(algorithm):
+                    if current.get((event_id, algorithm)) not in DONE_STATUSES:
+                        items[(event_id, algorithm)] = DONE
+
+        self.set_many(
+            (event_id, algorithm, status) for (event_id, algorithm), status in items.items()
+        )
+        self.load_index()
+        logger.info(f"Status store: rebuilt {len(items)} statuses from {results_dir}")
+        return len(items)
+
+    def to_frame(self, base: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        The processing_results table: `base` (any columns, one row per
+        `GDACS_ID`) with `processed` and one status column per algorithm.
+        Without `base` only the events with a status are listed.
+        """
+        status = pd.DataFrame(
+            self.conn.execute("SELECT event_id, algorithm, status FROM status").fetchall(),
+            columns=["event_id", "algorithm", "status"],
+        )
+        wide = status.pivot(index="event_id", columns="algorithm", values="status")
+        algorithms = list(wide.columns)
+
+        if base is None:
+            base = pd.DataFrame({EVENT_COLUMN: wide.index})
+        # keep the column order of `base`, new algorithms last
+        columns = list(base.columns)
+        columns += [c for c in [PROCESSED_COLUMN] + algorithms if c not in columns]
+
+        wide = wide.reindex(base[EVENT_COLUMN].astype(str))
+        df = base.reset_index(drop=True).copy()
+        df[PROCESSED_COLUMN] = wide.notna().any(axis=1).to_numpy()
+        for algorithm in algorithms:
+            df[algorithm] = wide[algorithm].to_numpy()
+        return df[columns]
+
+    def export_csv(self, csv_path: Union[str, Path], base: Optional[pd.DataFrame] = None):
+        """
+        Write processing_results.csv. Without `base`, the rows (and extra
+        columns) of an existing file at `csv_path` are kept.
+        """
+        csv_path = Path(csv_path)
+        if base is None and csv_path.exists():
+            base = pd.read_csv(csv_path)
+
+        tmp_path = csv_path.with_suffix(f".{os.getpid()}.tmp")
+        self.to_frame(base).to_csv(tmp_path, index=False)
+        # readers never see a partial file
+        os.replace(tmp_path, csv_path)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .algorithms import GFMAlgorithm
+
+    parser = argparse.ArgumentParser(description="Export processing_results.csv from the status store")
+    parser.add_argument("db_path", nargs="?", default="status.sqlite")
+    parser.add_argument("csv_path", nargs="?", default="processing_results.csv")
+    parser.add_argument(
+        "--rebuild",
+        metavar="RESULTS_DIR",
+        help="first reconstruct the statuses from the outputs in RESULTS_DIR",
+    )
+    parser.add_argument("--dataset", help="Parquet results dataset used by --rebuild")
+    args = parser.parse_args()
+
+    store = StatusStore(args.db_path)
+    if args.rebuild:
+        dataset = ResultsDataset(args.dataset) if args.dataset else None
+        store.rebuild(args.rebuild, list(GFMAlgorithm), dataset)
+    store.export_csv(args.csv_path)
+    store.close()
@@ -0,0 +1,145 @@
+import logging
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Set, Tuple, Union
+
+import numpy as np
+import pyproj
+import shapely
+from shapely import STRtree
+from shapely.geometry import Polygon, box
+
+from .config import EQUI7_EPSG
+from .gfm_catalog import file_tile
+
+logger = logging.getLogger("gfm_logger")
+
+TILE_NAME_RE = re.compile(
+    r"(?P<ew>[EW])(?P<x>\d{3})(?P<ns>[NS])(?P<y>\d{3})T(?P<size>\d)"
+)
+
+# Tile names count in units of 100 km
+EQUI7_UNIT_M = 100_000
+
+# Densify AOI edges (degrees) before projecting, so long edges follow the projection
+SEGMENTIZE_DEG = 0.05
+
+
+def equi7_epsg(equi7_grid: str) -> int:
+    """EPSG code of an Equi7 grid code such as `AS020M`."""
+    try:
+        return EQUI7_EPSG[equi7_grid[:2].upper()]
+    except KeyError:
+        raise ValueError(f"Unknown Equi7 grid: {equi7_grid}")
+
+
+def tile_footprint(tile_name: str) -> Polygon:
+    """Extent of an Equi7 tile (e.g. `E048N021T3`) in its grid projection (m)."""
+    match = TILE_NAME_RE.fullmatch(tile_name)
+    if match is None:
+        raise ValueError(f"Invalid Equi7 tile name: {tile_name}")
+
+    x = int(match["x"]) * EQUI7_UNIT_M * (1 if match["ew"] == "E" else -1)
+    y = int(match["y"]) * EQUI7_UNIT_M * (1 if match["ns"] == "N" else -1)
+    size = int(match["size"]) * EQUI7_UNIT_M
+
+    return box(x, y, x + size, y + size)
+
+
+def tile_footprints(tile_names: Iterable[str]) -> np.ndarray:
+    """Vectorised `tile_footprint` for many tile names."""
+    parsed = [TILE_NAME_RE.fullmatch(name) for name in tile_names]
+    if any(m is None for m in parsed):
+        raise ValueError("Invalid Equi7 tile name in tile list")
+    if not parsed:
+        return np.array([], dtype=object)
+
+    sign_x = np.array([1 if m["ew"] == "E" else -1 for m in parsed])
+    sign_y = np.array([1 if m["ns"] == "N" else -1 for m in parsed])
+    x = np.array([int(m["x"]) for m in parsed]) * sign_x * EQUI7_UNIT_M
+    y = np.array([int(m["y"]) for m in parsed]) * sign_y * EQUI7_UNIT_M
+    size = np.array([int(m["size"]) for m in parsed]) * EQUI7_UNIT_M
+
+    return shapely.box(x, y, x + size, y + size)
+
+
+@lru_cache(maxsize=None)
+def get_transformer(src_crs: str, dst_crs: str) -> pyproj.Transformer:
+    """Cached transformer; EPSG:4326 uses the (lat, lon) order of the GDACS AOIs."""
+    return pyproj.Transformer.from_crs(src_crs, dst_crs)
+
+
+def project_geometries(
+    geometries: Union[Polygon, Iterable[Polygon]],
+    dst_crs: str,
+    src_crs: str = "EPSG:4326",
+) -> np.ndarray:
+    """
+    Project AOI geometries in one vectorised call.
+
+    AOIs returned by `load_event_geojson` are (lat, lon) ordered, which is the
+    authority axis order of EPSG:4326 used by the transformer.
+    """
+    geometries = np.atleast_1d(np.asarray(geometries, dtype=object))
+    transformer = get_transformer(src_crs, dst_crs)
+
+    if src_crs == "EPSG:4326":
+        geometries = shapely.segmentize(geometries, SEGMENTIZE_DEG)
+
+    def _transform(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+
+    return shapely.transform(geometries, _transform)
+
+
+class Equi7TileIndex:
+    """STRtree over the footprints of a set of tiles of one Equi7 grid."""
+
+    def __init__(self, equi7_grid: str, tile_names: Iterable[str]):
+        self.equi7_grid = equi7_grid
+        self.crs = f"EPSG:{equi7_epsg(equi7_grid)}"
+        self.tile_names = np.array(sorted(set(tile_names)), dtype=object)
+        self.footprints = tile_footprints(self.tile_names)
+        self.tree = STRtree(self.footprints)
+
+    def query(self, polygons: Union[Polygon, Iterable[Polygon]]) -> Set[str]:
+        """Names of the tiles intersecting any of the (lat, lon) AOI polygons."""
+        projected = project_geometries(polygons, self.crs)
+        _, tree_idx = self.tree.query(projected, predicate="intersects")
+        return set(self.tile_names[np.unique(tree_idx)])
+
+
+@lru_cache(maxsize=128)
+def _cached_tile_index(equi7_grid: str, tile_names: Tuple[str, ...]) -> Equi7TileIndex:
+    return Equi7TileIndex(equi7_grid, tile_names)
+
+
+def get_tile_index(equi7_grid: str, tile_names: Iterable[str]) -> Equi7TileIndex:
+    """Tile index for a grid, reused across AOIs and algorithms of the same tiles."""
+    return _cached_tile_index(equi7_grid, tuple(sorted(set(tile_names))))
+
+
+def filter_images_by_aoi(
+    images: List[Union[str, Path]],
+    equi7_grid: str,
+    polygons: List[Polygon],
+) -> list:
+    """
+    Keep only images on tiles intersecting the AOI polygons.
+    Images without a recognisable tile name are kept.
+    """
+    tiles = [file_tile(Path(img).name) for img in images]
+    known = [t for t in tiles if t is not None]
+    if not known:
+        return list(images)
+
+    selected = get_tile_index(equi7_grid, known).query(polygons)
+
+    kept = [img for img, tile in zip(images, tiles) if tile is None or tile in selected]
+    logger.debug(
+        f"Tile prefilter ({equi7_grid}): {len(selected)} of {len(set(known))} tiles, "
+        f"{len(kept)} of {len(images)} images"
+    )
+    return kept
@@ -8,12 +8,15 @@ from gdacs_gfm.algorithms import GFMAlgorithm
 from gdacs_gfm.config import DIMENSIONS
 from gdacs_gfm.datacube import build_datacube, filter_datacube_by_event
 from gdacs_gfm.logger import setup_logging
-from gdacs_gfm.process_geojson import load_event_geojson
-from gdacs_gfm.retrieve_gfm_product import (
-    find_gfm_layers_images,
-    select_field_defs,
-    copy_files,
-)
+from gdacs_gfm.gfm_catalog import GFMCatalog
+from gdacs_gfm.process_geojson import load_event_geojson, prepare_event_aois
+from gdacs_gfm.aoi_cache import AOICache, ToleranceCache
+from gdacs_gfm.tile_index import filter_images_by_aoi
+from gdacs_gfm.gfm_index import discover_event_images
+from gdacs_gfm.gfm_layout import resolve_storage_root
+from gdacs_gfm.retrieve_gfm_product import copy_files
+from gdacs_gfm.event_pool import EventPool
+from gdacs_gfm.status_store import DONE, ERROR, NO_AOI, StatusStore
 
 # -----------------------
 # Setup
@@ -26,6 +29,18 @@ DB_PATH = Path(
 )
 GEOJSON_DIR = Path("/eodc/private/tuwgeo/users/mabdelaa/repos/GDACS_Flood_DB/data/aois")
 GFM_LAYERS = Path("/eodc/private/tuwgeo/users/mabdelaa/repos/gdacs_gfm/gfm_layers_data")
+# Built with `python -m gdacs_gfm.gfm_catalog <path>`; falls back to directory walks
+CATALOG_PATH = GFM_LAYERS / "gfm_catalog.sqlite"
+CATALOG = GFMCatalog(CATALOG_PATH) if CATALOG_PATH.exists() else None
+# simplification tolerance that made the AOI selection work, per event/AOI
+TOLERANCE_CACHE = ToleranceCache(GFM_LAYERS / "aoi_tolerances.sqlite")
+AOI_CACHE = AOICache(GFM_LAYERS / "aoi_cache.sqlite")
+# Retrieval status per event, so interrupted runs resume (one status column)
+STATUS_PATH = GFM_LAYERS / "status.sqlite"
+STATUS_COLUMN = "layers"
+# Parallel event workers and seconds per event before a worker is terminated
+EVENT_WORKERS = 8
+EVENT_TIMEOUT = 3600
 
 
 
@@ -55,13 +70,25 @@ def copy_dc_images(dcs, destination_dir):
         copy_files(dc.filepaths, destination_dir / f"AOI_{i}" , logger=logger)
 
 
-def build_filter_copy(files, fields_def, event_id,event_dir, polygons, sref, subfolder):
+def build_filter_copy(files, event_id,event_dir, polygons, sref, subfolder, fields_def=None, equi7grid=None):
+        if equi7grid is not None:
+            files = filter_images_by_aoi(files, equi7grid, polygons)
+
         if not files:
             return None
 
         files = [str(p) for p in files]
-        dc = build_datacube(files, DIMENSIONS, fields_def)
-        dc_sel = filter_datacube_by_event(dc, event_id, polygons, sref, None)
+        # fields_def=None: naming scheme is detected per file
+        dc = build_datacube(files, DIMENSIONS, fields_def, fast_parse=True)
+        dc_sel = filter_datacube_by_event(
+            dc,
+            event_id,
+            polygons,
+            sref,
+            None,
+            require_reduction=equi7grid is None,
+            tolerance_cache=TOLERANCE_CACHE,
+        )
 
         if dc_sel is None:
             save_indicator_file(
@@ -76,7 +103,7 @@ def build_filter_copy(files, fields_def, event_id,event_dir, polygons, sref, sub
 def process_single_event(row_dict = None ):
     """
     Worker-safe function.
-    Receives dict instead of pandas row.
+    Receives dict instead of pandas row; returns the event status.
     """
     event_id = row_dict["GDACS_ID"]
     equi7grid = row_dict["equi7_grid_code"]
@@ -87,33 +114,36 @@ def process_single_event(row_dict = None ):
     event_start = datetime.strptime(row_dict["fromdate"], "%Y-%m-%dT%H:%M:%S")
     event_end = datetime.strptime(row_dict["todate"], "%Y-%m-%dT%H:%M:%S")
 
-    polygons, sref = load_event_geojson(event_id, GEOJSON_DIR)
+    polygons, sref = load_event_geojson(event_id, GEOJSON_DIR, cache=AOI_CACHE)
     if polygons is None:
         save_indicator_file(
             event_id,
             event_base_dir / "no_aoi",
             f"Event {event_id} has no valid AOI polygon.\n",
         )
-        return
-    for ALGO in [GFMAlgorithm.ENSEMBLE , GFMAlgorithm.LIST , GFMAlgorithm.DLR, GFMAlgorithm.TUW]:
-
-        images = find_gfm_layers_images(
-            event_start=event_start,
-            event_end=event_end,
-            equi7_code=equi7grid,
-            algorithm=ALGO,
-            buffer_days=5,
-        )
+        return NO_AOI
+
+    # valid, oriented, coordinate-bounded geometries, computed once per event
+    polygons = prepare_event_aois(polygons)
+    algorithms = [GFMAlgorithm.ENSEMBLE , GFMAlgorithm.LIST , GFMAlgorithm.DLR, GFMAlgorithm.TUW]
+    # "output" (archive) or "realtime" (NRT)
+    uncert_root = resolve_storage_root(event_start).name
+
+    # list every day directory once for all algorithms and layers
+    event_images = discover_event_images(
+        event_start=event_start,
+        event_end=event_end,
+        equi7_code=equi7grid,
+        algorithms=algorithms,
+        buffer_days=5,
+        catalog=CATALOG,
+    )
 
-        fl, uncer, exc, obsw, adv = images
+    for ALGO in algorithms:
 
-       
+        fl, uncer, exc, obsw, adv = event_images.layers_images(ALGO)
 
-        uncert_root = uncer[0].parents[6].name
-        
-
-        field_defs = select_field_defs(ALGO, uncert_root)
-        FL_FIELDS_DEF, UN_FIELDS_DEF, EX_FIELDS_DEF, OBS_FIELDS_DEF, ADV_FIELDS_DEF = field_defs
+       
 
         event_algo_dir = event_base_dir / f"{ALGO.value}_{uncert_root}"
         if not fl:
@@ -124,27 +154,49 @@ def process_single_event(row_dict = None ):
             )
             continue
 
-        build_filter_copy(fl, FL_FIELDS_DEF, event_id, event_algo_dir, polygons, sref, "flood_extent")
-        build_filter_copy(uncer, UN_FIELDS_DEF, event_id,event_algo_dir, polygons, sref, "uncertainty")
+        build_filter_copy(fl, event_id, event_algo_dir, polygons, sref, "flood_extent", equi7grid=equi7grid)
+        build_filter_copy(uncer, event_id,event_algo_dir, polygons, sref, "uncertainty", equi7grid=equi7grid)
 
         if ALGO == GFMAlgorithm.ENSEMBLE:
-            build_filter_copy(exc, EX_FIELDS_DEF, event_id, event_base_dir, polygons, sref, "exclusion")
-            build_filter_copy(obsw, OBS_FIELDS_DEF, event_id,event_base_dir, polygons, sref, "observed_water")
-            build_filter_copy(adv, ADV_FIELDS_DEF, event_id,event_base_dir, polygons, sref, "adv_flags")
+            build_filter_copy(exc, event_id, event_base_dir, polygons, sref, "exclusion", equi7grid=equi7grid)
+            build_filter_copy(obsw, event_id,event_base_dir, polygons, sref, "observed_water", equi7grid=equi7grid)
+            build_filter_copy(adv, event_id,event_base_dir, polygons, sref, "adv_flags", equi7grid=equi7grid)
+
+    return DONE
     
 
 
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Copy the GFM layers of GDACS events")
+    parser.add_argument("--workers", type=int, default=EVENT_WORKERS, help="0: one event at a time")
+    parser.add_argument("--timeout", type=float, default=EVENT_TIMEOUT, help="seconds per event")
+    args = parser.parse_args()
+
     df = pd.read_csv(DB_PATH)
     df = df[df['GDACS_ID']=="FL-1000066"]
     rows = df.to_dict(orient="records")
     # rows = rows[3500:]
-    for row_dict in tqdm(rows, desc="Processing events"):
-        try:
-            process_single_event(row_dict)
-        except Exception as e:
-            event_id = row_dict.get("GDACS_ID", "UNKNOWN")
-            logger.error(f"Error processing event {event_id}: {e}")
 
+    # resume: events copied (or without AOI) in an earlier run are skipped
+    status_store = StatusStore(STATUS_PATH)
+    rows = [r for r in rows if not status_store.is_processed(r["GDACS_ID"], STATUS_COLUMN)]
+
+    if args.workers:
+        pool = EventPool(process_single_event, max_workers=args.workers, timeout=args.timeout)
+        for result in tqdm(pool.run(rows), total=len(rows), desc="Processing events"):
+            if not result.ok:
+                logger.error(f"Error processing event {result.event_id}: {result.status}, {result.error}")
+            status_store.set(result.event_id, STATUS_COLUMN, result.value if result.ok else ERROR)
+    else:
+        for row_dict in tqdm(rows, desc="Processing events"):
+            event_id = row_dict.get("GDACS_ID", "UNKNOWN")
+            try:
+                status = process_single_event(row_dict)
+            except Exception as e:
+                logger.error(f"Error processing event {event_id}: {e}")
+                status = ERROR
+            status_store.set(event_id, STATUS_COLUMN, status)
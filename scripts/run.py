@@ -1,16 +1,11 @@
 import logging
 from pathlib import Path
-from datetime import datetime
-from typing import Tuple
 from tqdm import tqdm
 import pandas as pd
-from gdacs_gfm.gfm_index import find_gfm_images
-from gdacs_gfm.algorithms import GFMAlgorithm
-from gdacs_gfm.config import DIMENSIONS, FL_DEF_DICT
-from gdacs_gfm.datacube import build_datacube, filter_datacube_by_event
-from gdacs_gfm.pipeline import process_event
+from gdacs_gfm.executors import EXECUTOR_BACKENDS, MetricsExecutor
 from gdacs_gfm.logger import setup_logging
-from gdacs_gfm.process_geojson import load_event_geojson
+from gdacs_gfm.pipeline import export_triage_summary
+from gdacs_gfm.runner import ALGORITHMS, EventRunner, RunConfig
 
 
 # -----------------------
@@ -29,191 +24,143 @@ RESULTS_DIR = Path(
     "/eodc/private/tuwgeo/users/mabdelaa/repos/gdacs_gfm/results"
 )
 RESULTS_FILE = RESULTS_DIR / "processing_results.csv"
-
-
-# -----------------------
-# Utility functions
-# -----------------------
-def save_indicator_file(event_id: str, folder: Path, message: str) -> None:
-    """Create a text file indicating an event issue."""
-    file_path = folder / f"{event_id}.txt"
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    file_path.write_text(message)
-
-
-def parse_dates(row: pd.Series) -> Tuple[datetime, datetime]:
-    """Parse fromdate and todate from a row."""
-    return (
-        datetime.strptime(row["fromdate"], "%Y-%m-%dT%H:%M:%S"),
-        datetime.strptime(row["todate"], "%Y-%m-%dT%H:%M:%S"),
-    )
-
-
-def update_event_status(
-    df_results: pd.DataFrame,
-    event_id: str,
-    algorithm: GFMAlgorithm,
-    status: str,
-) -> None:
-    """Update processing status for an event."""
-    df_results.loc[df_results["GDACS_ID"] == event_id, "processed"] = True
-    df_results.loc[
-        df_results["GDACS_ID"] == event_id, algorithm.value
-    ] = status
-
-
-def event_already_processed(event_id, selected_algorithm, results_dir: Path) -> bool:
-    """Check if an event has already been processed.
-
-    - In `results_dir/no_aoi` and `results_dir/no_data`: check if any file starts with `event_id`.
-    - In `results_dir`: check if any file starts with `{event_id}_{selected_algorithm.value}`.
-    """
-    event_prefix = str(event_id)
-    algo_prefix = f"{event_id}_{selected_algorithm.value}"
-
-    # Check event_prefix in no_aoi and no_data
-    for subdir in ["no_aoi", "no_data"]:
-        directory = results_dir / subdir
-        if not directory.exists():
-            continue
-        for f in directory.iterdir():
-            if f.is_file() and f.name.startswith(event_prefix):
-                return True
-
-    # Check algo_prefix in main results_dir
-    if results_dir.exists():
-        for f in results_dir.iterdir():
-            if f.is_file() and f.name.startswith(algo_prefix):
-                return True
-
-    return False
-
-# -----------------------
-# Core processing
-# -----------------------
-def process_single_event(
-    row: pd.Series,
-    selected_algorithm: GFMAlgorithm,
-    df_results: pd.DataFrame,
-) -> None:
-    """Process one event and update status."""
-    event_id = row["GDACS_ID"]
-    country = row["country"]
-    equi7grid = row["equi7_grid_code"]
-    alert_level = row["alertlevel"]
-
-    logger.info(
-        f"Processing event {event_id} in {country} (alert: {alert_level}, grid: {equi7grid})"
-    )
-
-    event_start, event_end = parse_dates(row)
-    if event_already_processed(event_id, selected_algorithm, RESULTS_DIR):
-        logger.info(f"Skipping! Event {event_id} already processed. ")
-        return
-    
-
-    # -----------------------
-    # Load AOI
-    # -----------------------
-    polygons, sref = load_event_geojson(event_id, GEOJSON_DIR)
-    if polygons is None:
-        logger.warning(f"{country} ({event_id}): No valid AOI polygon.")
-        save_indicator_file(
-            event_id,
-            RESULTS_DIR / "no_aoi",
-            f"Event {event_id} has no valid AOI polygon.\n",
-        )
-        update_event_status(df_results, event_id, selected_algorithm, "no_aoi")
-        return
-
-    # -----------------------
-    # Find images
-    # -----------------------
-    images = find_gfm_images(
-        event_start=event_start,
-        event_end=event_end,
-        equi7_code=equi7grid,
-        algorithm=selected_algorithm,
-        buffer_days=1,
-    )
-    logger.info(f"{event_id}: Found {len(images)} images")
-
-    images = [str(img) for img in images]
-
-    # -----------------------
-    # Build datacube
-    # -----------------------
-    sel_fields_def = FL_DEF_DICT[selected_algorithm.value]
-
-    dc = build_datacube(
-        images_paths=images,
-        dimensions=DIMENSIONS,
-        fields_def=sel_fields_def,
+# Built with `python -m gdacs_gfm.gfm_catalog <path>`; falls back to directory walks
+CATALOG_PATH = RESULTS_DIR / "gfm_catalog.sqlite"
+# "aoi": count flood only inside the AOI polygons, reading just their windows
+METRICS_MODE = "aoi"
+# Backend of the per-file flood metrics: "serial", "threads" or "processes"
+EXECUTOR_BACKEND = "processes"
+# Also record non-flooded, nodata and valid pixels (same single pass)
+DETAILED_METRICS = True
+# Read exclusion, observed water and uncertainty together with the flood extent
+LAYER_METRICS = True
+# Per-AOI maximum flood extent composites (COG); re-reads every flood file
+COMPOSITES = False
+# Events sharing one metrics pass, each file read once per batch (0: event by event)
+BATCH_EVENTS = 50
+# Seconds an event may take in a parallel run before its worker is terminated
+EVENT_TIMEOUT = 2 * 3600
+
+
+def run_config(metrics_mode: str = METRICS_MODE, composites: bool = COMPOSITES) -> RunConfig:
+    """Configuration of a run; caches and stores live in RESULTS_DIR (see `EventRunner`)."""
+    return RunConfig(
+        results_dir=RESULTS_DIR,
+        geojson_dir=GEOJSON_DIR,
+        catalog_path=CATALOG_PATH,
+        metrics_mode=metrics_mode,
+        detailed=DETAILED_METRICS,
+        layer_metrics=LAYER_METRICS,
+        composites=composites,
     )
 
-    dc_sel = filter_datacube_by_event(dc, event_id, polygons, sref, logger)
-
-    if dc_sel is None:
-        logger.warning(f"{country} ({event_id}): No data after AOI filtering.")
-        save_indicator_file(
-            event_id,
-            RESULTS_DIR / "no_data",
-            f"Event {event_id} has no data after AOI filtering.\n",
-        )
-        update_event_status(df_results, event_id, selected_algorithm, "no_data")
-        return
-
-    # -----------------------
-    # Run processing
-    # -----------------------
-    try:
-        process_event(
-            event=row,
-            algorithm=selected_algorithm,
-            dcs=dc_sel,
-            results_dir=RESULTS_DIR,
-            LOGGER=logger,
-        )
-        logger.info(f"{event_id}: Processing completed.")
-        update_event_status(df_results, event_id, selected_algorithm, "done")
-
-    except Exception as e:
-        logger.exception(f"Error processing event {event_id}: {e}")
-        update_event_status(df_results, event_id, selected_algorithm, "error")
-
 
 # -----------------------
 # Main
 # -----------------------
-def main():
+def main(
+    executor_backend: str = EXECUTOR_BACKEND,
+    max_workers: int = None,
+    metrics_mode: str = METRICS_MODE,
+    batch_size: int = BATCH_EVENTS,
+    event_workers: int = 0,
+    event_timeout: float = EVENT_TIMEOUT,
+    composites: bool = COMPOSITES,
+):
     df = pd.read_csv(DB_PATH)
     logger.info(f"Total number of flood events in DB: {len(df)}")
 
-    df_results = pd.read_csv(RESULTS_FILE)
-    
-    for selected_algorithm in [GFMAlgorithm.ENSEMBLE, GFMAlgorithm.LIST, GFMAlgorithm.DLR ,GFMAlgorithm.TUW ]:
-        logger.info(f"Selected GFM Algorithm: {selected_algorithm.value}")
+    runner = EventRunner(run_config(metrics_mode, composites), logger)
+    # statuses live in the status store; processing_results.csv is exported from it.
+    # A new store is filled from the existing CSV and outputs (scanned once).
+    runner.initialize_status(RESULTS_FILE)
+
+    if event_workers:
+        # events in parallel processes, resumed from the status store
+        outcomes = runner.run_parallel(df, ALGORITHMS, event_workers, event_timeout)
+        logger.info(f"Event outcomes: {outcomes}")
+        runner.status_store.export_csv(RESULTS_FILE)
+        if runner.config.triage:
+            export_triage_summary(RESULTS_DIR)
+        runner.results_dataset.compact()
+        logger.info("Processing completed for all events.")
+        return
 
-        # Ensure column exists
-        if selected_algorithm.value not in df_results.columns:
-            df_results[selected_algorithm.value] = ""
-        # df = df.iloc[899:]
+    # one worker pool shared by all events
+    executor = MetricsExecutor(executor_backend, max_workers=max_workers)
+    logger.info(f"Flood metrics executor: {executor.backend} ({executor.max_workers} workers)")
+
+    # df = df.iloc[899:]
+    # event-major: AOI, image discovery and tile selection shared by all algorithms
+    logger.info(f"GFM Algorithms: {', '.join(a.value for a in ALGORITHMS)}")
+    if batch_size and metrics_mode == "aoi":
+        # events queued per algorithm, each batch one metrics pass
+        runner.run_batched(df, ALGORITHMS, executor, batch_size)
+    else:
         for _, row in tqdm(
             df.iterrows(),
             total=len(df),
             desc="Processing Flood Events",
             unit="event"
-        ):  
+        ):
             try:
-                
-                process_single_event(row, selected_algorithm, df_results)
+                runner.run_event(row, ALGORITHMS, executor)
             except Exception as e:
                 logger.warning(f"{e}")
 
-        # Save once at the end
-        df_results.to_csv(RESULTS_FILE, index=False)
-        logger.info("Processing completed for all events.")
+    # Export once at the end, merge the per-event parts
+    runner.status_store.export_csv(RESULTS_FILE)
+    if runner.config.triage:
+        export_triage_summary(RESULTS_DIR)
+    runner.results_dataset.compact()
+    logger.info("Processing completed for all events.")
+
+    executor.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compute GFM flood metrics for GDACS events")
+    parser.add_argument("--executor", choices=EXECUTOR_BACKENDS, default=EXECUTOR_BACKEND)
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument(
+        "--triage",
+        action="store_true",
+        help="estimate flood areas from overviews into results/triage",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=BATCH_EVENTS,
+        help="events per shared metrics pass (0: event by event)",
+    )
+    parser.add_argument(
+        "--events",
+        type=int,
+        default=0,
+        help="process this many events in parallel worker processes (0: one at a time)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=EVENT_TIMEOUT,
+        help="seconds per event with --events",
+    )
+    parser.add_argument(
+        "--composites",
+        action="store_true",
+        default=COMPOSITES,
+        help="also write per-AOI maximum flood extent composites (reads the flood files again)",
+    )
+    args = parser.parse_args()
+
+    main(
+        args.executor,
+        args.workers,
+        "approx" if args.triage else METRICS_MODE,
+        args.batch,
+        args.events,
+        args.timeout,
+        args.composites,
+    )
\ No newline at end of file
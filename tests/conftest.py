@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+# Europe Equi7 grid (EPSG:27704), 20 m pixels
+EQUI7_EU_CRS = "EPSG:27704"
+PIXEL_SIZE = 20.0
+
+
+def write_tif(
+    path, data, origin=(5_100_000.0, 3_100_000.0), crs=EQUI7_EU_CRS, nodata=255, **profile
+):
+    """
+    Write a single band uint8 GeoTIFF with its upper left corner at `origin`;
+    `profile` adds creation options (e.g. `tiled=True, blockxsize=16`).
+    """
+    data = np.asarray(data, dtype="uint8")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=data.shape[0],
+        width=data.shape[1],
+        count=1,
+        dtype="uint8",
+        crs=crs,
+        transform=from_origin(*origin, PIXEL_SIZE, PIXEL_SIZE),
+        nodata=nodata,
+        **profile,
+    ) as dst:
+        dst.write(data, 1)
+    return path
+
+
+@pytest.fixture
+def make_tif(tmp_path):
+    """`write_tif` into the test's temporary directory."""
+    return lambda name, data, **kwargs: write_tif(tmp_path / name, data, **kwargs)
+
+
+@pytest.fixture
+def flood_tif(tmp_path):
+    """10x10 flood extent: a flooded 4x4 block, one nodata row, dry elsewhere."""
+    data = np.zeros((10, 10), dtype="uint8")
+    data[2:6, 2:6] = 1
+    data[9, :] = 255
+    return write_tif(tmp_path / "flood.tif", data)
@@ -0,0 +1,58 @@
+from shapely.geometry import Polygon
+
+from gdacs_gfm.aoi_cache import AOI_OK, BBOX_TOLERANCE, AOICache, ToleranceCache
+from gdacs_gfm.metric_cache import aoi_hash
+from gdacs_gfm.sqlite_utils import connect
+
+SQUARE = Polygon([(48.0, 14.0), (49.0, 14.0), (49.0, 15.0), (48.0, 15.0)])
+
+
+def test_tolerance_is_reused_for_the_same_aoi(tmp_path):
+    cache = ToleranceCache(tmp_path / "tolerances.sqlite")
+    cache.put("FL-1", 0, aoi_hash(SQUARE), 0.02)
+    cache.put("FL-1", 1, aoi_hash(SQUARE), BBOX_TOLERANCE)
+
+    assert cache.get("FL-1", 0, aoi_hash(SQUARE)) == 0.02
+    assert cache.get("FL-1", 1, aoi_hash(SQUARE)) == BBOX_TOLERANCE
+    assert cache.get("FL-2", 0, aoi_hash(SQUARE)) is None
+
+
+def test_edited_aoi_misses_the_tolerance(tmp_path):
+    cache = ToleranceCache(tmp_path / "tolerances.sqlite")
+    cache.put("FL-1", 0, aoi_hash(SQUARE), BBOX_TOLERANCE)
+    edited = SQUARE.buffer(0.1)
+
+    assert cache.get("FL-1", 0, aoi_hash(edited)) is None
+
+    cache.put("FL-1", 0, aoi_hash(edited), 0.01)
+    assert cache.get("FL-1", 0, aoi_hash(edited)) == 0.01
+    assert cache.get("FL-1", 0, aoi_hash(SQUARE)) is None
+
+
+def test_tolerances_of_the_old_key_are_dropped(tmp_path):
+    path = tmp_path / "tolerances.sqlite"
+    conn = connect(path)
+    conn.execute(
+        "CREATE TABLE tolerances (event_id TEXT NOT NULL, aoi_index INTEGER NOT NULL, "
+        "tolerance TEXT NOT NULL, PRIMARY KEY (event_id, aoi_index))"
+    )
+    conn.execute("INSERT INTO tolerances VALUES ('FL-1', 0, 'bbox')")
+    conn.commit()
+    conn.close()
+
+    cache = ToleranceCache(path)
+
+    assert cache.get("FL-1", 0, aoi_hash(SQUARE)) is None
+    cache.put("FL-1", 0, aoi_hash(SQUARE), 0.05)
+    assert cache.get("FL-1", 0, aoi_hash(SQUARE)) == 0.05
+
+
+def test_aoi_cache_follows_the_geojson_source_key(tmp_path):
+    cache = AOICache(tmp_path / "aois.sqlite")
+    cache.put("FL-1", (1, 100), AOI_OK, [SQUARE, SQUARE.buffer(0.5)])
+
+    status, polygons = cache.get("FL-1", (1, 100))
+
+    assert status == AOI_OK
+    assert [p.equals(q) for p, q in zip(polygons, [SQUARE, SQUARE.buffer(0.5)])] == [True, True]
+    assert cache.get("FL-1", (2, 100)) is None
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+from shapely.geometry import Polygon
+
+from gdacs_gfm.batch import EventWork, batch_flood_metrics
+from gdacs_gfm.executors import MetricsExecutor
+from gdacs_gfm.pipeline import add_flood_metrics_executor
+
+X0, Y0, PIXEL_SIZE = 5_100_000.0, 3_100_000.0, 20.0
+
+
+def latlon_box(col0, row0, col1, row1):
+    """(lat, lon) AOI of a box in pixels of the test grid."""
+    transformer = Transformer.from_crs("EPSG:27704", "EPSG:4326")
+    x0, x1 = X0 + col0 * PIXEL_SIZE, X0 + col1 * PIXEL_SIZE
+    y0, y1 = Y0 - row0 * PIXEL_SIZE, Y0 - row1 * PIXEL_SIZE
+    corners = [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+    return Polygon([transformer.transform(x, y) for x, y in corners])
+
+
+def test_batch_matches_per_event_metrics(make_tif):
+    rng = np.random.default_rng(3)
+    shared = make_tif("shared.tif", rng.choice([0, 1, 255], size=(20, 20)))
+    own = make_tif("own.tif", rng.choice([0, 1, 255], size=(20, 20)))
+    works = [
+        # both events label their AOIs AOI_1 / AOI_2, on a shared file
+        EventWork(
+            pd.Series({"GDACS_ID": "FL-1"}),
+            pd.DataFrame({"filepath": [str(shared), str(shared)], "aoi": ["AOI_1", "AOI_2"]}),
+            {"AOI_1": latlon_box(0, 0, 10, 10), "AOI_2": latlon_box(5.5, 5.5, 17.2, 19.9)},
+        ),
+        EventWork(
+            pd.Series({"GDACS_ID": "FL-2"}),
+            pd.DataFrame({"filepath": [str(shared), str(own)], "aoi": ["AOI_1", "AOI_1"]}),
+            {"AOI_1": latlon_box(2.5, 0, 20, 7.5)},
+        ),
+    ]
+
+    with MetricsExecutor("serial") as executor:
+        batched = batch_flood_metrics(works, executor, detailed=True)
+        separate = [
+            add_flood_metrics_executor(w.event_df.copy(), executor, w.polygons, detailed=True)
+            for w in works
+        ]
+
+    for batch_df, event_df in zip(batched, separate):
+        pd.testing.assert_frame_equal(batch_df, event_df, check_dtype=False)
+    assert batched[0]["pixel_count"].iloc[0] != batched[1]["pixel_count"].iloc[0]
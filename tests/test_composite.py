@@ -0,0 +1,154 @@
+import numpy as np
+import pytest
+import rasterio
+from pyproj import Transformer
+from shapely.geometry import Point, Polygon
+
+from gdacs_gfm.composite import (
+    COMPOSITE_NODATA,
+    _to_day,
+    build_flood_composite,
+    composite_grid,
+)
+from gdacs_gfm.raster_stats import AOIProjector
+
+# grid of the `conftest.write_tif` rasters
+EQUI7_EU_CRS = "EPSG:27704"
+PIXEL_SIZE = 20.0
+X0, Y0 = 5_100_000.0, 3_100_000.0
+
+
+def latlon_polygon(corners):
+    """(lat, lon) AOI of Equi7 EU `(x, y)` corners."""
+    transformer = Transformer.from_crs(EQUI7_EU_CRS, "EPSG:4326")
+    return Polygon([transformer.transform(x, y) for x, y in corners])
+
+
+def pixel_box(col0, row0, col1, row1):
+    """Corners of a box given in (fractional) pixels of the test grid."""
+    x0, x1 = X0 + col0 * PIXEL_SIZE, X0 + col1 * PIXEL_SIZE
+    y0, y1 = Y0 - row0 * PIXEL_SIZE, Y0 - row1 * PIXEL_SIZE
+    return [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+
+
+def brute_force_composite(files, times, geom, transform, shape):
+    """Composite evaluated pixel by pixel at the composite pixel centres."""
+    extent = np.full(shape, COMPOSITE_NODATA, dtype=np.int64)
+    first = np.full(shape, COMPOSITE_NODATA, dtype=np.int64)
+    count = np.full(shape, COMPOSITE_NODATA, dtype=np.int64)
+    sources = []
+    for fp, time in zip(files, times):
+        with rasterio.open(fp) as src:
+            sources.append((_to_day(time), src.read(1), src.transform, src.shape))
+
+    for row in range(shape[0]):
+        for col in range(shape[1]):
+            x, y = transform * (col + 0.5, row + 0.5)
+            if not geom.contains(Point(x, y)):
+                continue
+            for day, data, src_transform, (height, width) in sorted(sources, key=lambda s: s[0]):
+                c, r = ~src_transform * (x, y)
+                r, c = int(np.floor(r)), int(np.floor(c))
+                if not (0 <= r < height and 0 <= c < width) or data[r, c] == 255:
+                    continue
+                if extent[row, col] == COMPOSITE_NODATA:
+                    extent[row, col], first[row, col], count[row, col] = 0, 0, 0
+                if data[r, c] == 1:
+                    extent[row, col] = 1
+                    count[row, col] += 1
+                    first[row, col] = first[row, col] or day
+    return np.stack([extent, first, count])
+
+
+@pytest.fixture
+def flood_series(make_tif):
+    """Two time steps on shifted 10x10 tiles, with floods, dry and nodata pixels."""
+    rng = np.random.default_rng(0)
+    early = rng.choice([0, 1, 255], size=(10, 10), p=[0.5, 0.3, 0.2]).astype("uint8")
+    late = rng.choice([0, 1, 255], size=(10, 10), p=[0.4, 0.4, 0.2]).astype("uint8")
+    files = [
+        make_tif("late.tif", late, origin=(X0 + 3 * PIXEL_SIZE, Y0)),
+        make_tif("early.tif", early),
+    ]
+    return files, ["20230105T060000", "20230102T060000"]
+
+
+@pytest.mark.parametrize(
+    "box",
+    [
+        (0, 0, 13, 10),  # pixel aligned, both tiles
+        (2.3, 1.6, 7.7, 8.4),  # partial first/last rows and columns
+        (-4.5, -2.5, 4.2, 3.5),  # partly outside the tiles
+    ],
+)
+def test_composite_matches_brute_force(flood_series, tmp_path, box):
+    files, times = flood_series
+    polygon = latlon_polygon(pixel_box(*box))
+
+    out = build_flood_composite(files, times, polygon, tmp_path / "out" / "composite.tif")
+
+    with rasterio.open(out) as dst:
+        composite = dst.read()
+        transform, shape = dst.transform, dst.shape
+        assert dst.nodata == COMPOSITE_NODATA
+    geom = AOIProjector({"aoi": polygon}).get("aoi", EQUI7_EU_CRS)
+    expected = brute_force_composite(files, times, geom, transform, shape)
+
+    np.testing.assert_array_equal(composite, expected)
+
+
+def test_composite_partial_edge_pixels_are_not_nodata(make_tif, tmp_path):
+    data = np.ones((10, 10), dtype="uint8")
+    fp = make_tif("flood.tif", data)
+    # the last column and row are only partly inside the AOI bounds
+    polygon = latlon_polygon(pixel_box(2.3, 2.3, 7.7, 7.7))
+
+    out = build_flood_composite([fp], ["20230101T000000"], polygon, tmp_path / "c.tif")
+
+    with rasterio.open(out) as dst:
+        extent = dst.read(1)
+    assert extent.shape == (6, 6)
+    # pixel centres at 2.5 .. 7.5 are all inside the AOI
+    assert (extent == 1).all()
+
+
+def test_composite_skips_files_off_the_aoi(make_tif, tmp_path):
+    near = make_tif("near.tif", np.ones((10, 10), dtype="uint8"))
+    far = make_tif("far.tif", np.ones((10, 10), dtype="uint8"), origin=(X0 + 10_000, Y0))
+    polygon = latlon_polygon(pixel_box(1, 1, 9, 9))
+
+    out = build_flood_composite(
+        [near, far], ["20230101T000000", "20230102T000000"], polygon, tmp_path / "c.tif"
+    )
+
+    with rasterio.open(out) as dst:
+        count = dst.read(3)
+    assert count[count != COMPOSITE_NODATA].max() == 1
+
+
+def test_composite_of_disjoint_aoi_is_none(flood_tif, tmp_path):
+    polygon = latlon_polygon(pixel_box(100, 100, 110, 110))
+
+    assert build_flood_composite([flood_tif], ["20230101T000000"], polygon, tmp_path / "c.tif") is None
+
+
+def test_composite_grid_opens_one_file_per_tile(make_tif, monkeypatch):
+    stamp = "VV_EU020M_E051N030T3.tif"
+    files = [
+        make_tif(f"ENSEMBLE_FLOOD_2023080{day}T053012_{stamp}", np.ones((10, 10), dtype="uint8"))
+        for day in (1, 2, 3)
+    ]
+    opened = []
+    rasterio_open = rasterio.open
+
+    def counting_open(fp, *args, **kwargs):
+        opened.append(fp)
+        return rasterio_open(fp, *args, **kwargs)
+
+    monkeypatch.setattr(rasterio, "open", counting_open)
+    geom = AOIProjector({"aoi": latlon_polygon(pixel_box(1, 1, 9, 9))}).get("aoi", EQUI7_EU_CRS)
+
+    crs, transform, width, height = composite_grid(files, geom)
+
+    assert opened == [files[0]]
+    assert crs == EQUI7_EU_CRS and width >= 8 and height >= 8
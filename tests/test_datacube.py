@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("osgeo")
+
+from shapely.geometry import Polygon
+
+from gdacs_gfm.datacube import register_tiles, tile_membership
+
+
+def test_register_tiles_reads_one_file_per_tile(make_tif):
+    a = make_tif("a.tif", [[0, 1], [1, 0]])
+    b = make_tif("b.tif", [[0, 0], [0, 0]])
+    c = make_tif("c.tif", [[1]], origin=(5_400_000.0, 3_100_000.0))
+    register = pd.DataFrame(
+        {"filepath": [str(a), str(b), str(c)], "tile_name": ["E051N030T3", "E051N030T3", "E054N030T3"]}
+    )
+
+    tiles = register_tiles(register)
+
+    assert [t.name for t in tiles] == ["E051N030T3", "E054N030T3"]
+    assert (tiles[0].n_rows, tiles[0].n_cols) == (2, 2)
+    assert tiles[1].geotrans == (5_400_000.0, 20.0, 0.0, 3_100_000.0, 0.0, -20.0)
+
+
+def test_tile_membership_labels_aois_in_polygon_order():
+    # (lat, lon) polygons: one over central Europe, one far away
+    europe = Polygon([(48.0, 14.0), (48.0, 16.0), (49.0, 16.0), (49.0, 14.0)])
+    south_america = Polygon([(-10.0, -60.0), (-10.0, -59.0), (-9.0, -59.0), (-9.0, -60.0)])
+
+    membership = tile_membership(["E051N015T3", "E051N030T3"], [south_america, europe], "EU020M")
+
+    assert set(membership["aoi"]) == {"AOI_2"}
+    assert list(membership["tile_name"]) == ["E051N015T3"]
@@ -0,0 +1,72 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("concurrent_log_handler")
+
+from gdacs_gfm.event_pool import CRASHED, ERROR, OK, TIMEOUT, EventPool
+
+
+def task(event):
+    """Test task: its behaviour is chosen by the event."""
+    action = event["action"]
+    if action == "error":
+        raise ValueError("bad event")
+    if action == "sleep":
+        time.sleep(60)
+    if action == "crash":
+        os._exit(3)
+    return event["GDACS_ID"] * 2
+
+
+def events(*actions):
+    return [{"GDACS_ID": k, "action": action} for k, action in enumerate(actions)]
+
+
+def run(actions, **kwargs):
+    pool = EventPool(task, max_workers=2, **kwargs)
+    return {result.event_id: result for result in pool.run(events(*actions))}
+
+
+def test_results_of_all_events():
+    results = run(["ok"] * 5)
+
+    assert {k: r.status for k, r in results.items()} == {k: OK for k in range(5)}
+    assert {k: r.value for k, r in results.items()} == {k: 2 * k for k in range(5)}
+
+
+def test_errors_only_fail_their_event():
+    results = run(["ok", "error", "ok"])
+
+    assert results[1].status == ERROR
+    assert "ValueError: bad event" in results[1].error
+    assert results[0].ok and results[2].ok
+
+
+def test_crashed_worker_is_replaced():
+    results = run(["crash", "ok", "ok", "ok"])
+
+    assert results[0].status == CRASHED
+    assert "exit code 3" in results[0].error
+    assert all(results[k].ok for k in (1, 2, 3))
+
+
+def test_timed_out_event_is_terminated():
+    start = time.monotonic()
+    results = run(["sleep", "ok", "ok"], timeout=2)
+
+    assert results[0].status == TIMEOUT
+    assert all(results[k].ok for k in (1, 2))
+    assert time.monotonic() - start < 30
+
+
+def test_failing_initializer_stops_the_run():
+    pool = EventPool(task, max_workers=1, initializer=_failing_init)
+
+    with pytest.raises(RuntimeError, match="initialisation failed"):
+        list(pool.run(events("ok")))
+
+
+def _failing_init():
+    raise OSError("no store")
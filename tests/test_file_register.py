@@ -0,0 +1,43 @@
+from gdacs_gfm.config import DIMENSIONS, FL_DEF_DICT
+from gdacs_gfm.file_register import decode_file_register, detect_scheme, parse_file_register
+
+TUW = "/gfm/TUW_FLOOD_20230801T053012_VV_EU020M_E051N030T3.tif"
+FLOOD_HM = "/gfm/FLOOD-HM_20230801T053012_VV-_A117_E051N030T3_EU020M_V1M1R1_S1.tif"
+ENSEMBLE = "/gfm/ENSEMBLE_FLOOD_20230801T053012_VV_EU020M_E051N030T3.tif"
+
+
+def test_detect_scheme():
+    assert detect_scheme(TUW) == "flood"
+    assert detect_scheme(FLOOD_HM) == "flood_hm"
+    assert detect_scheme(ENSEMBLE) == "ensemble_flood"
+    assert detect_scheme("/gfm/readme.tif") is None
+
+
+def test_parse_file_register_matches_fixed_widths():
+    register = parse_file_register([TUW], FL_DEF_DICT["tuw"], DIMENSIONS)
+    row = register.iloc[0]
+    assert (row["algorithm"], row["time"], row["pol"], row["tile_name"]) == (
+        "TUW",
+        "20230801T053012",
+        "VV",
+        "E051N030T3",
+    )
+
+
+def test_decode_mixed_schemes_keeps_order_and_unknown_files():
+    files = [FLOOD_HM, TUW, "/gfm/readme.tif", ENSEMBLE]
+    register = decode_file_register(files, DIMENSIONS)
+
+    assert list(register["filepath"]) == files
+    assert list(register["scheme"]) == ["flood_hm", "flood", None, "ensemble_flood"]
+    # FLOOD-HM names put the tile before the grid and pad the polarisation
+    assert register.loc[0, "tile_name"] == "E051N030T3"
+    assert register.loc[0, "equi7_grid"] == "EU020M"
+    assert register.loc[0, "pol"] == "VV"
+    assert register.loc[2, "tile_name"] is None
+
+
+def test_fixed_width_parse_misreads_flood_hm_names():
+    # why mixed TUW/FLOOD-HM days need scheme detection
+    register = parse_file_register([FLOOD_HM], FL_DEF_DICT["tuw"], DIMENSIONS)
+    assert register.loc[0, "tile_name"] != "E051N030T3"
@@ -0,0 +1,90 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from gdacs_gfm import gfm_catalog
+from gdacs_gfm.gfm_catalog import GFMCatalog
+from gdacs_gfm.gfm_layout import GFMStoragePeriod
+
+DAY = datetime(2023, 8, 1)
+NAME = "ENSEMBLE_FLOOD_20230801T000000__VV_E051N030T3_EU020M_V0M2R1_S1AIWGRDH.tif"
+
+
+@pytest.fixture
+def period(tmp_path):
+    return GFMStoragePeriod("archive", datetime(2015, 1, 1), datetime(2024, 3, 31), tmp_path / "archive")
+
+
+def layer_dir(period, layer="flood_extent", grid="EU"):
+    return period.root_dir / "layers" / layer / grid
+
+
+def add_file(period, name=NAME, day=DAY, **kwargs):
+    day_dir = layer_dir(period, **kwargs) / day.strftime("%Y/%m/%d")
+    day_dir.mkdir(parents=True, exist_ok=True)
+    (day_dir / name).touch()
+    return day_dir
+
+
+def set_mtime(path, seconds_ago):
+    t = datetime.now().timestamp() - seconds_ago
+    os.utime(path, (t, t))
+
+
+def catalog_files(catalog, period, **kwargs):
+    listing = catalog.day_files(layer_dir(period, **kwargs), [DAY])
+    return sorted(p.name for p in listing.get(DAY.date(), []))
+
+
+def test_refresh_indexes_files(tmp_path, period):
+    add_file(period)
+    with GFMCatalog(tmp_path / "catalog.sqlite") as catalog:
+        assert catalog.refresh([period]) == 1
+        assert catalog_files(catalog, period) == [NAME]
+        assert catalog.query(tile="E051N030T3") == [layer_dir(period) / "2023/08/01" / NAME]
+
+
+def test_incremental_refresh_skips_old_unchanged_dirs(tmp_path, period):
+    day_dir = add_file(period)
+    for path in (day_dir, day_dir.parent, day_dir.parent.parent, layer_dir(period)):
+        set_mtime(path, 3600)
+    with GFMCatalog(tmp_path / "catalog.sqlite") as catalog:
+        assert catalog.refresh([period]) == 1
+        assert catalog.refresh([period]) == 0
+
+
+def test_write_in_same_mtime_tick_is_seen(tmp_path, period):
+    day_dir = add_file(period)
+    with GFMCatalog(tmp_path / "catalog.sqlite") as catalog:
+        catalog.refresh([period])
+        # a second file written without changing the (coarse) directory mtime
+        mtime = day_dir.stat().st_mtime_ns
+        (day_dir / NAME.replace("E051N030T3", "E051N033T3")).touch()
+        os.utime(day_dir, ns=(mtime, mtime))
+
+        assert catalog.refresh([period]) == 1
+        assert len(catalog_files(catalog, period)) == 2
+
+
+def test_removed_directories_are_purged(tmp_path, period, monkeypatch):
+    monkeypatch.setattr(gfm_catalog, "MTIME_GRANULARITY_NS", 0)
+    day_dir = add_file(period)
+    add_file(period, layer="uncertainty")
+    with GFMCatalog(tmp_path / "catalog.sqlite") as catalog:
+        catalog.refresh([period])
+        assert catalog.has_layer_dir(layer_dir(period, layer="uncertainty"))
+
+        (day_dir / NAME).unlink()
+        for path in (day_dir, day_dir.parent, day_dir.parent.parent):
+            path.rmdir()
+        uncertainty_day = layer_dir(period, layer="uncertainty") / "2023/08/01"
+        (uncertainty_day / NAME).unlink()
+        for path in (uncertainty_day, uncertainty_day.parent, uncertainty_day.parent.parent,
+                     layer_dir(period, layer="uncertainty"), layer_dir(period, layer="uncertainty").parent):
+            path.rmdir()
+
+        catalog.refresh([period])
+        assert catalog_files(catalog, period) == []
+        assert not catalog.has_layer_dir(layer_dir(period, layer="uncertainty"))
+        assert catalog.query(layer="uncertainty") == []
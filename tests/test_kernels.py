@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from gdacs_gfm.kernels import (
+    LAYER_COUNTS,
+    LAYER_SUMS,
+    accumulate_histogram,
+    binned_counts,
+    layer_stack_counts,
+    new_histogram,
+    new_layer_accumulators,
+)
+
+
+@pytest.fixture
+def blocks():
+    rng = np.random.default_rng(2)
+    flood = rng.choice([0, 1, 255], size=(37, 23)).astype("uint8")
+    exclusion = rng.choice([0, 1, 255], size=flood.shape).astype("uint8")
+    obswater = rng.choice([0, 1, 255], size=flood.shape).astype("uint8")
+    uncertainty = rng.integers(0, 256, size=flood.shape).astype("uint8")
+    mask = rng.random(flood.shape) < 0.7
+    return flood, exclusion, obswater, uncertainty, mask
+
+
+@pytest.mark.parametrize("masked", [False, True])
+def test_histogram_matches_bincount(blocks, masked):
+    data, *_, mask = blocks
+    mask = mask if masked else None
+    hist = new_histogram()
+
+    accumulate_histogram(data, hist, mask)
+    accumulate_histogram(data, hist, mask)
+
+    values = data if mask is None else data[mask]
+    np.testing.assert_array_equal(hist, 2 * np.bincount(values.ravel(), minlength=256))
+
+
+def test_histogram_of_wider_dtypes_skips_out_of_range_values():
+    data = np.array([[0, 1, 1], [255, 256, -1]], dtype=np.int16)
+    hist = new_histogram()
+
+    accumulate_histogram(data, hist)
+
+    assert hist[0] == 1 and hist[1] == 2 and hist[255] == 1
+    assert hist.sum() == 4
+
+
+def test_binned_counts():
+    hist = np.arange(256, dtype=np.int64)
+
+    counts = binned_counts(hist, (0, 10, 20, 101))
+
+    assert list(counts) == [sum(range(0, 10)), sum(range(10, 20)), sum(range(20, 101))]
+
+
+@pytest.mark.parametrize("masked", [False, True])
+def test_layer_stack_counts_match_numpy(blocks, masked):
+    flood, exclusion, obswater, uncertainty, mask = blocks
+    counts, sums, uhist = new_layer_accumulators()
+
+    layer_stack_counts(
+        flood, exclusion, obswater, uncertainty, mask if masked else None, counts, sums, uhist
+    )
+
+    inside = mask if masked else np.ones(flood.shape, dtype=bool)
+    valid = inside & (flood <= 1)
+    excluded = valid & (exclusion == 1)
+    flooded = valid & (flood == 1)
+    flooded_valid = flooded & ~excluded
+    with_uncertainty = flooded_valid & (uncertainty <= 100)
+    expected = {
+        "flooded": flooded.sum(),
+        "flooded_valid": flooded_valid.sum(),
+        "excluded": excluded.sum(),
+        "reference_water": (valid & (flood == 0) & (obswater == 1)).sum(),
+        "valid": valid.sum(),
+        "uncertainty_pixels": with_uncertainty.sum(),
+        "nodata": (inside & (flood > 1)).sum(),
+    }
+    u = uncertainty[with_uncertainty].astype(np.float64)
+
+    assert dict(zip(LAYER_COUNTS, counts)) == expected
+    assert dict(zip(LAYER_SUMS, sums)) == pytest.approx(
+        {"uncertainty": u.sum(), "confidence": ((100 - u) / 100).sum()}
+    )
+    np.testing.assert_array_equal(uhist, np.bincount(u.astype(np.int64), minlength=256))
+
+
+def test_layer_stack_counts_without_context_layers(blocks):
+    flood, *_ = blocks
+    counts, sums, uhist = new_layer_accumulators()
+
+    layer_stack_counts(flood, None, None, None, None, counts, sums, uhist)
+
+    result = dict(zip(LAYER_COUNTS, counts))
+    assert result["flooded"] == result["flooded_valid"] == (flood == 1).sum()
+    assert result["valid"] == (flood <= 1).sum()
+    assert result["excluded"] == result["reference_water"] == result["uncertainty_pixels"] == 0
+    assert not sums.any() and not uhist.any()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from gdacs_gfm.executors import MetricsExecutor
+from gdacs_gfm.layer_stack import layer_stack_statistics
+from gdacs_gfm.pipeline import add_layer_metrics
+
+STAMP = "20230801T053012_VV_EU020M_E051N030T3"
+FLOOD = f"ENSEMBLE_FLOOD_{STAMP}.tif"
+EXCLUSION = f"EXCLUSION_LAYER_{STAMP}.tif"
+UNCERTAINTY = f"ENSEMBLE_UNCERTAINTY_{STAMP}.tif"
+
+
+def test_detailed_layer_metrics_bin_the_uncertainty(make_tif):
+    flood = np.array([[1, 1, 1, 1], [1, 1, 0, 255], [0, 0, 0, 255], [1, 1, 1, 1]])
+    exclusion = np.zeros((4, 4))
+    exclusion[3, :] = 1
+    uncertainty = np.array([[5, 15, 15, 95], [100, 250, 0, 0], [0, 0, 0, 0], [5, 5, 5, 5]])
+    files = {
+        "exclusion": [str(make_tif(EXCLUSION, exclusion))],
+        "uncertainty": [str(make_tif(UNCERTAINTY, uncertainty))],
+    }
+    df = pd.DataFrame({"filepath": [str(make_tif(FLOOD, flood))]})
+
+    with MetricsExecutor("serial") as executor:
+        brief = add_layer_metrics(df, files, executor)
+        detailed = add_layer_metrics(df, files, executor, detailed=True)
+
+    row = detailed.iloc[0]
+    assert "uncertainty_00_09" not in brief.columns
+    assert row["pixel_count"] == 10 and row["flooded_valid_pixels"] == 6
+    assert row["non_flooded_pixels"] == 4 and row["nodata_pixels"] == 2
+    # valid flooded pixels with an uncertainty value (250 is nodata, row 3 excluded)
+    assert row["uncertainty_00_09"] == 1
+    assert row["uncertainty_10_19"] == 2
+    assert row["uncertainty_90_100"] == 2
+    assert sum(row[c] for c in detailed.columns if c.startswith("uncertainty_")) == 5
+    assert row["mean_uncertainty"] == (5 + 15 + 15 + 95 + 100) / 5
+
+
+def test_uncertainty_bins_need_the_uncertainty_layer(flood_tif):
+    stats = layer_stack_statistics(str(flood_tif), detailed=True)
+
+    assert stats["pixel_count"] == 16 and stats["nodata_pixels"] == 10
+    assert not any(key.startswith("uncertainty_") for key in stats)
+
+
+def test_reference_water_is_counted_apart_from_the_flood(make_tif):
+    flood = np.array([[1, 1, 0, 0], [1, 0, 0, 255]])
+    # observed water = flood + reference water
+    observed = np.array([[1, 1, 1, 0], [1, 1, 0, 255]])
+    exclusion = np.array([[0, 1, 0, 0], [0, 0, 0, 0]])
+    stats = layer_stack_statistics(
+        str(make_tif(FLOOD, flood)),
+        str(make_tif(EXCLUSION, exclusion)),
+        str(make_tif(f"ENSEMBLE_OBSWATER_{STAMP}.tif", observed)),
+    )
+
+    assert stats["pixel_count"] == 3
+    assert stats["flooded_valid_pixels"] == 2
+    assert stats["reference_water_pixels"] == 2
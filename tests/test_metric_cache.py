@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gdacs_gfm import metric_cache
+from gdacs_gfm.executors import MetricsExecutor
+from gdacs_gfm.metric_cache import MetricCache, cached_run, files_kind, metric_key
+from gdacs_gfm.pipeline import add_layer_metrics
+
+FLOOD = "ENSEMBLE_FLOOD_20230801T053012_VV_EU020M_E051N030T3.tif"
+EXCLUSION = "EXCLUSION_LAYER_20230801T053012_VV_EU020M_E051N030T3.tif"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MetricCache(tmp_path / "metric_cache.sqlite")
+    yield cache
+    cache.close()
+
+
+def counting(values):
+    calls = []
+
+    def compute(indices):
+        calls.append(list(indices))
+        return [(values[i], None) for i in indices]
+
+    return compute, calls
+
+
+def test_cached_run_only_computes_misses(cache, make_tif):
+    files = [make_tif(f"{i}.tif", [[i]]) for i in range(3)]
+    keys = [metric_key(fp, "metrics") for fp in files]
+    compute, calls = counting([10, 11, 12])
+
+    assert cached_run(cache, keys[:2], compute) == [(10, None), (11, None)]
+    assert cached_run(cache, keys, compute) == [(10, None), (11, None), (12, None)]
+    assert calls == [[0, 1], [2]]
+
+
+def test_changed_file_is_a_miss(cache, make_tif):
+    fp = make_tif("a.tif", [[1]])
+    cache.put_many({metric_key(fp, "metrics"): [1, 0.0004]})
+
+    make_tif("a.tif", [[1, 1]])
+    os.utime(fp, ns=(1, 1))
+    assert cache.get_many([metric_key(fp, "metrics")]) == {}
+
+
+def test_errors_are_not_cached(cache, make_tif):
+    key = metric_key(make_tif("a.tif", [[1]]), "metrics")
+    cached_run(cache, [key], lambda indices: [(None, "boom") for _ in indices])
+    assert cache.get_many([key]) == {}
+
+
+def test_get_many_spans_lookup_chunks(cache, monkeypatch):
+    monkeypatch.setattr(metric_cache, "LOOKUP_CHUNK", 7)
+    items = {(f"/f/{i}.tif", 1, 1, "", "metrics"): i for i in range(30)}
+    cache.put_many(items)
+
+    wanted = list(items) + [("/f/missing.tif", 1, 1, "", "metrics"), None]
+    assert cache.get_many(wanted) == items
+
+
+def test_eviction_keeps_recently_used_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(metric_cache, "EVICT_CHECK_ROWS", 4)
+    cache = MetricCache(tmp_path / "small.sqlite", max_entries=3)
+    keys = [(f"/f/{i}.tif", 1, 1, "", "metrics") for i in range(4)]
+
+    cache.put_many({keys[0]: 0, keys[1]: 1, keys[2]: 2})
+    cache.get_many([keys[0]])
+    cache.put_many({keys[3]: 3})
+
+    assert set(cache.get_many(keys)) == {keys[0], keys[2], keys[3]}
+
+
+def test_files_kind_tracks_context_files(make_tif):
+    flood = make_tif(FLOOD, [[1]])
+    exclusion = make_tif(EXCLUSION, [[0]])
+
+    missing = files_kind("layers", [None, None])
+    found = files_kind("layers", [str(exclusion), None])
+    assert missing != found
+
+    make_tif(EXCLUSION, [[1, 1]])
+    assert files_kind("layers", [str(exclusion), None]) != found
+    assert files_kind("layers", [str(flood), None]) != found
+
+
+def test_layer_metrics_follow_replaced_exclusion_layer(cache, make_tif):
+    flood = make_tif(FLOOD, np.ones((4, 4)))
+    df = pd.DataFrame({"filepath": [str(flood)]})
+
+    with MetricsExecutor("serial") as executor:
+        # no exclusion layer yet
+        first = add_layer_metrics(df, {"exclusion": []}, executor, cache=cache)
+
+        exclusion = make_tif(EXCLUSION, np.ones((4, 4)))
+        excluded = add_layer_metrics(df, {"exclusion": [str(exclusion)]}, executor, cache=cache)
+
+        make_tif(EXCLUSION, np.zeros((4, 4)))
+        os.utime(exclusion, ns=(1, 1))
+        replaced = add_layer_metrics(df, {"exclusion": [str(exclusion)]}, executor, cache=cache)
+
+    assert first.loc[0, "excluded_pixels"] == 0
+    assert excluded.loc[0, "excluded_pixels"] == 16
+    assert replaced.loc[0, "excluded_pixels"] == 0
@@ -0,0 +1,92 @@
+import logging
+from types import SimpleNamespace
+
+import pandas as pd
+from pyproj import Transformer
+from shapely.geometry import Polygon
+
+from gdacs_gfm.executors import MetricsExecutor
+from gdacs_gfm.pipeline import _run_executor_jobs, add_flood_metrics_executor, process_event
+from gdacs_gfm.status_store import StatusStore
+
+
+def test_flood_metrics_keep_per_file_errors(flood_tif, tmp_path):
+    df = pd.DataFrame({"filepath": [str(flood_tif), str(tmp_path / "missing.tif"), str(flood_tif)]})
+
+    with MetricsExecutor("serial") as executor:
+        out = add_flood_metrics_executor(df, executor)
+
+    assert list(out["pixel_count"][[0, 2]]) == [16, 16]
+    assert out.loc[0, "area_km2"] == 16 * 400 / 1e6
+    assert pd.isna(out.loc[0, "error"])
+    assert pd.isna(out.loc[1, "pixel_count"])
+    assert "missing.tif" in out.loc[1, "error"]
+
+
+def test_detailed_flood_metrics_count_nodata_and_dry_pixels(flood_tif):
+    df = pd.DataFrame({"filepath": [str(flood_tif)]})
+
+    with MetricsExecutor("serial") as executor:
+        out = add_flood_metrics_executor(df, executor, detailed=True)
+
+    row = out.iloc[0]
+    assert row["pixel_count"] == 16
+    assert row["nodata_pixels"] == 10
+    assert row["valid_pixels"] == 90
+    assert row["non_flooded_pixels"] == 74
+
+
+def test_tile_mode_writes_composites(flood_tif, tmp_path):
+    # (lat, lon) AOI over the whole test raster
+    transformer = Transformer.from_crs("EPSG:27704", "EPSG:4326")
+    corners = [
+        (5_100_000, 3_100_000),
+        (5_100_200, 3_100_000),
+        (5_100_200, 3_099_800),
+        (5_100_000, 3_099_800),
+    ]
+    polygon = Polygon([transformer.transform(x, y) for x, y in corners])
+    dc = SimpleNamespace(
+        file_register=pd.DataFrame({"filepath": [str(flood_tif)], "time": ["20230101T000000"]})
+    )
+    event = {"GDACS_ID": "FL1", "country": "Austria"}
+    algorithm = SimpleNamespace(value="ensemble")
+    store = StatusStore(tmp_path / "status.db")
+
+    process_event(
+        event,
+        algorithm,
+        [dc],
+        tmp_path / "results",
+        logging.getLogger("gfm_logger"),
+        metrics_mode="tile",
+        polygons=[polygon],
+        composite_dir=tmp_path / "composites",
+        status_store=store,
+    )
+
+    assert (tmp_path / "composites" / "FL1_ensemble_AOI_1.tif").exists()
+    assert store.get("FL1", algorithm) == "detected"
+
+
+def test_aoi_jobs_carry_only_their_own_aois(tmp_path):
+    square = Polygon([(0, 0), (0, 1), (1, 1), (1, 0)])
+    polygons = {f"AOI_{i}": square.buffer(i * 0.1) for i in range(1, 5)}
+    df = pd.DataFrame(
+        {
+            "filepath": ["a.tif", "a.tif", "b.tif", "b.tif"],
+            "aoi": ["AOI_1", "AOI_2", "AOI_3", "AOI_4"],
+        }
+    )
+    shipped = {}
+
+    def func(fp, aois, projector):
+        shipped[fp] = set(projector.polygons)
+        return [len(aois)] * len(aois)
+
+    with MetricsExecutor("serial") as executor:
+        values, errors = _run_executor_jobs(df, executor, func, polygons)
+
+    assert shipped == {"a.tif": {"AOI_1", "AOI_2"}, "b.tif": {"AOI_3", "AOI_4"}}
+    assert values == [2, 2, 2, 2]
+    assert errors == [None] * 4
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+pytest.importorskip("osgeo")
+
+import shapely
+from shapely.geometry import Polygon
+
+from gdacs_gfm.aoi_cache import AOI_NO_POLYGON, AOI_OK
+from gdacs_gfm.process_geojson import (
+    _parse_event_geojson,
+    compute_polygons_area_km2,
+    prepare_aoi_geometry,
+)
+
+
+def lonlat(poly):
+    return shapely.transform(poly, lambda c: c[:, ::-1])
+
+
+@pytest.mark.parametrize("coords", [
+    [(48.0, 14.0), (49.0, 14.0), (49.0, 15.0), (48.0, 15.0)],
+    [(48.0, 14.0), (48.0, 15.0), (49.0, 15.0), (49.0, 14.0)],
+])
+def test_prepare_aoi_geometry_orients_counter_clockwise_in_lonlat(coords):
+    geom = prepare_aoi_geometry(Polygon(coords))
+    assert lonlat(geom).exterior.is_ccw
+
+
+def test_prepare_aoi_geometry_repairs_and_simplifies():
+    bowtie = Polygon([(0, 0), (1, 1), (1, 0), (0, 1)])
+    assert prepare_aoi_geometry(bowtie).is_valid
+
+    circle = shapely.Point(48.0, 15.0).buffer(0.5, quad_segs=2000)
+    assert shapely.get_num_coordinates(prepare_aoi_geometry(circle, max_coords=500)) <= 500
+
+
+def test_prepare_aoi_geometry_keeps_every_part_of_a_split_polygon():
+    bowtie = Polygon([(0, 0), (1, 1), (1, 0), (0, 1)])
+
+    geom = prepare_aoi_geometry(bowtie)
+
+    assert geom.geom_type == "MultiPolygon"
+    assert len(geom.geoms) == 2
+    assert geom.area == pytest.approx(0.5)
+    assert all(lonlat(part).exterior.is_ccw for part in geom.geoms)
+
+
+def write_geojson(path, rings):
+    features = [{"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [r]}} for r in rings]
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+    return path
+
+
+def test_degenerate_closed_rings_are_skipped(tmp_path):
+    square = [[14.0, 48.0], [15.0, 48.0], [15.0, 49.0], [14.0, 49.0], [14.0, 48.0]]
+    degenerate = [[14.0, 48.0], [15.0, 48.0], [14.0, 48.0]]
+    path = write_geojson(tmp_path / "FL-1.json", [degenerate, square])
+
+    status, polygons = _parse_event_geojson("FL-1", path)
+
+    assert status == AOI_OK
+    assert len(polygons) == 1
+    # stored (lat, lon)
+    assert polygons[0].bounds == (48.0, 14.0, 49.0, 15.0)
+
+
+def test_only_degenerate_rings_means_no_polygon(tmp_path):
+    path = write_geojson(tmp_path / "FL-2.json", [[[14.0, 48.0], [15.0, 48.0], [14.0, 48.0]]])
+    assert _parse_event_geojson("FL-2", path) == (AOI_NO_POLYGON, None)
+
+
+def test_compute_polygons_area_km2_takes_latlon_aois():
+    # 1 x 1 degree at the equator, (lat, lon)
+    square = Polygon([(0.0, 10.0), (0.0, 11.0), (1.0, 11.0), (1.0, 10.0)])
+    assert compute_polygons_area_km2(square) == pytest.approx(12_308, rel=0.001)
+    assert compute_polygons_area_km2([square, square]) == pytest.approx(2 * 12_308, rel=0.001)
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+import rasterio
+from pyproj import Transformer
+from shapely.geometry import Point, Polygon, box
+
+from gdacs_gfm.raster_stats import (
+    AOIProjector,
+    aoi_window,
+    flood_statistics,
+    flood_statistics_aois,
+    value_histogram,
+    value_histograms,
+)
+
+X0, Y0, PIXEL_SIZE = 5_100_000.0, 3_100_000.0, 20.0
+
+
+def pixel_geom(coords):
+    """Equi7 EU geometry of (col, row) pixel coordinates of the test grid."""
+    return Polygon([(X0 + c * PIXEL_SIZE, Y0 - r * PIXEL_SIZE) for c, r in coords])
+
+
+def brute_force_histogram(data, transform, geom):
+    """Value counts of the pixels whose centre lies inside `geom`."""
+    hist = np.zeros(256, dtype=np.int64)
+    for row in range(data.shape[0]):
+        for col in range(data.shape[1]):
+            if geom.contains(Point(transform * (col + 0.5, row + 0.5))):
+                hist[data[row, col]] += 1
+    return hist
+
+
+@pytest.fixture
+def tiled_flood(make_tif):
+    """45x40 flood extent in 16x16 blocks, so AOIs cut partial edge blocks."""
+    rng = np.random.default_rng(1)
+    data = rng.choice([0, 1, 255], size=(45, 40), p=[0.6, 0.3, 0.1]).astype("uint8")
+    fp = make_tif("tiled.tif", data, tiled=True, blockxsize=16, blockysize=16)
+    return fp, data
+
+
+AOIS = {
+    "triangle": pixel_geom([(3.3, 2.7), (37.6, 10.2), (12.4, 43.9)]),
+    # overlaps the last rows and columns only
+    "corner": box(
+        X0 + 30.5 * PIXEL_SIZE, Y0 - 50 * PIXEL_SIZE, X0 + 60 * PIXEL_SIZE, Y0 - 40.2 * PIXEL_SIZE
+    ),
+    "inner": pixel_geom([(16.2, 16.2), (31.8, 16.2), (31.8, 31.8), (16.2, 31.8)]),
+}
+
+
+@pytest.mark.parametrize("name", sorted(AOIS))
+def test_aoi_histogram_matches_brute_force(tiled_flood, name):
+    fp, data = tiled_flood
+    geom = AOIS[name]
+
+    with rasterio.open(fp) as src:
+        hist = value_histogram(src, geom)
+        expected = brute_force_histogram(data, src.transform, geom)
+
+    np.testing.assert_array_equal(hist, expected)
+
+
+def test_multi_aoi_histograms_match_single_aoi_reads(tiled_flood):
+    fp, _ = tiled_flood
+    geoms = list(AOIS.values())
+
+    with rasterio.open(fp) as src:
+        together = value_histograms(src, geoms)
+        apart = [value_histogram(src, geom) for geom in geoms]
+
+    for hist, expected in zip(together, apart):
+        np.testing.assert_array_equal(hist, expected)
+
+
+def test_aoi_window_of_disjoint_aoi_is_none(tiled_flood):
+    fp, _ = tiled_flood
+    far = pixel_geom([(100, 100), (110, 100), (110, 110)])
+
+    with rasterio.open(fp) as src:
+        assert aoi_window(src, far) is None
+        assert value_histogram(src, far).sum() == 0
+
+
+def test_aoi_window_covers_partial_edge_pixels(tiled_flood):
+    fp, _ = tiled_flood
+
+    with rasterio.open(fp) as src:
+        window = aoi_window(src, AOIS["inner"])
+
+    assert (window.col_off, window.row_off, window.width, window.height) == (16, 16, 16, 16)
+
+
+def test_flood_statistics_whole_file(flood_tif):
+    stats = flood_statistics(flood_tif)
+
+    assert stats == {
+        "pixel_count": 16,
+        "area_km2": 16 * 400 / 1e6,
+        "non_flooded_pixels": 74,
+        "nodata_pixels": 10,
+        "valid_pixels": 90,
+    }
+
+
+def test_flood_statistics_of_aois_project_lat_lon_polygons(tiled_flood):
+    fp, data = tiled_flood
+    geom = AOIS["triangle"]
+    transformer = Transformer.from_crs("EPSG:27704", "EPSG:4326")
+    latlon = Polygon([transformer.transform(x, y) for x, y in geom.exterior.coords])
+    projector = AOIProjector({"AOI_1": latlon, "AOI_2": latlon})
+
+    stats = flood_statistics_aois(fp, ["AOI_1", "AOI_2"], projector)
+
+    assert stats[0] == stats[1] == flood_statistics(fp, "AOI_1", projector)
+    with rasterio.open(fp) as src:
+        expected = brute_force_histogram(data, src.transform, projector.get("AOI_1", src.crs))
+    assert stats[0]["pixel_count"] == expected[1]
+    assert stats[0]["valid_pixels"] == expected[0] + expected[1]
@@ -0,0 +1,113 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+
+from gdacs_gfm.algorithms import GFMAlgorithm
+from gdacs_gfm.results_dataset import ResultsDataset
+
+
+def event_metrics(n_files, flooded, error=None):
+    df = pd.DataFrame(
+        {
+            "filepath": [f"/data/file_{k}.tif" for k in range(n_files)],
+            "time": [f"2023080{k + 1}T053000" for k in range(n_files)],
+            "aoi": "AOI_1",
+            "tile_name": "E051N015T3",
+            "pixel_count": [flooded] * n_files,
+            "area_km2": [flooded * 400 / 1e6] * n_files,
+        }
+    )
+    if error is not None:
+        df.loc[0, ["pixel_count", "area_km2"]] = np.nan
+        df["error"] = [error] + [None] * (n_files - 1)
+    return df
+
+
+def event(event_id, fromdate="2023-08-01T00:00:00"):
+    return {"GDACS_ID": event_id, "fromdate": fromdate}
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    return ResultsDataset(tmp_path / "metrics")
+
+
+def test_write_and_read_events(dataset):
+    dataset.write_event(event("FL-1"), GFMAlgorithm.ENSEMBLE, event_metrics(2, 10))
+    dataset.write_event(event("FL-2", "2022-05-01T00:00:00"), GFMAlgorithm.TUW, event_metrics(1, 3))
+
+    df = dataset.read().sort_values(["event_id", "filepath"]).reset_index(drop=True)
+
+    assert list(df["event_id"]) == ["FL-1", "FL-1", "FL-2"]
+    assert list(df["algorithm"]) == ["ensemble", "ensemble", "tuw"]
+    assert list(df["year"]) == [2023, 2023, 2022]
+    assert list(df["tile"]) == ["E051N015T3"] * 3
+    assert list(df["pixel_count"]) == [10, 10, 3]
+    assert df.loc[0, "time"] == pd.Timestamp("2023-08-01 05:30:00")
+    assert dataset.partition_dir("tuw", 2022).is_dir()
+
+
+def test_failed_files_keep_integer_pixel_counts(dataset):
+    dataset.write_event(event("FL-1"), "ensemble", event_metrics(2, 7, error="unreadable"))
+
+    df = dataset.read(columns=["filepath", "pixel_count", "error"]).sort_values("filepath")
+
+    assert str(dataset.dataset().schema.field("pixel_count").type) == "int64"
+    assert pd.isna(df["pixel_count"].iloc[0]) and df["pixel_count"].iloc[1] == 7
+    assert list(df["error"].fillna("")) == ["unreadable", ""]
+
+
+def test_read_filters_partitions(dataset):
+    dataset.write_event(event("FL-1"), "ensemble", event_metrics(1, 1))
+    dataset.write_event(event("FL-2"), "dlr", event_metrics(1, 2))
+
+    df = dataset.read(columns=["event_id"], filter=ds.field("algorithm") == "dlr")
+
+    assert list(df["event_id"]) == ["FL-2"]
+    assert dataset.event_ids(GFMAlgorithm.ENSEMBLE) == {"FL-1"}
+    assert dataset.event_ids("list") == set()
+
+
+def test_rerun_replaces_the_event_part(dataset):
+    dataset.write_event(event("FL-1"), "ensemble", event_metrics(3, 1))
+    dataset.write_event(event("FL-1"), "ensemble", event_metrics(2, 5))
+
+    df = dataset.read()
+
+    assert len(list(dataset.partition_dir("ensemble", 2023).glob("*.parquet"))) == 1
+    assert list(df["pixel_count"]) == [5, 5]
+
+
+def test_compact_keeps_the_latest_write_of_each_event(dataset):
+    for k in range(3):
+        dataset.write_event(event(f"FL-{k}"), "ensemble", event_metrics(2, k))
+    assert dataset.compact() == 3
+    time.sleep(0.01)
+    # rerun after compaction: the new part supersedes the compacted rows
+    dataset.write_event(event("FL-1"), "ensemble", event_metrics(1, 99))
+
+    before = dataset.read().sort_values(["event_id", "filepath"]).reset_index(drop=True)
+    assert dataset.compact() == 2
+    after = dataset.read().sort_values(["event_id", "filepath"]).reset_index(drop=True)
+
+    files = list(dataset.partition_dir("ensemble", 2023).glob("*.parquet"))
+    assert len(files) == 1 and files[0].name.startswith("part-")
+    assert list(after["event_id"]) == ["FL-0", "FL-0", "FL-1", "FL-2", "FL-2"]
+    assert list(after["pixel_count"]) == [0, 0, 99, 2, 2]
+    pd.testing.assert_frame_equal(before, after[before.columns])
+
+
+def test_compact_skips_partitions_with_a_single_file(dataset):
+    dataset.write_event(event("FL-1"), "ensemble", event_metrics(1, 1))
+
+    assert dataset.compact() == 0
+    assert dataset.read()["event_id"].tolist() == ["FL-1"]
+
+
+def test_empty_dataset(dataset):
+    assert dataset.read(columns=["event_id"]).empty
+    assert dataset.event_ids("ensemble") == set()
+    assert dataset.compact() == 0
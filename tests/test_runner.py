@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("osgeo")
+
+from gdacs_gfm import runner as runner_module
+from gdacs_gfm.algorithms import GFMAlgorithm
+from gdacs_gfm.runner import EventRunner, RunConfig
+from gdacs_gfm.status_store import ERROR, NO_AOI, NO_DATA
+
+EVENT = {"GDACS_ID": "FL-1", "country": "AT", "equi7_grid_code": "EU020M"}
+
+
+def make_runner(tmp_path, metrics_mode):
+    config = RunConfig(tmp_path / "results", tmp_path / "aois", metrics_mode=metrics_mode)
+    return EventRunner(config)
+
+
+def test_triage_statuses_go_to_the_triage_store(tmp_path):
+    runner = make_runner(tmp_path, "approx")
+    runner.status_store.set("FL-1", GFMAlgorithm.ENSEMBLE, "detected")
+
+    runner.record("FL-1", [GFMAlgorithm.ENSEMBLE], ERROR)
+    runner._no_data(EVENT, GFMAlgorithm.TUW, "No images on AOI tiles.")
+
+    # the exact result is untouched, the triage store can resume
+    assert runner.status_store.get("FL-1", GFMAlgorithm.ENSEMBLE) == "detected"
+    assert runner.status_store.get("FL-1", GFMAlgorithm.TUW) is None
+    assert runner.triage_status_store.get("FL-1", GFMAlgorithm.ENSEMBLE) == ERROR
+    assert runner.triage_status_store.get("FL-1", GFMAlgorithm.TUW) == NO_DATA
+    assert runner.pending_algorithms("FL-1", [GFMAlgorithm.ENSEMBLE, GFMAlgorithm.TUW]) == [
+        GFMAlgorithm.ENSEMBLE
+    ]
+
+
+def test_exact_statuses_go_to_the_main_store(tmp_path):
+    runner = make_runner(tmp_path, "aoi")
+    runner.record("FL-1", [GFMAlgorithm.DLR], NO_AOI)
+
+    assert runner.status_store.get("FL-1", GFMAlgorithm.DLR) == NO_AOI
+    assert runner.triage_status_store.get("FL-1", GFMAlgorithm.DLR) is None
+    assert runner.pending_algorithms("FL-1", [GFMAlgorithm.DLR]) == []
+
+
+def test_batched_run_prepares_each_event_once(tmp_path, monkeypatch):
+    runner = make_runner(tmp_path, "aoi")
+    algorithms = [GFMAlgorithm.ENSEMBLE, GFMAlgorithm.TUW]
+    events = pd.DataFrame(
+        [{**EVENT, "GDACS_ID": f"FL-{i}", "fromdate": f"2023-01-0{i}T00:00:00"} for i in (1, 2, 3)]
+    )
+    prepared, batches = [], []
+
+    def prepare(event, algos):
+        prepared.append((event["GDACS_ID"], list(algos)))
+        return {algo: ([], [], None) for algo in algos}
+
+    monkeypatch.setattr(runner, "prepare", prepare)
+    monkeypatch.setattr(runner_module, "event_work", lambda event, *args: event["GDACS_ID"])
+    monkeypatch.setattr(
+        runner, "process_batch", lambda works, algo, executor: batches.append((algo, list(works)))
+    )
+
+    runner.run_batched(events, algorithms, executor=None, batch_size=2)
+
+    assert prepared == [(f"FL-{i}", algorithms) for i in (1, 2, 3)]
+    assert batches == [
+        (GFMAlgorithm.ENSEMBLE, ["FL-1", "FL-2"]),
+        (GFMAlgorithm.TUW, ["FL-1", "FL-2"]),
+        (GFMAlgorithm.ENSEMBLE, ["FL-3"]),
+        (GFMAlgorithm.TUW, ["FL-3"]),
+    ]
@@ -0,0 +1,132 @@
+import pandas as pd
+import pytest
+
+from gdacs_gfm.algorithms import GFMAlgorithm
+from gdacs_gfm.status_store import DONE, ERROR, NO_AOI, StatusStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StatusStore(tmp_path / "status.sqlite")
+    yield store
+    store.close()
+
+
+def test_set_is_an_upsert(store):
+    store.set("FL-1", GFMAlgorithm.ENSEMBLE, "error")
+    store.set("FL-1", GFMAlgorithm.ENSEMBLE, "detected")
+    store.set_many([("FL-1", "tuw", "missed"), (2, GFMAlgorithm.DLR, "no_data")])
+
+    assert store.get("FL-1", GFMAlgorithm.ENSEMBLE) == "detected"
+    assert store.statuses() == {
+        ("FL-1", "ensemble"): "detected",
+        ("FL-1", "tuw"): "missed",
+        ("2", "dlr"): "no_data",
+    }
+    assert store.statuses(GFMAlgorithm.TUW) == {"FL-1": "missed"}
+
+
+def test_statuses_persist_across_connections(tmp_path):
+    path = tmp_path / "status.sqlite"
+    first = StatusStore(path)
+    first.set("FL-1", GFMAlgorithm.LIST, "detected")
+    first.close()
+
+    assert StatusStore(path).get("FL-1", "list") == "detected"
+
+
+def test_import_csv_skips_empty_cells(store, tmp_path):
+    csv_path = tmp_path / "processing_results.csv"
+    pd.DataFrame(
+        {
+            "GDACS_ID": ["FL-1", "FL-2"],
+            "processed": [True, False],
+            "ensemble": ["detected", None],
+            "tuw": ["missed", "error"],
+        }
+    ).to_csv(csv_path, index=False)
+
+    imported = store.import_csv(csv_path, list(GFMAlgorithm))
+
+    assert imported == 3
+    assert store.statuses() == {
+        ("FL-1", "ensemble"): "detected",
+        ("FL-1", "tuw"): "missed",
+        ("FL-2", "tuw"): "error",
+    }
+
+
+def test_export_csv_keeps_existing_rows_and_columns(store, tmp_path):
+    csv_path = tmp_path / "processing_results.csv"
+    pd.DataFrame(
+        {"GDACS_ID": ["FL-1", "FL-2", "FL-3"], "country": ["AT", "DE", "IT"]}
+    ).to_csv(csv_path, index=False)
+    store.set("FL-1", GFMAlgorithm.ENSEMBLE, "detected")
+    store.set("FL-3", GFMAlgorithm.TUW, "missed")
+
+    store.export_csv(csv_path)
+
+    df = pd.read_csv(csv_path)
+    assert list(df.columns) == ["GDACS_ID", "country", "processed", "ensemble", "tuw"]
+    assert list(df["processed"]) == [True, False, True]
+    assert df.loc[0, "ensemble"] == "detected" and pd.isna(df.loc[0, "tuw"])
+    assert df.loc[2, "tuw"] == "missed"
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_export_without_base_lists_recorded_events(store, tmp_path):
+    store.set("FL-2", GFMAlgorithm.DLR, "detected")
+
+    store.export_csv(tmp_path / "out.csv")
+
+    df = pd.read_csv(tmp_path / "out.csv")
+    assert df.to_dict("records") == [{"GDACS_ID": "FL-2", "processed": True, "dlr": "detected"}]
+
+
+def test_completion_states(store):
+    store.set_many(
+        [
+            ("FL-1", "ensemble", "detected"),
+            ("FL-1", "tuw", "error"),
+            ("FL-2", "ensemble", "no_aoi"),
+        ]
+    )
+
+    assert store.state("FL-1", GFMAlgorithm.ENSEMBLE) == DONE
+    assert store.state("FL-1", GFMAlgorithm.TUW) == ERROR
+    assert store.state("FL-1", GFMAlgorithm.DLR) is None
+    # no_aoi / no_data hold for every algorithm of the event
+    assert store.state("FL-2", GFMAlgorithm.DLR) == NO_AOI
+    assert store.is_processed("FL-1", "ensemble")
+    assert not store.is_processed("FL-1", "tuw")
+    assert store.is_processed("FL-2", "list")
+
+
+def test_index_follows_writes_of_this_process(store):
+    assert not store.is_processed("FL-1", "ensemble")
+
+    store.set("FL-1", "ensemble", "error")
+    assert store.state("FL-1", "ensemble") == ERROR
+    store.set("FL-1", "ensemble", "missed")
+    assert store.is_processed("FL-1", "ensemble")
+
+
+def test_rebuild_from_outputs(store, tmp_path):
+    results = tmp_path / "results"
+    (results / "no_aoi").mkdir(parents=True)
+    (results / "no_aoi" / "FL-2.txt").write_text("no AOI\n")
+    (results / "FL-1_ensemble.csv").write_text("filepath\n")
+    (results / "FL-1_unknown.csv").write_text("filepath\n")
+    (results / "processing_results.csv").write_text("GDACS_ID\n")
+    store.set("FL-3", "tuw", "detected")
+    (results / "FL-3_tuw.csv").write_text("filepath\n")
+
+    rebuilt = store.rebuild(results, [GFMAlgorithm.ENSEMBLE, GFMAlgorithm.TUW])
+
+    assert rebuilt == 3
+    assert store.get("FL-1", "ensemble") == DONE
+    assert store.get("FL-1", "tuw") is None
+    assert store.get("FL-2", "ensemble") == store.get("FL-2", "tuw") == NO_AOI
+    # recorded statuses are kept
+    assert store.get("FL-3", "tuw") == "detected"
+    assert store.is_processed("FL-1", "ensemble")
@@ -0,0 +1,62 @@
+import logging
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from gdacs_gfm import raster_stats
+from gdacs_gfm.pipeline import export_triage_summary, process_event, read_triage_summary
+from gdacs_gfm.raster_stats import approximate_flood_statistics
+
+LOGGER = logging.getLogger("gfm_logger")
+
+
+def test_estimate_without_overviews_uses_the_side_cache(make_tif, tmp_path, monkeypatch):
+    monkeypatch.setattr(raster_stats, "OVERVIEW_CACHE_DIR", tmp_path / "overviews")
+    data = np.zeros((64, 64), dtype="uint8")
+    data[:32, :] = 1
+    fp = make_tif("flood.tif", data)
+
+    first = approximate_flood_statistics(fp, factor=8)
+    second = approximate_flood_statistics(fp, factor=8)
+
+    assert len(list((tmp_path / "overviews").rglob("*.tif"))) == 1
+    assert first == second
+    assert first["pixel_count"] == 64 * 32
+    assert first["overview_factor"] == 8.0
+
+
+def run_triage(event, flood_tif, results_dir, algorithm="ensemble"):
+    dc = SimpleNamespace(
+        file_register=pd.DataFrame({"filepath": [str(flood_tif)], "time": ["20230101T000000"]})
+    )
+    return process_event(
+        event,
+        SimpleNamespace(value=algorithm),
+        [dc],
+        results_dir,
+        LOGGER,
+        metrics_mode="approx",
+    )
+
+
+def test_triage_summary_has_one_row_per_event_and_algorithm(flood_tif, tmp_path):
+    results = tmp_path / "results"
+    for event_id in ("FL-1", "FL-2", "FL-1"):
+        run_triage({"GDACS_ID": event_id, "country": "AT"}, flood_tif, results)
+    run_triage({"GDACS_ID": "FL-1", "country": "AT"}, flood_tif, results, "tuw")
+
+    summary = read_triage_summary(results)
+
+    assert sorted(zip(summary["event_id"], summary["algorithm"])) == [
+        ("FL-1", "ensemble"),
+        ("FL-1", "tuw"),
+        ("FL-2", "ensemble"),
+    ]
+    assert (results / "overview_cache").is_dir()
+    path = export_triage_summary(results)
+    assert len(pd.read_csv(path)) == 3
+
+
+def test_empty_triage_summary(tmp_path):
+    assert read_triage_summary(tmp_path).empty